@@ -0,0 +1,144 @@
+"""Track artwork from embedded ID3 pictures and folder images.
+
+A track's artwork is its embedded APIC picture (the front cover if there
+are several), else the image in its folder, such as
+``Songs/Polaroid/Polaroid_Logo.png``. Sources can be several MB, so each is
+decoded and downscaled once, off the Tk thread, and the result is kept in
+two tiers:
+
+- on disk, pre-scaled PNG thumbnails in a size-bounded ``AudioCache`` keyed
+  on the source (the track or image URL plus its blob sha), so later
+  launches never decode the source again;
+- in memory, an LRU of ready ``ImageTk.PhotoImage`` objects, so switching
+  back to a recent track shows its artwork without touching the disk.
+
+JPEG sources are decoded straight at reduced scale with ``Image.draft``.
+"""
+
+import io
+from collections import OrderedDict
+
+import id3_reader
+from audio_cache import AudioCache
+
+DEFAULT_SIZE = 120  # Matches the default artwork
+DEFAULT_MEMORY_ITEMS = 64
+DEFAULT_DISK_BYTES = 32 * 1024 * 1024
+THUMBNAIL_SUFFIX = '.png'
+
+
+class ArtworkCache:
+    """Thumbnails on disk (any thread) and ``PhotoImage`` objects in memory (Tk thread)
+
+    Artwork is keyed on its source's ``(url, sha)``: the track's for an
+    embedded picture, the image file's for folder artwork.
+    """
+
+    def __init__(self, directory, size=DEFAULT_SIZE, memory_items=DEFAULT_MEMORY_ITEMS,
+                 disk_bytes=DEFAULT_DISK_BYTES):
+        self.size = size
+        self.memory_items = memory_items
+        self.store = AudioCache(directory, disk_bytes, suffix=THUMBNAIL_SUFFIX)
+        self._photos = OrderedDict()  # key -> PhotoImage, oldest first
+        self._no_embedded = set()  # Track keys whose tag has no usable picture
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            settings.get('artwork_cache_dir', 'artwork_cache'),
+            size=int(settings.get('artwork_size', DEFAULT_SIZE)),
+            memory_items=max(1, int(settings.get('artwork_memory_items', DEFAULT_MEMORY_ITEMS))),
+            disk_bytes=int(float(settings.get('artwork_cache_mb', DEFAULT_DISK_BYTES / (1024 * 1024))) * 1024 * 1024)
+        )
+
+    # Memory tier (Tk thread)
+
+    def cached_photo(self, track_key, folder_key=None):
+        """The track's artwork if it is in memory, else None"""
+        photo = self._photo(track_key)
+        if photo is None and folder_key and track_key in self._no_embedded:
+            photo = self._photo(folder_key)
+        return photo
+
+    def _photo(self, key):
+        photo = self._photos.get(key)
+        if photo is not None:
+            self._photos.move_to_end(key)
+        return photo
+
+    def photo_for(self, key, image):
+        """Turn a thumbnail into a ``PhotoImage`` and keep it in memory"""
+        from PIL import ImageTk
+
+        photo = self._photos.get(key)
+        if photo is None:
+            photo = self._photos[key] = ImageTk.PhotoImage(image)
+            while len(self._photos) > self.memory_items:
+                self._photos.popitem(last=False)
+        self._photos.move_to_end(key)
+        return photo
+
+    # Disk tier and decoding (worker thread)
+
+    def thumbnail(self, track_key, read_tag=None, folder_key=None, fetch_folder_image=None):
+        """``(key, image)`` for a track's artwork thumbnail, or None if it has none
+
+        ``read_tag`` returns the track's ID3v2 tag bytes (None if they can't
+        be had right now), and ``fetch_folder_image`` the folder image's bytes.
+        Each is only called when no thumbnail for it is cached.
+        """
+        image = self._load(track_key)
+        if image is not None:
+            return track_key, image
+
+        if track_key not in self._no_embedded and read_tag is not None:
+            tag = read_tag()
+            if tag is not None:
+                picture = id3_reader.embedded_artwork(tag) if tag else None
+                image = self._store(track_key, picture) if picture else None
+                if image is not None:
+                    return track_key, image
+                self._no_embedded.add(track_key)
+
+        if folder_key is None:
+            return None
+        image = self._load(folder_key)
+        if image is None and fetch_folder_image is not None:
+            data = fetch_folder_image()
+            image = self._store(folder_key, data) if data else None
+        return (folder_key, image) if image is not None else None
+
+    def _load(self, key):
+        """A cached thumbnail, or None"""
+        from PIL import Image
+
+        path = self.store.get(*key)
+        if path is None:
+            return None
+        try:
+            with Image.open(path) as image:
+                image.load()
+                return image.copy()
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, key, data):
+        """Decode and downscale source image bytes, cache the thumbnail and return it"""
+        from PIL import Image
+
+        try:
+            image = Image.open(io.BytesIO(data))
+            image.draft('RGB', (self.size, self.size))  # JPEG: decode at 1/2 to 1/8 scale
+            image.thumbnail((self.size, self.size), Image.LANCZOS)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA')
+        except Exception:
+            return None  # Not an image PIL can read
+
+        encoded = io.BytesIO()
+        image.save(encoded, 'PNG')
+        try:
+            self.store.put(*key, [encoded.getvalue()])
+        except OSError:
+            pass  # Still show it; it's just not cached
+        return image
@@ -0,0 +1,244 @@
+"""Size-bounded, content-addressed cache of downloaded MP3 files.
+
+Entries are keyed on the track URL plus its blob sha, so a changed file gets
+a new entry and a stale one ages out. Files are written to a ``.part`` file
+and renamed into place, so a crash never leaves a half-written entry behind.
+Recency is kept in memory and mirrored in file mtimes, which rebuilds the
+LRU order on the next launch without a separate index file. Other files
+named after an entry's key (sidecars such as a seek index) live and die
+with it. The same cache, with a different entry suffix, holds artwork
+thumbnails.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import tracing
+
+PART_SUFFIX = '.part'
+ENTRY_SUFFIX = '.mp3'
+CHUNK_SIZE = 64 * 1024
+
+
+class CacheStats:
+    """Hit/miss counters for the audio cache"""
+
+    __slots__ = ('hits', 'misses', 'evictions', 'bytes_written')
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_written = 0
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class AudioCache:
+    """LRU cache of whole MP3 files on disk, bounded by ``max_bytes``"""
+
+    def __init__(self, directory, max_bytes, suffix=ENTRY_SUFFIX):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix  # File extension of entries
+        self.stats = CacheStats()
+        self.total_bytes = 0
+
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()  # key -> size, oldest first
+        self._pinned = {}  # key -> pin count; pinned entries are never evicted
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._load()
+
+    @classmethod
+    def from_settings(cls, settings):
+        directory = settings.get('audio_cache_dir', 'audio_cache')
+        max_bytes = int(float(settings.get('audio_cache_mb', 512)) * 1024 * 1024)
+        return cls(directory, max_bytes)
+
+    def _load(self):
+        """Rebuild the LRU order from disk and drop leftovers from interrupted writes"""
+        found = []
+        sidecars = []
+        for dirpath, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                if filename.endswith(PART_SUFFIX):
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+                elif filename.endswith(self.suffix):
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    found.append((st.st_mtime, filename[:-len(self.suffix)], st.st_size))
+                else:
+                    sidecars.append((filename.split('.', 1)[0], path))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self.total_bytes += size
+        for key, path in sidecars:
+            if key not in self._entries:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+        self._evict()
+
+    @staticmethod
+    def key_for(url, sha=None):
+        return hashlib.sha256(f"{url}\0{sha or ''}".encode('utf-8')).hexdigest()
+
+    def path_for_key(self, key):
+        return os.path.join(self.directory, key[:2], key + self.suffix)
+
+    def sidecar_path(self, path, suffix):
+        """Where to keep extra data (e.g. a seek index) for the entry at ``path``"""
+        return path[:-len(self.suffix)] + suffix
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def size_of(self, key):
+        with self._lock:
+            return self._entries[key]
+
+    def get(self, url, sha=None):
+        """Path of a cached track, or None; a hit makes the entry most recent"""
+        key = self.key_for(url, sha)
+        with self._lock:
+            if key not in self._entries:
+                self.stats.misses += 1
+                return None
+            path = self.path_for_key(key)
+            if not os.path.exists(path):
+                # Deleted behind our back
+                self.total_bytes -= self._entries.pop(key)
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def put(self, url, sha, chunks):
+        """Store an iterable of byte chunks atomically and return the entry's path"""
+        key = self.key_for(url, sha)
+        path = self.path_for_key(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Unique part name so concurrent writers of the same key never collide
+        part_path = f"{path}.{threading.get_ident()}.{time.monotonic_ns()}{PART_SUFFIX}"
+        size = 0
+        try:
+            with open(part_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(part_path, path)
+        except BaseException:
+            if os.path.exists(part_path):
+                os.unlink(part_path)
+            raise
+
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._entries.pop(key)
+            self._entries[key] = size
+            self.total_bytes += size
+            self.stats.bytes_written += size
+            self._evict(keep=key)  # The caller is about to use it, even if it alone is over budget
+        return path
+
+    def fetch(self, url, sha, get, chunk_size=CHUNK_SIZE):
+        """Return a cached path, downloading the track with ``get`` on a miss"""
+        return self.get(url, sha) or self.download(url, sha, get, chunk_size)
+
+    def download(self, url, sha, get, chunk_size=CHUNK_SIZE):
+        """Download a track with ``get`` straight into the cache"""
+        with tracing.span('download', url=url):
+            response = get(url, stream=True)
+            with response:
+                response.raise_for_status()
+                return self.put(url, sha, response.iter_content(chunk_size=chunk_size))
+
+    def pin(self, path):
+        """Protect an entry (e.g. the track pygame has open) from eviction"""
+        key = self._key_from_path(path)
+        if key:
+            with self._lock:
+                self._pinned[key] = self._pinned.get(key, 0) + 1
+
+    def unpin(self, path):
+        key = self._key_from_path(path)
+        if not key:
+            return
+        with self._lock:
+            count = self._pinned.get(key, 0) - 1
+            if count > 0:
+                self._pinned[key] = count
+            else:
+                self._pinned.pop(key, None)
+            self._evict()
+
+    def is_cache_path(self, path):
+        return self._key_from_path(path) is not None
+
+    def _key_from_path(self, path):
+        if not path:
+            return None
+        directory = os.path.abspath(self.directory)
+        path = os.path.abspath(path)
+        if os.path.dirname(os.path.dirname(path)) != directory or not path.endswith(self.suffix):
+            return None
+        return os.path.basename(path)[:-len(self.suffix)]
+
+    def _evict(self, keep=None):
+        """Drop least recently used entries, other than ``keep``, until the cache fits its budget"""
+        with self._lock:
+            for key in list(self._entries):
+                if self.total_bytes <= self.max_bytes:
+                    break
+                if key in self._pinned or key == keep:
+                    continue
+                size = self._entries.pop(key)
+                self.total_bytes -= size
+                self.stats.evictions += 1
+                self._delete_files(key)
+
+    def _delete_files(self, key):
+        """Remove an entry's file and its sidecars"""
+        path = self.path_for_key(key)
+        directory = os.path.dirname(path)
+        try:
+            # Not another writer's in-progress part file, which it is about to rename into place
+            names = [name for name in os.listdir(directory)
+                     if name.startswith(key + '.') and not name.endswith(PART_SUFFIX)]
+        except OSError:
+            return
+        for name in names:
+            try:
+                os.unlink(os.path.join(directory, name))
+            except OSError:
+                pass
+
+    def summary(self):
+        """One-line description for the status bar"""
+        with self._lock:
+            return (f"cache {self.total_bytes / (1024 * 1024):.0f}/{self.max_bytes / (1024 * 1024):.0f} MB, "
+                    f"{self.stats.hits} hits, {self.stats.misses} misses, {self.stats.hit_rate:.0%} hit rate")
@@ -0,0 +1,79 @@
+"""pygame's mixer, imported and initialized off the Tk thread.
+
+Importing pygame and opening the audio device are the slowest parts of
+startup, and nothing needs them until the first track plays. ``AudioEngine``
+does both on a background thread once the window is up. ``music`` waits
+for that to finish, so early callers just block briefly instead of failing.
+"""
+
+import threading
+import time
+
+
+class AudioEngine:
+    """Lazily started ``pygame.mixer``; ``music`` is ``pygame.mixer.music`` once ready"""
+
+    def __init__(self, on_ready=None):
+        self.on_ready = on_ready  # Called from the init thread with the seconds it took
+        self.error = None
+        self._mixer = None
+        self._volume = None  # Applied as soon as the mixer is up
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Begin importing pygame and opening the mixer in the background"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._init, name="audio-init", daemon=True)
+                self._thread.start()
+
+    def _init(self):
+        started = time.perf_counter()
+        try:
+            import pygame
+            pygame.mixer.init()
+            with self._lock:
+                self._mixer = pygame.mixer
+                if self._volume is not None:
+                    pygame.mixer.music.set_volume(self._volume)
+        except Exception as e:
+            self.error = e
+        finally:
+            self._ready.set()
+        if self.on_ready:
+            self.on_ready(time.perf_counter() - started)
+
+    @property
+    def ready(self):
+        """Initialization has finished, successfully or not"""
+        return self._ready.is_set()
+
+    @property
+    def available(self):
+        """The mixer is up, so ``music`` won't block or raise"""
+        return self._ready.is_set() and self._mixer is not None
+
+    @property
+    def music(self):
+        """``pygame.mixer.music``, waiting for initialization on first use"""
+        if not self._ready.is_set():
+            self.start()
+            self._ready.wait()
+        if self._mixer is None:
+            raise RuntimeError(f"Audio device unavailable: {self.error}")
+        return self._mixer.music
+
+    def set_volume(self, volume):
+        """Set the volume (0.0-1.0) without waiting for the mixer"""
+        with self._lock:
+            self._volume = volume
+            if self._mixer is not None:
+                self._mixer.music.set_volume(volume)
+
+    def quit(self):
+        with self._lock:
+            if self._mixer is not None:
+                self._mixer.quit()
+                self._mixer = None
@@ -0,0 +1,312 @@
+"""Offline benchmark of the library scan and the playback start path.
+
+Starts ``fake_github.py`` in a subprocess with a synthetic library and
+configurable latency and bandwidth, then measures, in this process:
+
+- the library scan (``LibraryScanner`` over a ``GitHubSource``): wall
+  time, files/sec, bytes and requests per track, per-file latency;
+- revalidation: a second discovery answered ``304 Not Modified``;
+- time to first audio: how long a cold track takes to buffer enough to
+  hand to the mixer (``ProgressiveStream``, or the full download with
+  ``--no-progressive``), and how long the whole download takes;
+- peak RSS of the benchmark process.
+
+Each run can be appended to a JSON-lines history file together with the
+git commit, and compared against an earlier result, so regressions show
+up between commits:
+
+    python benchmark.py --artists 50 --tracks 20 --latency-ms 40 --output bench.jsonl
+    python benchmark.py --artists 50 --tracks 20 --latency-ms 40 --compare bench.jsonl --max-regression 10
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import fake_github
+from audio_cache import AudioCache
+from github_source import GitHubSource
+from http_transport import Transport
+from library_scanner import LibraryScanner, DEFAULT_WORKERS
+from playback_buffer import BufferPool
+from progressive import ProgressiveStream, DEFAULT_START_BYTES
+from tracing import percentile
+
+RESULTS_VERSION = 1
+SERVER_START_TIMEOUT = 30.0
+
+# Metrics compared between runs, and whether a higher value is better
+METRICS = {
+    'scan_seconds': False,
+    'discovery_seconds': False,
+    'metadata_seconds': False,
+    'revalidate_seconds': False,
+    'files_per_second': True,
+    'bytes_per_track': False,
+    'requests_per_track': False,
+    'metadata_latency_p90_ms': False,
+    'first_audio_p50_ms': False,
+    'first_audio_max_ms': False,
+    'download_p50_seconds': False,
+    'peak_rss_mb': False,
+}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where unsupported"""
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024  # Bytes on macOS, KB elsewhere
+
+
+def git_commit():
+    """``git describe`` of the working tree, or None outside a checkout"""
+    try:
+        result = subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+class ServerProcess:
+    """``fake_github.py`` running in a child process, so it doesn't share this process's GIL or memory"""
+
+    def __init__(self, server_args):
+        command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_github.py'),
+                   '--port', '0', *server_args]
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+        self.bases = {}
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while len(self.bases) < 2:
+            line = self.process.stdout.readline()
+            if not line or time.monotonic() > deadline:
+                self.stop()
+                raise RuntimeError("fake GitHub server did not start")
+            name, _, value = line.strip().partition('=')
+            if name in ('MP3_PLAYER_API_BASE', 'MP3_PLAYER_RAW_BASE'):
+                self.bases[name] = value
+
+    @property
+    def api_base(self):
+        return self.bases['MP3_PLAYER_API_BASE']
+
+    @property
+    def raw_base(self):
+        return self.bases['MP3_PLAYER_RAW_BASE']
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def measure_scan(source, transport, workers):
+    """Scan the whole library and revalidate it once; the scanned songs and scan metrics"""
+    scanner = LibraryScanner(source, transport, workers=workers)
+    before = transport.totals()
+    started = time.perf_counter()
+    songs = scanner.scan()
+    scan_seconds = time.perf_counter() - started
+    after = transport.totals()
+    discovery = source.last_discovery
+
+    started = time.perf_counter()
+    source.discover()  # Sends the tree's ETag back
+    revalidate_seconds = time.perf_counter() - started
+
+    stats = scanner.stats.as_dict()
+    tracks = max(len(songs), 1)
+    return songs, {
+        'tracks': len(songs),
+        'failures': stats['failures'],
+        'discovery': discovery,
+        'scan_seconds': round(scan_seconds, 3),
+        'discovery_seconds': stats['discovery_seconds'],
+        'metadata_seconds': stats['metadata_seconds'],
+        'revalidate_seconds': round(revalidate_seconds, 3),
+        'files_per_second': round(len(songs) / scan_seconds, 1) if scan_seconds else 0.0,
+        'bytes_per_track': round((after['bytes'] - before['bytes']) / tracks),
+        'requests_per_track': round((after['requests'] - before['requests']) / tracks, 2),
+        'metadata_latency_p50_ms': stats['latency_ms']['p50'],
+        'metadata_latency_p90_ms': stats['latency_ms']['p90'],
+        'metadata_latency_p99_ms': stats['latency_ms']['p99'],
+    }
+
+
+def measure_first_audio(songs, transport, count, progressive=True, start_bytes=DEFAULT_START_BYTES):
+    """Cold-start ``count`` tracks spread over the library the way the player does; playback metrics"""
+    if not songs or count <= 0:
+        return {}
+    step = max(1, len(songs) // count)
+    picks = songs[::step][:count]
+    first_audio = []
+    downloads = []
+    with tempfile.TemporaryDirectory(prefix="mp3-bench-") as directory:
+        cache = AudioCache(directory, max_bytes=1 << 40)
+        buffers = BufferPool()  # Shared across tracks, as in the player
+        for song in picks:
+            started = time.perf_counter()
+            if progressive:
+                stream = ProgressiveStream(song['url'], transport.get, read_timeout=transport.timeout[1],
+                                           buffers=buffers)
+                try:
+                    stream.wait_for(start_bytes, transport.timeout[1])
+                    first_audio.append(time.perf_counter() - started)
+                    stream.wait_for(sys.maxsize, transport.timeout[1])  # Until the download completes
+                finally:
+                    stream.close()
+            else:
+                cache.download(song['url'], song['sha'], transport.get)  # Playback waits for the whole file
+                first_audio.append(time.perf_counter() - started)
+            downloads.append(time.perf_counter() - started)
+    first_audio.sort()
+    downloads.sort()
+    return {
+        'first_audio_p50_ms': round(percentile(first_audio, 0.5) * 1000, 1),
+        'first_audio_max_ms': round(first_audio[-1] * 1000, 1),
+        'download_p50_seconds': round(percentile(downloads, 0.5), 3),
+    }
+
+
+def run(args):
+    """One benchmark run; the result record"""
+    server_args = ['--artists', str(args.artists), '--tracks', str(args.tracks), '--seconds', str(args.seconds),
+                   '--picture-kb', str(args.picture_kb), '--latency-ms', str(args.latency_ms),
+                   '--bandwidth-kbps', str(args.bandwidth_kbps)]
+    if args.truncated:
+        server_args.append('--truncated')
+    server = ServerProcess(server_args)
+    transport = Transport()
+    try:
+        source = GitHubSource(repo=fake_github.REPO, branch=fake_github.BRANCH, songs_path=fake_github.SONGS_PATH,
+                              api_base=server.api_base, raw_base=server.raw_base, get=transport.get)
+        songs, results = measure_scan(source, transport, args.workers)
+        results.update(measure_first_audio(songs, transport, args.playback_tracks,
+                                           progressive=not args.no_progressive,
+                                           start_bytes=args.progressive_buffer_kb * 1024))
+    finally:
+        transport.close()
+        server.stop()
+    peak = peak_rss_mb()
+    results['peak_rss_mb'] = round(peak, 1) if peak is not None else None
+
+    return {
+        'benchmark': RESULTS_VERSION,
+        'commit': git_commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': parameters(args),
+        'results': results,
+    }
+
+
+def parameters(args):
+    """The options that make two runs comparable"""
+    return {name: getattr(args, name) for name in (
+        'artists', 'tracks', 'seconds', 'picture_kb', 'latency_ms', 'bandwidth_kbps', 'truncated',
+        'workers', 'playback_tracks', 'no_progressive', 'progressive_buffer_kb')}
+
+
+def load_baseline(path, params):
+    """The last record in a results file run with the same parameters, or None"""
+    baseline = None
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                if record.get('parameters') == params:
+                    baseline = record
+    return baseline
+
+
+def compare(record, baseline):
+    """``(lines, worst regression in percent)`` comparing a run with a baseline"""
+    lines = [f"Compared with {baseline.get('commit') or 'baseline'} from {baseline.get('time')}:"]
+    worst = 0.0
+    for name, higher_is_better in METRICS.items():
+        old = baseline['results'].get(name)
+        new = record['results'].get(name)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        regression = -change if higher_is_better else change
+        worst = max(worst, regression)
+        marker = ' ⚠' if regression > 0 else ''
+        lines.append(f"  {name}: {old} -> {new} ({change:+.1f}%){marker}")
+    return lines, worst
+
+
+def report(record):
+    """Human-readable summary lines"""
+    results = record['results']
+    lines = [
+        f"Scan: {results['tracks']} tracks ({results['failures']} failed, discovery via {results['discovery']}) "
+        f"in {results['scan_seconds']:.2f} s, {results['files_per_second']:.1f} files/s",
+        f"  discovery {results['discovery_seconds']:.2f} s, metadata {results['metadata_seconds']:.2f} s, "
+        f"revalidation {results['revalidate_seconds']:.2f} s",
+        f"  {results['bytes_per_track'] / 1024:.1f} KB and {results['requests_per_track']} requests per track, "
+        f"metadata latency p50 {results['metadata_latency_p50_ms']} ms, p90 {results['metadata_latency_p90_ms']} ms",
+    ]
+    if 'first_audio_p50_ms' in results:
+        lines.append(f"First audio: p50 {results['first_audio_p50_ms']} ms, max {results['first_audio_max_ms']} ms; "
+                     f"full download p50 {results['download_p50_seconds']:.2f} s")
+    if results['peak_rss_mb'] is not None:
+        lines.append(f"Peak RSS: {results['peak_rss_mb']:.1f} MB")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the library scan and playback start against a "
+                                                 "local fake GitHub server.")
+    fake_github.add_arguments(parser)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="concurrent metadata requests")
+    parser.add_argument('--playback-tracks', type=int, default=5, help="tracks to cold-start (default 5)")
+    parser.add_argument('--progressive-buffer-kb', type=int, default=DEFAULT_START_BYTES // 1024,
+                        help="bytes buffered before playback starts, as the player setting")
+    parser.add_argument('--no-progressive', action='store_true', help="measure playback after a full download")
+    parser.add_argument('--output', help="append the result to this JSON-lines file")
+    parser.add_argument('--compare', metavar='RESULTS', help="compare with the last matching run in this file")
+    parser.add_argument('--max-regression', type=float, metavar='PERCENT',
+                        help="exit with status 1 if any metric is this much worse than in --compare")
+    parser.add_argument('--json', action='store_true', help="print the result record as JSON")
+    args = parser.parse_args(argv)
+
+    record = run(args)
+    if args.json:
+        print(json.dumps(record))
+    else:
+        for line in report(record):
+            print(line)
+
+    status = 0
+    if args.compare:
+        baseline = load_baseline(args.compare, record['parameters'])
+        if baseline is None:
+            print(f"No run with these parameters in {args.compare}", file=sys.stderr)
+        else:
+            lines, worst = compare(record, baseline)
+            for line in lines:
+                print(line, file=sys.stderr if args.json else sys.stdout)
+            if args.max_regression is not None and worst > args.max_regression:
+                status = 1
+
+    if args.output:
+        with open(args.output, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
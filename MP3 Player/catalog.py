@@ -0,0 +1,92 @@
+"""Library catalogs written by ``library_scanner.py`` and loaded by the player.
+
+A catalog is the result of a full scan: every song dict (url, name, sha,
+folder, metadata) in listing order, plus the folder artwork picked during
+discovery. Two formats are supported, chosen by file name or explicitly:
+
+- JSON lines (``.jsonl``): a header line ``{"catalog": 1, "folder_images": ...}``
+  followed by one song per line, easy to diff and to stream;
+- SQLite (``.sqlite``/``.db``): a ``LibraryStore``, indexed for paged
+  queries, which the player can also browse in place without loading it.
+"""
+
+import json
+import os
+import sqlite3
+
+from library_store import LibraryStore
+
+CATALOG_VERSION = 1
+FORMATS = ('jsonl', 'sqlite')
+SQLITE_EXTENSIONS = ('.sqlite', '.sqlite3', '.db')
+
+
+def format_for(path, format=None):
+    """The catalog format to use for ``path``"""
+    if format:
+        return format
+    return 'sqlite' if os.path.splitext(path)[1].lower() in SQLITE_EXTENSIONS else 'jsonl'
+
+
+def write(path, songs, folder_images=None, format=None):
+    """Write ``songs`` (in order) and the folder images atomically"""
+    temp_path = path + '.tmp'
+    if os.path.exists(temp_path):
+        os.unlink(temp_path)
+    try:
+        if format_for(path, format) == 'sqlite':
+            _write_sqlite(temp_path, songs, folder_images or {})
+        else:
+            _write_jsonl(temp_path, songs, folder_images or {})
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+
+def read(path, format=None):
+    """``(songs, folder_images)`` from a catalog
+
+    Raises ``ValueError`` if the file isn't a catalog this version understands.
+    """
+    if format_for(path, format) == 'sqlite':
+        return _read_sqlite(path)
+    return _read_jsonl(path)
+
+
+def _write_jsonl(path, songs, folder_images):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'catalog': CATALOG_VERSION, 'folder_images': folder_images}) + '\n')
+        for song in songs:
+            f.write(json.dumps(song, separators=(',', ':')) + '\n')
+
+
+def _read_jsonl(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        header = json.loads(f.readline() or '{}')
+        if header.get('catalog') != CATALOG_VERSION:
+            raise ValueError(f"{path} is not a version {CATALOG_VERSION} catalog")
+        songs = [json.loads(line) for line in f if line.strip()]
+    return songs, header.get('folder_images', {})
+
+
+def _write_sqlite(path, songs, folder_images):
+    store = LibraryStore(path)
+    try:
+        store.add_songs(songs)
+        store.set_meta('folder_images', folder_images)
+    finally:
+        store.close()
+
+
+def _read_sqlite(path):
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)  # sqlite3 would quietly create an empty database
+    try:
+        store = LibraryStore(path)
+    except sqlite3.DatabaseError as e:
+        raise ValueError(f"{path} is not a catalog: {e}")
+    try:
+        return list(store.songs()), store.get_meta('folder_images', {})
+    finally:
+        store.close()
@@ -0,0 +1,211 @@
+"""Prioritised downloads, so the track being played never waits on a scan.
+
+Every network request goes through one ``DownloadScheduler``, tagged with
+a priority class: the current track (``PLAYBACK``), then upcoming tracks
+(``PREFETCH``), then tag reads and discovery (``METADATA``), then folder
+artwork (``ARTWORK``). ``scheduler.getter(priority)`` is a drop-in for
+``Transport.get``, so each caller keeps its ``get`` parameter.
+
+- At most ``max_transfers`` requests are in flight, two of which only the
+  current track may use (its download and the tail probe), so it never
+  queues behind a full pool of tag reads. Waiting requests start highest
+  class first, in arrival order within a class.
+- While a higher class is transferring, a lower one neither starts nor
+  reads its next chunk. Each request holds off for at most ``max_pause``
+  seconds before starting, and at most ``max_pause`` seconds in total
+  between chunks once started, then carries on, so background work is
+  slowed rather than starved and its open responses don't sit idle long
+  enough to time out.
+- An optional bandwidth limit is shared by all classes. Paused classes
+  don't spend it, so a playing download gets all of it.
+- ``promote(url)`` raises a transfer already under way, for when playback
+  starts waiting on a track that was being prefetched; ``demote(url)``
+  lowers it again when playback stops waiting on it.
+
+A streamed response holds its slot until it is closed (or collected).
+"""
+
+import itertools
+import threading
+import time
+import weakref
+
+import tracing
+
+PLAYBACK, PREFETCH, METADATA, ARTWORK = range(4)
+PRIORITY_NAMES = ('playback', 'prefetch', 'metadata', 'artwork')
+
+DEFAULT_MAX_TRANSFERS = 10
+PLAYBACK_RESERVED = 2  # Slots kept free for the current track
+DEFAULT_MAX_PAUSE = 5.0  # Seconds a request waits on a higher class, before starting and again once started
+
+
+class Transfer:
+    """One request, from waiting for a slot until its response is closed"""
+
+    __slots__ = ('url', 'priority', 'order', 'paused', '__weakref__')
+
+    def __init__(self, url, priority, order):
+        self.url = url
+        self.priority = priority
+        self.order = order
+        self.paused = 0.0  # Seconds spent between chunks waiting on a higher class
+
+
+class DownloadScheduler:
+    """Admits, pauses and paces requests made through ``get`` by priority class"""
+
+    def __init__(self, get, max_transfers=DEFAULT_MAX_TRANSFERS, bandwidth=None, max_pause=DEFAULT_MAX_PAUSE):
+        self._get = get
+        self.max_transfers = max(PLAYBACK_RESERVED + 1, max_transfers)
+        self.bandwidth = bandwidth  # Bytes per second shared by all transfers, or None for no limit
+        self.max_pause = max_pause
+
+        self.started = [0] * len(PRIORITY_NAMES)  # Requests started, per class
+        self.waited_seconds = [0.0] * len(PRIORITY_NAMES)  # Time spent queued or paused for a higher class
+
+        self._cond = threading.Condition()
+        self._waiting = []  # Transfers waiting for a slot
+        self._active = []  # Transfers holding a slot
+        self._order = itertools.count()
+        self._bucket_lock = threading.Lock()
+        self._next_send = 0.0  # time.monotonic() when the bandwidth budget is next free
+
+    @classmethod
+    def from_settings(cls, settings, get):
+        kbps = float(settings.get('download_kbps', 0))
+        return cls(
+            get,
+            max_transfers=int(settings.get('download_slots', DEFAULT_MAX_TRANSFERS)),
+            bandwidth=kbps * 1024 if kbps > 0 else None,
+            max_pause=float(settings.get('download_max_pause', DEFAULT_MAX_PAUSE))
+        )
+
+    def getter(self, priority):
+        """A ``get(url, **kwargs)`` whose requests are scheduled as ``priority``"""
+        def get(url, **kwargs):
+            return self.get(url, priority, **kwargs)
+        return get
+
+    def get(self, url, priority=METADATA, **kwargs):
+        """``Transport.get`` once a slot is free and no higher class holds this one back"""
+        transfer = Transfer(url, priority, next(self._order))
+        self._admit(transfer)
+        try:
+            response = self._get(url, **kwargs)
+        except BaseException:
+            self._finish(transfer)
+            raise
+        if not kwargs.get('stream'):
+            self._finish(transfer)
+            self._throttle(len(response.content))
+            return response
+
+        release = weakref.finalize(response, self._finish, transfer)
+        release.atexit = False
+        close = response.close
+        iter_content = response.iter_content
+
+        def scheduled_iter_content(*args, **kwargs):
+            for chunk in iter_content(*args, **kwargs):
+                yield chunk
+                self._yield_to_higher(transfer)
+                self._throttle(len(chunk))
+
+        def scheduled_close():
+            try:
+                close()
+            finally:
+                release()
+
+        response.iter_content = scheduled_iter_content
+        response.close = scheduled_close
+        return response
+
+    def promote(self, url, priority=PLAYBACK):
+        """Raise waiting and running transfers of ``url`` to ``priority``"""
+        with self._cond:
+            for transfer in itertools.chain(self._waiting, self._active):
+                if transfer.url == url and transfer.priority > priority:
+                    transfer.priority = priority
+            self._cond.notify_all()
+
+    def demote(self, url, priority=PREFETCH):
+        """Lower running transfers of ``url`` back to ``priority``, undoing ``promote``"""
+        with self._cond:
+            for transfer in itertools.chain(self._waiting, self._active):
+                if transfer.url == url and transfer.priority < priority:
+                    transfer.priority = priority
+            self._cond.notify_all()
+
+    def active(self):
+        """Transfers in flight per class name"""
+        with self._cond:
+            counts = dict.fromkeys(PRIORITY_NAMES, 0)
+            for transfer in self._active:
+                counts[PRIORITY_NAMES[transfer.priority]] += 1
+            return counts
+
+    # Admission and pausing
+
+    def _higher_active(self, priority):
+        return any(transfer.priority < priority for transfer in self._active)
+
+    def _slot_free(self, priority):
+        limit = self.max_transfers if priority == PLAYBACK else self.max_transfers - PLAYBACK_RESERVED
+        return len(self._active) < limit
+
+    def _next_in_line(self):
+        return min(self._waiting, key=lambda transfer: (transfer.priority, transfer.order))
+
+    def _admit(self, transfer):
+        """Wait for a slot and for higher classes, the latter for at most ``max_pause``"""
+        with tracing.span('download queue', priority=PRIORITY_NAMES[transfer.priority]):
+            with self._cond:
+                self._waiting.append(transfer)
+                started = time.monotonic()
+                while True:
+                    waited = time.monotonic() - started
+                    if self._slot_free(transfer.priority) and self._next_in_line() is transfer:
+                        if waited >= self.max_pause or not self._higher_active(transfer.priority):
+                            break
+                    self._cond.wait(max(self.max_pause - waited, 0.05))
+                self._waiting.remove(transfer)
+                self._active.append(transfer)
+                self.started[transfer.priority] += 1
+                self.waited_seconds[transfer.priority] += waited
+                self._cond.notify_all()  # The next in line may be allowed to start too
+
+    def _yield_to_higher(self, transfer):
+        """Between chunks: hold off while a higher class transfers, ``max_pause`` seconds per transfer in all"""
+        with self._cond:
+            if transfer.paused >= self.max_pause or not self._higher_active(transfer.priority):
+                return
+            started = time.monotonic()
+            deadline = started + self.max_pause - transfer.paused
+            while self._higher_active(transfer.priority):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            paused = time.monotonic() - started
+            transfer.paused += paused
+            self.waited_seconds[transfer.priority] += paused
+        tracing.count('download pauses')
+
+    def _finish(self, transfer):
+        with self._cond:
+            if transfer in self._active:
+                self._active.remove(transfer)
+                self._cond.notify_all()
+
+    def _throttle(self, nbytes):
+        """Sleep as long as the shared bandwidth limit needs before ``nbytes`` more are read"""
+        if not self.bandwidth or not nbytes:
+            return
+        with self._bucket_lock:
+            now = time.monotonic()
+            delay = max(self._next_send - now, 0.0)
+            self._next_send = max(self._next_send, now) + nbytes / self.bandwidth
+        if delay:
+            time.sleep(delay)
@@ -0,0 +1,340 @@
+"""Local stand-in for the GitHub endpoints the player uses, serving a synthetic library.
+
+``SyntheticLibrary`` describes ``artists`` x ``tracks`` MP3 files under
+``Songs/<artist>/``, each an ID3v2.3 tag (title, artist, album, year,
+genre, track number and optionally an embedded picture) followed by
+constant-bitrate MPEG audio frames, plus a ``cover.jpg`` per artist folder.
+Files are generated from their path on request, so nothing is written to
+disk and the same parameters always produce the same bytes.
+
+``FakeGitHub`` serves the library over HTTP the way ``GitHubSource``
+reads it: the recursive Git Trees API (with ETags), the contents API, and
+raw files with Range support. Every response can be delayed by a fixed
+latency and sent at a capped bandwidth, to mimic a real network:
+
+    python fake_github.py --artists 50 --tracks 20 --latency-ms 40 --bandwidth-kbps 4000
+
+It prints the API and raw base URLs to point the player or
+``library_scanner.py`` at (``MP3_PLAYER_API_BASE``/``MP3_PLAYER_RAW_BASE``,
+with ``MP3_PLAYER_GITHUB_REPO`` set to the printed repository).
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import struct
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urlsplit
+
+REPO = 'bench/library'
+BRANCH = 'main'
+SONGS_PATH = 'Songs'
+SEND_CHUNK = 16 * 1024
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, joint stereo: 417-byte frames of 1152 samples
+FRAME_HEADER = b'\xff\xfb\x90\x44'
+FRAME_SIZE = 417
+FRAMES_PER_SECOND = 44100 / 1152
+
+GENRES = ('Rock', 'Pop', 'Jazz', 'Electronic', 'Folk', 'Hip-Hop', 'Classical', 'Metal')
+WORDS = ('Midnight', 'Summer', 'Electric', 'Golden', 'River', 'Paper', 'Échos', 'Neon', 'Silent', 'Ciudad',
+         'Glass', 'Wild', 'Morgenrot', 'Heart', 'Static', 'Blue', 'Ocean', 'Ghost', 'Velvet', 'Fire')
+
+
+def _words(seed, count):
+    return ' '.join(WORDS[(seed * 7 + i * 13) % len(WORDS)] for i in range(count))
+
+
+def _text_frame(frame_id, text):
+    try:
+        data = b'\x00' + text.encode('latin-1')
+    except UnicodeEncodeError:
+        data = b'\x01' + text.encode('utf-16')  # With BOM
+    return _frame(frame_id, data)
+
+
+def _frame(frame_id, data):
+    return frame_id.encode('ascii') + struct.pack('>I', len(data)) + b'\x00\x00' + data
+
+
+def _syncsafe(size):
+    return bytes(((size >> 21) & 0x7f, (size >> 14) & 0x7f, (size >> 7) & 0x7f, size & 0x7f))
+
+
+class SyntheticLibrary:
+    """Deterministic MP3 files and folder images for ``artists`` x ``tracks`` songs"""
+
+    def __init__(self, artists=20, tracks=10, seconds=30, picture_bytes=64 * 1024, padding=1024):
+        self.artists = artists
+        self.tracks = tracks
+        self.seconds = seconds
+        self.picture_bytes = picture_bytes
+        self.padding = padding
+        frame = FRAME_HEADER + bytes(FRAME_SIZE - len(FRAME_HEADER))  # Digital silence
+        self._audio = frame * max(1, int(seconds * FRAMES_PER_SECOND))
+        self._picture = self._image(picture_bytes) if picture_bytes else None
+        self._files = {}  # Path -> (artist index, track index), or None for a folder image
+        for a in range(artists):
+            folder = f"{SONGS_PATH}/{self.artist_name(a)}"
+            self._files[f"{folder}/cover.jpg"] = None
+            for t in range(tracks):
+                self._files[f"{folder}/{t + 1:02d} {self.title(a, t)}.mp3"] = (a, t)
+        self.paths = sorted(self._files)
+
+    def parameters(self):
+        return {'artists': self.artists, 'tracks': self.tracks, 'seconds': self.seconds,
+                'picture_bytes': self.picture_bytes}
+
+    @staticmethod
+    def artist_name(a):
+        return f"{_words(a, 2)} {a:03d}"
+
+    @staticmethod
+    def title(a, t):
+        return _words(a * 31 + t, 1 + (a + t) % 3)
+
+    @staticmethod
+    def _image(size):
+        """JPEG markers around filler bytes; stands in for real artwork in size only"""
+        return b'\xff\xd8\xff\xe0' + bytes(max(0, size - 6)) + b'\xff\xd9'
+
+    def sha(self, path):
+        return hashlib.sha1(f"{path}:{self.parameters()}".encode('utf-8')).hexdigest()
+
+    def __contains__(self, path):
+        return path in self._files
+
+    def read(self, path):
+        """The bytes of ``path`` (KeyError if it isn't in the library)"""
+        indices = self._files[path]
+        if indices is None:
+            return self._image(8 * 1024)
+        return self.tag(*indices) + self._audio
+
+    def tag(self, a, t):
+        frames = [
+            _text_frame('TIT2', self.title(a, t)),
+            _text_frame('TPE1', self.artist_name(a)),
+            _text_frame('TALB', f"{_words(a + t // 8, 2)} ({a:03d}-{t // 8})"),
+            _text_frame('TYER', str(1970 + (a * 3 + t // 8) % 55)),
+            _text_frame('TCON', GENRES[a % len(GENRES)]),
+            _text_frame('TRCK', f"{t + 1}/{self.tracks}"),
+        ]
+        if self._picture:
+            frames.append(_frame('APIC', b'\x00image/jpeg\x00\x03\x00' + self._picture))
+        body = b''.join(frames) + bytes(self.padding)
+        return b'ID3\x03\x00\x00' + _syncsafe(len(body)) + body
+
+    def size(self, path):
+        indices = self._files[path]
+        return len(self.read(path)) if indices is None else len(self.tag(*indices)) + len(self._audio)
+
+    def tree(self):
+        """Git Trees API response for the whole library"""
+        entries = [{'path': SONGS_PATH, 'type': 'tree', 'sha': self.sha(SONGS_PATH)}]
+        for a in range(self.artists):
+            folder = f"{SONGS_PATH}/{self.artist_name(a)}"
+            entries.append({'path': folder, 'type': 'tree', 'sha': self.sha(folder)})
+        entries.extend({'path': path, 'type': 'blob', 'sha': self.sha(path), 'size': self.size(path)}
+                       for path in self.paths)
+        entries.sort(key=lambda entry: entry['path'])
+        return {'sha': self.sha(''), 'tree': entries, 'truncated': False}
+
+    def contents(self, path, raw_base):
+        """Contents API listing of a directory, or None if there is no such directory"""
+        path = path.strip('/')
+        names = {}
+        for file_path in self.paths:
+            if not file_path.startswith(path + '/'):
+                continue
+            rest = file_path[len(path) + 1:]
+            name, _, below = rest.partition('/')
+            names[name] = 'dir' if below else 'file'
+        if not names:
+            return None
+        items = []
+        for name, kind in sorted(names.items()):
+            item_path = f"{path}/{name}"
+            item = {'name': name, 'path': item_path, 'type': kind, 'sha': self.sha(item_path)}
+            if kind == 'file':
+                item['size'] = self.size(item_path)
+                item['download_url'] = f"{raw_base}/{REPO}/{BRANCH}/{quote(item_path)}"
+            items.append(item)
+        return items
+
+
+class FakeGitHub:
+    """Serves a SyntheticLibrary on localhost in a background thread
+
+    ``latency`` (seconds) delays every response and ``bandwidth`` (bytes per
+    second, per response) caps how fast bodies are sent. ``truncated``
+    makes the Trees API report a truncated tree, forcing the contents walk.
+    """
+
+    def __init__(self, library, latency=0.0, bandwidth=None, truncated=False, port=0):
+        self.library = library
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.truncated = truncated
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._tree = None
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_base(self):
+        return self.base_url
+
+    @property
+    def raw_base(self):
+        return self.base_url + '/raw'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-github", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def tree(self):
+        if self._tree is None:
+            tree = self.library.tree()
+            tree['truncated'] = self.truncated
+            body = json.dumps(tree).encode('utf-8')
+            self._tree = (body, '"' + hashlib.sha1(body).hexdigest() + '"')
+        return self._tree
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep-alive, like GitHub
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                with fake._lock:
+                    fake.requests += 1
+                if fake.latency:
+                    time.sleep(fake.latency)
+                url = urlsplit(self.path)
+                path = unquote(url.path)
+                tree_prefix = f"/repos/{REPO}/git/trees/"
+                contents_prefix = f"/repos/{REPO}/contents/"
+                raw_prefix = f"/raw/{REPO}/{BRANCH}/"
+                if path.startswith(tree_prefix):
+                    body, etag = fake.tree()
+                    if self.headers.get('If-None-Match') == etag:
+                        self._send(304, b'', {'ETag': etag})
+                    else:
+                        self._send(200, body, {'ETag': etag, 'Content-Type': 'application/json'})
+                elif path.startswith(contents_prefix):
+                    items = fake.library.contents(path[len(contents_prefix):], fake.raw_base)
+                    if items is None:
+                        self._send(404, b'{"message": "Not Found"}', {'Content-Type': 'application/json'})
+                    else:
+                        self._send(200, json.dumps(items).encode('utf-8'), {'Content-Type': 'application/json'})
+                elif path.startswith(raw_prefix) and path[len(raw_prefix):] in fake.library:
+                    self._send_file(fake.library.read(path[len(raw_prefix):]))
+                else:
+                    self._send(404, b'404: Not Found', {'Content-Type': 'text/plain'})
+
+            def _send_file(self, data):
+                match = re.fullmatch(r'bytes=(\d*)-(\d*)', self.headers.get('Range') or '')
+                if not match or not any(match.groups()):
+                    self._send(200, data, {'Content-Type': 'audio/mpeg', 'Accept-Ranges': 'bytes'})
+                    return
+                first, last = match.groups()
+                if first:
+                    start, end = int(first), min(int(last) if last else len(data) - 1, len(data) - 1)
+                else:
+                    start, end = max(0, len(data) - int(last)), len(data) - 1  # Suffix range
+                if start >= len(data):
+                    self._send(416, b'', {'Content-Range': f"bytes */{len(data)}"})
+                    return
+                self._send(206, data[start:end + 1], {'Content-Type': 'audio/mpeg',
+                                                     'Content-Range': f"bytes {start}-{end}/{len(data)}"})
+
+            def _send(self, status, body, headers):
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                started = time.monotonic()
+                sent = 0
+                view = memoryview(body)
+                try:
+                    while sent < len(body):
+                        chunk = view[sent:sent + SEND_CHUNK]
+                        self.wfile.write(chunk)
+                        sent += len(chunk)
+                        if fake.bandwidth:
+                            ahead = sent / fake.bandwidth - (time.monotonic() - started)
+                            if ahead > 0:
+                                time.sleep(ahead)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # Client stopped reading, e.g. a cancelled download
+                finally:
+                    with fake._lock:
+                        fake.bytes_sent += sent
+
+        return Handler
+
+
+def add_arguments(parser):
+    """Library and network options shared with ``benchmark.py``"""
+    parser.add_argument('--artists', type=int, default=20, help="artist folders (default 20)")
+    parser.add_argument('--tracks', type=int, default=10, help="songs per artist (default 10)")
+    parser.add_argument('--seconds', type=float, default=30, help="length of each song (default 30)")
+    parser.add_argument('--picture-kb', type=int, default=64, help="embedded artwork per song, 0 for none (default 64)")
+    parser.add_argument('--latency-ms', type=float, default=0, help="delay before every response")
+    parser.add_argument('--bandwidth-kbps', type=float, default=0,
+                        help="cap on each response's transfer rate in KB/s (default: unlimited)")
+    parser.add_argument('--truncated', action='store_true',
+                        help="report a truncated tree so discovery walks the contents API")
+
+
+def from_arguments(args, port=0):
+    library = SyntheticLibrary(args.artists, args.tracks, seconds=args.seconds, picture_bytes=args.picture_kb * 1024)
+    return FakeGitHub(library, latency=args.latency_ms / 1000.0,
+                      bandwidth=args.bandwidth_kbps * 1024 if args.bandwidth_kbps else None,
+                      truncated=args.truncated, port=port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a synthetic song library over a fake GitHub API.")
+    parser.add_argument('--port', type=int, default=8765, help="port to listen on (default 8765, 0 for any)")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = from_arguments(args, port=args.port).start()
+    print(f"MP3_PLAYER_GITHUB_REPO={REPO}")
+    print(f"MP3_PLAYER_API_BASE={server.api_base}")
+    print(f"MP3_PLAYER_RAW_BASE={server.raw_base}")
+    print(f"songs_path={SONGS_PATH} ({args.artists * args.tracks} songs)", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""Discover the MP3 files under the repository's Songs folder on GitHub.
+
+The preferred path is a single recursive Git Trees call, sent with the last
+ETag so an unchanged repository answers ``304 Not Modified`` at almost no
+cost. If the tree is unavailable or truncated, discovery falls back to the
+per-directory walk over the contents API.
+
+Image files found next to the songs are kept as per-folder artwork.
+
+All base URLs are configurable so discovery can run against a local
+stand-in server.
+"""
+
+import json
+import os
+import posixpath
+import tempfile
+from urllib.parse import quote
+
+import id3_reader
+import tracing
+
+DEFAULT_API_BASE = "https://api.github.com"
+DEFAULT_RAW_BASE = "https://raw.githubusercontent.com"
+DEFAULT_REPO = "justAleks0/MP3-Player"
+DEFAULT_BRANCH = "main"
+DEFAULT_SONGS_PATH = "MP3 Player/Songs"
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+ARTWORK_NAMES = ('cover', 'folder', 'front', 'album', 'artwork')  # Preferred when a folder has several images
+
+
+class GitHubSourceError(Exception):
+    """Raised when the repository listing cannot be fetched at all"""
+
+    def __init__(self, status_code, message=None):
+        self.status_code = status_code
+        super().__init__(message or f"GitHub returned {status_code}")
+
+
+def file_info(path, url, sha):
+    """File info dict in the shape the scanner expects"""
+    directory, name = posixpath.split(path)
+    return {
+        'url': url,
+        'name': name,
+        'sha': sha,
+        'path': directory,
+        'folder': posixpath.basename(directory)
+    }
+
+
+def pick_folder_images(images):
+    """``{folder path: file info}`` with one image per folder, preferring names like cover.jpg"""
+    def rank(image):
+        stem = posixpath.splitext(image['name'])[0].lower()
+        return (stem not in ARTWORK_NAMES, image['name'].lower())
+
+    chosen = {}
+    for image in sorted(images, key=rank):
+        chosen.setdefault(image['path'], image)
+    return chosen
+
+
+def _requests_get(url, **kwargs):
+    """``requests.get``, importing requests on first use rather than at startup"""
+    import requests
+    return requests.get(url, **kwargs)
+
+
+class GitHubSource:
+    """Lists MP3 files in a GitHub repository folder"""
+
+    def __init__(self, repo=DEFAULT_REPO, branch=DEFAULT_BRANCH, songs_path=DEFAULT_SONGS_PATH,
+                 api_base=DEFAULT_API_BASE, raw_base=DEFAULT_RAW_BASE,
+                 cache_path=None, get=None):
+        self.repo = repo
+        self.branch = branch
+        self.songs_path = songs_path.strip('/')
+        self.api_base = api_base.rstrip('/')
+        self.raw_base = raw_base.rstrip('/')
+        self.cache_path = cache_path
+        self.get = get or _requests_get
+
+        # Last tree listing and its ETag, persisted so a restart can send If-None-Match
+        self.etag = None
+        self.cached_files = None
+        self.cached_images = []
+        self.folder_images = {}  # Folder path -> image file info, from the last discovery
+        self.last_discovery = None  # 'tree', 'tree-304' or 'contents'
+        self.load_cache()
+
+    @classmethod
+    def from_settings(cls, settings, **kwargs):
+        """Build a source from player settings, with environment overrides for testing"""
+        return cls(
+            repo=os.environ.get('MP3_PLAYER_GITHUB_REPO', settings.get('github_repo', DEFAULT_REPO)),
+            branch=os.environ.get('MP3_PLAYER_GITHUB_BRANCH', settings.get('github_branch', DEFAULT_BRANCH)),
+            songs_path=settings.get('songs_path', DEFAULT_SONGS_PATH),
+            api_base=os.environ.get('MP3_PLAYER_API_BASE', settings.get('github_api_base', DEFAULT_API_BASE)),
+            raw_base=os.environ.get('MP3_PLAYER_RAW_BASE', settings.get('github_raw_base', DEFAULT_RAW_BASE)),
+            **kwargs
+        )
+
+    def contents_url(self, path):
+        return f"{self.api_base}/repos/{self.repo}/contents/{quote(path)}"
+
+    def tree_url(self):
+        return f"{self.api_base}/repos/{self.repo}/git/trees/{quote(self.branch)}?recursive=1"
+
+    def raw_url(self, path):
+        return f"{self.raw_base}/{self.repo}/{quote(self.branch)}/{quote(path)}"
+
+    def load_cache(self):
+        if not self.cache_path:
+            return
+        try:
+            with open(self.cache_path, 'r') as f:
+                data = json.load(f)
+            self.etag = data.get('etag')
+            self.cached_files = data.get('files')
+            self.cached_images = data.get('images', [])
+        except (OSError, ValueError):
+            self.etag = None
+            self.cached_files = None
+            self.cached_images = []
+        self.folder_images = pick_folder_images(self.cached_images)
+
+    def save_cache(self):
+        if not self.cache_path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.cache_path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'etag': self.etag, 'files': self.cached_files, 'images': self.cached_images}, f)
+            os.replace(temp_path, self.cache_path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+    def discover(self):
+        """All MP3 files under the songs folder, preferring the Trees API"""
+        import requests
+
+        try:
+            files = self.list_tree()
+            if files is not None:
+                return files
+        except requests.RequestException as e:
+            tracing.swallowed('tree listing', e)
+        self.last_discovery = 'contents'
+        return self.walk_contents()
+
+    def list_tree(self):
+        """List files with one recursive Trees call, or None if the tree is unusable"""
+        headers = {}
+        if self.etag and self.cached_files is not None:
+            headers['If-None-Match'] = self.etag
+
+        response = self.get(self.tree_url(), headers=headers)
+        if response.status_code == 304:
+            self.last_discovery = 'tree-304'
+            return list(self.cached_files)
+        if response.status_code != 200:
+            return None
+
+        tree = response.json()
+        if tree.get('truncated'):
+            return None  # Too large for one response; the walk sees everything
+
+        prefix = self.songs_path + '/'
+        files = []
+        images = []
+        for entry in tree.get('tree', []):
+            path = entry.get('path', '')
+            if entry.get('type') != 'blob' or not path.startswith(prefix):
+                continue
+            if path.lower().endswith('.mp3'):
+                files.append(file_info(path, self.raw_url(path), entry.get('sha')))
+            elif path.lower().endswith(IMAGE_EXTENSIONS):
+                images.append(file_info(path, self.raw_url(path), entry.get('sha')))
+        files.sort(key=lambda f: (f['path'], f['name']))
+
+        self.etag = response.headers.get('ETag')
+        self.cached_files = files
+        self.cached_images = images
+        self.folder_images = pick_folder_images(images)
+        self.save_cache()
+        self.last_discovery = 'tree'
+        return list(files)
+
+    def read_tags(self, url, metadata):
+        """Fill ``metadata`` from a song's tags, fetching only the tag bytes with Range requests"""
+        return id3_reader.parse_tag_buffer(id3_reader.fetch_tag_buffer(url, get=self.get), metadata)
+
+    def walk_contents(self, contents=None, path=None):
+        """Recursively list files with one contents API call per directory"""
+        path = path or self.songs_path
+        if contents is None:
+            response = self.get(self.contents_url(path))
+            if response.status_code != 200:
+                raise GitHubSourceError(response.status_code)
+            contents = response.json()
+
+        import requests
+
+        all_files = []
+        images = []
+
+        def scan_directory(items, current_path):
+            for item in items:
+                if item['type'] == 'file' and item['name'].lower().endswith('.mp3'):
+                    all_files.append(file_info(f"{current_path}/{item['name']}",
+                                               item['download_url'], item.get('sha')))
+                elif item['type'] == 'file' and item['name'].lower().endswith(IMAGE_EXTENSIONS):
+                    images.append(file_info(f"{current_path}/{item['name']}",
+                                            item['download_url'], item.get('sha')))
+                elif item['type'] == 'dir':
+                    try:
+                        subdir_path = f"{current_path}/{item['name']}"
+                        subdir_response = self.get(self.contents_url(subdir_path))
+                        if subdir_response.status_code == 200:
+                            scan_directory(subdir_response.json(), subdir_path)
+                    except requests.RequestException as e:
+                        tracing.swallowed('contents walk', e)  # Skip this folder
+
+        scan_directory(contents, path)
+        self.folder_images = pick_folder_images(images)
+        return all_files
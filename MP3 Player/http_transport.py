@@ -0,0 +1,222 @@
+"""Shared HTTP transport used by every network path in the player.
+
+One pooled keep-alive ``requests.Session`` is reused for discovery, metadata
+and audio downloads. Every request gets connect/read timeouts, transient
+failures are retried with jittered exponential backoff, and GitHub's
+``X-RateLimit-Remaining``/``Retry-After`` headers throttle further requests
+to the same host. Per-host counters record requests, bytes and retries.
+
+``requests`` is imported when the first request is made, not at startup.
+"""
+
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import tracing
+
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 30.0
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_POOL_SIZE = 16
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+MAX_THROTTLE_WAIT = 300.0  # Never sleep longer than this on a rate limit
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class HostStats:
+    """Counters for one host"""
+
+    __slots__ = ('requests', 'bytes', 'retries', 'errors', 'throttled_seconds')
+
+    def __init__(self):
+        self.requests = 0
+        self.bytes = 0
+        self.retries = 0
+        self.errors = 0
+        self.throttled_seconds = 0.0
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Transport:
+    """Pooled, rate-limit-aware HTTP client with per-host statistics"""
+
+    def __init__(self, connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT,
+                 max_retries=DEFAULT_MAX_RETRIES, pool_size=DEFAULT_POOL_SIZE, headers=None):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.pool_size = pool_size
+        self.headers = headers or {}
+        self._session = None
+        self._session_lock = threading.Lock()
+
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._blocked_until = {}  # host -> time.monotonic() before which we should not send
+
+    @classmethod
+    def from_settings(cls, settings):
+        headers = {}
+        if settings.get('github_token'):
+            headers['Authorization'] = f"token {settings['github_token']}"
+        return cls(
+            connect_timeout=float(settings.get('connect_timeout', DEFAULT_CONNECT_TIMEOUT)),
+            read_timeout=float(settings.get('read_timeout', DEFAULT_READ_TIMEOUT)),
+            max_retries=int(settings.get('http_retries', DEFAULT_MAX_RETRIES)),
+            pool_size=max(DEFAULT_POOL_SIZE, int(settings.get('metadata_workers', 8))),
+            headers=headers
+        )
+
+    @property
+    def session(self):
+        """The pooled session, created on first use"""
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers.update(self.headers)
+                self._session = session
+            return self._session
+
+    def _host_stats(self, host):
+        stats = self._stats.get(host)
+        if stats is None:
+            stats = self._stats[host] = HostStats()
+        return stats
+
+    def _wait_for_host(self, host):
+        """Sleep while a host is rate limited"""
+        with self._lock:
+            wait = self._blocked_until.get(host, 0) - time.monotonic()
+            if wait > 0:
+                self._host_stats(host).throttled_seconds += wait
+        if wait > 0:
+            time.sleep(min(wait, MAX_THROTTLE_WAIT))
+
+    def _block_host(self, host, seconds):
+        with self._lock:
+            until = time.monotonic() + min(max(seconds, 0), MAX_THROTTLE_WAIT)
+            self._blocked_until[host] = max(self._blocked_until.get(host, 0), until)
+
+    @staticmethod
+    def _retry_after(response):
+        """Seconds the server asked us to wait, from Retry-After or the rate-limit reset"""
+        value = response.headers.get('Retry-After')
+        if value:
+            if value.isdigit():
+                return float(value)
+            from email.utils import parsedate_to_datetime
+            try:
+                return parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                pass
+        if response.headers.get('X-RateLimit-Remaining') == '0':
+            reset = response.headers.get('X-RateLimit-Reset')
+            if reset and reset.isdigit():
+                return int(reset) - time.time()
+        return None
+
+    def _observe_rate_limit(self, host, response):
+        """Throttle the host when the server reports we are out of (or nearly out of) quota"""
+        delay = self._retry_after(response)
+        if delay is not None:
+            self._block_host(host, delay)
+            return
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        reset = response.headers.get('X-RateLimit-Reset')
+        if remaining and remaining.isdigit() and reset and reset.isdigit():
+            remaining = int(remaining)
+            window = int(reset) - time.time()
+            if 0 < remaining < 10 and window > 0:
+                # Spread what is left of the quota over the rest of the window
+                self._block_host(host, window / remaining)
+
+    @staticmethod
+    def _is_retryable(response):
+        if response.status_code in RETRY_STATUSES:
+            return True
+        return response.status_code == 403 and response.headers.get('X-RateLimit-Remaining') == '0'
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+    def _count_body(self, host, response):
+        """Count a streamed body's bytes as the caller reads them"""
+        iter_content = response.iter_content
+
+        def counting_iter_content(*args, **kwargs):
+            for chunk in iter_content(*args, **kwargs):
+                if isinstance(chunk, bytes):
+                    with self._lock:
+                        self._host_stats(host).bytes += len(chunk)
+                    tracing.count('http bytes', len(chunk))
+                yield chunk
+
+        response.iter_content = counting_iter_content
+
+    def get(self, url, **kwargs):
+        """``requests.get`` with pooling, timeouts, retries and throttling"""
+        import requests
+
+        kwargs.setdefault('timeout', self.timeout)
+        if kwargs['timeout'] is None:
+            kwargs['timeout'] = self.timeout
+        host = urlsplit(url).netloc
+
+        attempt = 0
+        while True:
+            self._wait_for_host(host)
+            with self._lock:
+                self._host_stats(host).requests += 1
+            tracing.count('http requests')
+            try:
+                response = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                with self._lock:
+                    self._host_stats(host).errors += 1
+                if attempt >= self.max_retries:
+                    raise
+            else:
+                self._observe_rate_limit(host, response)
+                if not self._is_retryable(response) or attempt >= self.max_retries:
+                    if kwargs.get('stream'):
+                        self._count_body(host, response)
+                    else:
+                        with self._lock:
+                            self._host_stats(host).bytes += len(response.content)
+                        tracing.count('http bytes', len(response.content))
+                    return response
+                response.close()
+                with self._lock:
+                    self._host_stats(host).errors += 1
+
+            with self._lock:
+                self._host_stats(host).retries += 1
+            tracing.count('http retries')
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def stats(self):
+        """Per-host counters as plain dicts"""
+        with self._lock:
+            return {host: stats.as_dict() for host, stats in self._stats.items()}
+
+    def totals(self):
+        totals = HostStats().as_dict()
+        for stats in self.stats().values():
+            for name, value in stats.items():
+                totals[name] += value
+        return totals
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
@@ -0,0 +1,399 @@
+"""Read MP3 tags over HTTP with Range requests, or from local files, without reading whole files.
+
+A typical scan only needs the ID3v2 tag at the start of a file (usually a few
+KB) plus the first MPEG frame for duration/bitrate. The reader fetches:
+
+1. the 10-byte ID3v2 header, which also tells us the total file size,
+2. exactly the tag body plus a small probe of audio frames,
+3. the trailing 128-byte ID3v1 block, only when there is no ID3v2 tag.
+
+Everything is parsed from an in-memory buffer. If the server ignores Range
+and answers 200 with the whole file, the body is read only as far as needed
+and the connection is closed. Local files are memory-mapped and the same
+three pieces are sliced out of the mapping.
+
+The common ID3v2.3/2.4 text frames are decoded directly from the buffer,
+skipping over pictures and other large frames; mutagen only reads the MPEG
+frame header then. Anything unusual (ID3v1 only, ID3v2.2, unsynchronised or
+compressed frames) falls back to parsing the whole tag with mutagen.
+"""
+
+import io
+import mmap
+import os
+import re
+
+ID3V2_HEADER_SIZE = 10
+ID3V1_SIZE = 128
+AUDIO_PROBE_SIZE = 4096  # Room for the first frame and its Xing/Info/VBRI header
+CHUNK_SIZE = 8192
+
+_CONTENT_RANGE_RE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+|\*)")
+
+# Text frames that fill in metadata fields, plus the ID3v2.3 date frames mutagen turns into TDRC
+TEXT_FRAMES = {b"TPE1", b"TIT2", b"TALB", b"TDRC", b"TCON", b"TYER", b"TDAT"}
+TEXT_ENCODINGS = {0: "latin-1", 1: "utf-16", 2: "utf-16-be", 3: "utf-8"}
+
+
+class TagBuffer:
+    """Bytes needed to parse a remote MP3's tags, held in memory"""
+
+    def __init__(self):
+        self.data = b""
+        self.total_size = None  # Full file size, when the server reported it
+        self.audio_offset = 0  # Where MPEG audio starts in the original file
+        self.has_id3v1 = False
+        self.bytes_transferred = 0
+        self.used_range = True
+
+
+def id3v2_tag_size(header):
+    """Size of an ID3v2 tag (header included) from its first 10 bytes, or 0"""
+    if len(header) < ID3V2_HEADER_SIZE or header[:3] != b"ID3":
+        return 0
+    size_bytes = header[6:10]
+    if any(b & 0x80 for b in size_bytes):
+        return 0  # Not a valid syncsafe integer
+    size = (size_bytes[0] << 21) | (size_bytes[1] << 14) | (size_bytes[2] << 7) | size_bytes[3]
+    size += ID3V2_HEADER_SIZE
+    if header[5] & 0x10:
+        size += ID3V2_HEADER_SIZE  # Footer present
+    return size
+
+
+def _total_size_from(response):
+    match = _CONTENT_RANGE_RE.match(response.headers.get("Content-Range", ""))
+    if match and match.group(3) != "*":
+        return int(match.group(3))
+    return None
+
+
+def _fetch_range(get, url, start, end, timeout):
+    """Fetch bytes [start, end] (inclusive, end may be None for a suffix) or None if unsupported"""
+    if start is None:
+        range_header = f"bytes=-{end}"
+    else:
+        range_header = f"bytes={start}-{end}"
+    response = get(url, headers={"Range": range_header}, stream=True, timeout=timeout)
+    if response.status_code != 206:
+        # Range ignored (or an error): leave the body unread for the caller
+        try:
+            response.raise_for_status()
+        except Exception:
+            response.close()
+            raise
+        return None, response
+    try:
+        return response.content, response
+    finally:
+        response.close()
+
+
+def _read_prefix(response, buffer):
+    """Fallback for servers without Range: read only the head of a 200 body"""
+    data = bytearray()
+    wanted = ID3V2_HEADER_SIZE
+    try:
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            data.extend(chunk)
+            if len(data) >= ID3V2_HEADER_SIZE and wanted == ID3V2_HEADER_SIZE:
+                wanted = id3v2_tag_size(bytes(data[:ID3V2_HEADER_SIZE])) + AUDIO_PROBE_SIZE
+            if len(data) >= wanted:
+                break
+    finally:
+        response.close()
+
+    length = response.headers.get("Content-Length")
+    if length and length.isdigit():
+        buffer.total_size = int(length)
+    buffer.bytes_transferred += len(data)
+    buffer.data = bytes(data[:wanted])
+    buffer.audio_offset = id3v2_tag_size(buffer.data[:ID3V2_HEADER_SIZE])
+    buffer.used_range = False
+    return buffer
+
+
+def fetch_tag_buffer(url, get=None, timeout=None):
+    """Download just enough of ``url`` to read its tags and return a TagBuffer"""
+    if get is None:
+        import requests
+        get = requests.get
+    buffer = TagBuffer()
+
+    header, response = _fetch_range(get, url, 0, ID3V2_HEADER_SIZE - 1, timeout)
+    if header is None:
+        return _read_prefix(response, buffer)
+    buffer.bytes_transferred += len(header)
+    buffer.total_size = _total_size_from(response)
+
+    tag_size = id3v2_tag_size(header)
+    buffer.audio_offset = tag_size
+
+    # Tag body plus the first audio frames, in a single request
+    end = tag_size + AUDIO_PROBE_SIZE - 1
+    if buffer.total_size is not None:
+        end = min(end, buffer.total_size - 1)
+    body = b""
+    if end >= ID3V2_HEADER_SIZE:
+        body, response = _fetch_range(get, url, ID3V2_HEADER_SIZE, end, timeout)
+        if body is None:
+            # Keep the header's bytes in the transfer count; the prefix read replaces the data
+            buffer.data = b""
+            return _read_prefix(response, buffer)
+        buffer.bytes_transferred += len(body)
+    buffer.data = header + body
+
+    # No ID3v2 tag: the only tags can be in the trailing ID3v1 block
+    if tag_size == 0 and (buffer.total_size is None or buffer.total_size > len(buffer.data)):
+        trailer, response = _fetch_range(get, url, None, ID3V1_SIZE, timeout)
+        if trailer is None:
+            response.close()  # Range ignored: don't read the whole file for 128 bytes
+        else:
+            buffer.bytes_transferred += len(trailer)
+            if trailer[:3] == b"TAG":
+                buffer.data += trailer
+                buffer.has_id3v1 = True
+
+    return buffer
+
+
+def read_file_tags(path, metadata):
+    """Fill ``metadata`` from a local file's tags, reading through a memory map
+
+    Text frames are decoded straight from the mapping, so pictures and the
+    audio are never copied. Returns the TagBuffer, without its data.
+    """
+    buffer = TagBuffer()
+    buffer.used_range = False
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        buffer.total_size = size
+        if size == 0:
+            return buffer  # Empty files can't be mapped
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            tag_size = id3v2_tag_size(view[:ID3V2_HEADER_SIZE])
+            buffer.audio_offset = tag_size
+            buffer.data = view
+            frames = read_text_frames(view)
+            if frames is None:
+                # mutagen reads from a copy of the same slices an HTTP scan fetches
+                buffer.data = view[:tag_size + AUDIO_PROBE_SIZE]
+                if tag_size == 0 and size > len(buffer.data) and view[size - ID3V1_SIZE:size - ID3V1_SIZE + 3] == b"TAG":
+                    buffer.data += view[size - ID3V1_SIZE:]
+                    buffer.has_id3v1 = True
+                buffer.bytes_transferred = len(buffer.data)
+            _parse(buffer, frames, metadata)
+            buffer.data = b""  # Drop the reference before the map closes
+    return buffer
+
+
+def _decode_text(frame):
+    """Values of a text frame body, joined like mutagen's ``str(frame)``"""
+    codec = TEXT_ENCODINGS.get(frame[0]) if frame else None
+    if codec is None:
+        raise ValueError("unknown text encoding")
+    values = [value.lstrip("\ufeff") for value in bytes(frame[1:]).decode(codec).split("\x00")]
+    while values and not values[-1]:
+        values.pop()
+    return values
+
+
+def read_text_frames(data):
+    """``{frame id: [values]}`` for TEXT_FRAMES in an ID3v2.3/2.4 tag at the start of ``data``
+
+    Returns None when the tag needs mutagen: no ID3v2 tag, another version,
+    unsynchronisation, or compressed or encrypted frames.
+    """
+    tag_size = id3v2_tag_size(data[:ID3V2_HEADER_SIZE])
+    if tag_size == 0 or data[3] not in (3, 4) or data[5] & 0x80 or len(data) < tag_size:
+        return None
+    version = data[3]
+    end = tag_size - (ID3V2_HEADER_SIZE if data[5] & 0x10 else 0)
+    pos = ID3V2_HEADER_SIZE
+    if data[5] & 0x40:
+        # Extended header: v2.4 counts its own size field, v2.3 doesn't
+        extended = int.from_bytes(data[pos:pos + 4], "big")
+        pos += _syncsafe(data[pos:pos + 4]) if version == 4 else extended + 4
+
+    frames = {}
+    try:
+        while pos + ID3V2_HEADER_SIZE <= end:
+            frame_id = bytes(data[pos:pos + 4])
+            if frame_id[0] == 0:
+                break  # Padding
+            if not frame_id.isalnum():
+                return None
+            size_bytes = data[pos + 4:pos + 8]
+            if version == 4:
+                if any(b & 0x80 for b in size_bytes):
+                    return None
+                size = _syncsafe(size_bytes)
+            else:
+                size = int.from_bytes(size_bytes, "big")
+            start = pos + ID3V2_HEADER_SIZE
+            pos = start + size
+            if pos > end:
+                return None
+            if frame_id in TEXT_FRAMES and size and frame_id not in frames:
+                # Grouped, compressed, encrypted, unsynchronised or length-prefixed
+                if data[start - 1] & (0x4F if version == 4 else 0xE0):
+                    return None
+                frames[frame_id] = _decode_text(data[start:pos])
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+    if version == 3 and b"TDRC" not in frames:
+        # mutagen's update_to_v24: a bare year becomes TDRC, a full date doesn't parse as a year
+        year = frames.get(b"TYER", [""])[0]
+        day = frames.get(b"TDAT", [""])[0]
+        if re.fullmatch(r"[0-9]{4}", year) and not re.fullmatch(r"[0-9]{4}", day):
+            frames[b"TDRC"] = [year]
+    return frames
+
+
+def _syncsafe(size_bytes):
+    return (size_bytes[0] << 21) | (size_bytes[1] << 14) | (size_bytes[2] << 7) | size_bytes[3]
+
+
+def _has_vbr_header(buffer):
+    """Whether the probed audio carries a frame count (Xing/Info/VBRI)"""
+    probe = buffer.data[buffer.audio_offset:buffer.audio_offset + AUDIO_PROBE_SIZE]
+    return b"Xing" in probe or b"Info" in probe or b"VBRI" in probe
+
+
+def format_duration(seconds):
+    minutes = int(seconds // 60)
+    seconds = int(seconds % 60)
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+def parse_duration(text):
+    """Seconds from a format_duration string, or None"""
+    try:
+        minutes, seconds = text.split(':')
+        return int(minutes) * 60 + int(seconds)
+    except (AttributeError, ValueError):
+        return None
+
+
+def parse_tag_buffer(buffer, metadata):
+    """Fill ``metadata`` in place from a TagBuffer and return it"""
+    return _parse(buffer, read_text_frames(buffer.data), metadata)
+
+
+def _parse(buffer, frames, metadata):
+    """parse_tag_buffer, given read_text_frames' result for the buffer"""
+    # Imported on first use so startup doesn't pay for mutagen
+    from mutagen.id3 import ID3
+    from mutagen.mp3 import MP3
+
+    if buffer.total_size:
+        metadata['filesize'] = f"{buffer.total_size / (1024 * 1024):.1f} MB"
+
+    if frames is not None:
+        return _parse_with_text_frames(buffer, frames, metadata)
+
+    tags = None
+    try:
+        audio = MP3(io.BytesIO(buffer.data))
+        tags = audio.tags
+        _fill_audio_info(buffer, audio.info, metadata)
+    except Exception:
+        # No MPEG frame in the probe; tags may still be readable
+        try:
+            tags = ID3(io.BytesIO(buffer.data))
+        except Exception:
+            tags = None
+
+    if tags:
+        # Artist
+        if 'TPE1' in tags:
+            metadata['artist'] = str(tags['TPE1'])
+        elif 'artist' in tags:
+            metadata['artist'] = str(tags['artist'])
+
+        # Title
+        if 'TIT2' in tags:
+            metadata['title'] = str(tags['TIT2'])
+        elif 'title' in tags:
+            metadata['title'] = str(tags['title'])
+
+        # Album
+        if 'TALB' in tags:
+            metadata['album'] = str(tags['TALB'])
+        elif 'album' in tags:
+            metadata['album'] = str(tags['album'])
+
+        # Year
+        if 'TDRC' in tags:
+            year_str = str(tags['TDRC'])
+            if year_str.isdigit():
+                metadata['year'] = year_str
+        elif 'year' in tags:
+            metadata['year'] = str(tags['year'])
+
+        # Genre
+        if 'TCON' in tags:
+            metadata['genre'] = str(tags['TCON'])
+        elif 'genre' in tags:
+            metadata['genre'] = str(tags['genre'])
+
+    return metadata
+
+
+def _parse_with_text_frames(buffer, frames, metadata):
+    """parse_tag_buffer for tags read_text_frames could decode"""
+    from mutagen.id3 import TCON
+    from mutagen.mp3 import MPEGInfo
+
+    try:
+        probe = buffer.data[buffer.audio_offset:buffer.audio_offset + AUDIO_PROBE_SIZE]
+        _fill_audio_info(buffer, MPEGInfo(io.BytesIO(probe), 0), metadata)
+    except Exception:
+        pass  # No MPEG frame in the probe; the tags still count
+
+    for field, frame_id in (('artist', b"TPE1"), ('title', b"TIT2"), ('album', b"TALB")):
+        if frame_id in frames:
+            metadata[field] = "\x00".join(frames[frame_id])
+    if b"TDRC" in frames:
+        year_str = "\x00".join(frames[b"TDRC"])
+        if year_str.isdigit():
+            metadata['year'] = year_str
+    if b"TCON" in frames:
+        # Resolves "(17)"-style references the way mutagen does
+        metadata['genre'] = "\x00".join(TCON(encoding=3, text=frames[b"TCON"]).genres)
+    return metadata
+
+
+def _fill_audio_info(buffer, info, metadata):
+    """Duration and bitrate from mutagen's MPEG info for the probed audio"""
+    if info.length:
+        length = info.length
+        # Without a frame count mutagen estimates from the truncated buffer,
+        # so redo the CBR estimate against the real file size
+        if buffer.total_size and info.bitrate and not _has_vbr_header(buffer):
+            audio_bytes = buffer.total_size - buffer.audio_offset
+            if buffer.has_id3v1:
+                audio_bytes -= ID3V1_SIZE
+            length = audio_bytes * 8 / info.bitrate
+        metadata['duration'] = format_duration(length)
+
+    if info.bitrate:
+        if info.bitrate < 1000:
+            metadata['bitrate'] = f"{info.bitrate} bps"
+        else:
+            metadata['bitrate'] = f"{info.bitrate / 1000:.0f} kbps"
+
+
+def embedded_artwork(tag):
+    """Image bytes of the front cover (else the first picture) in an ID3v2 tag, or None"""
+    from mutagen.id3 import ID3
+
+    try:
+        pictures = ID3(io.BytesIO(tag)).getall('APIC')
+    except Exception:
+        return None
+    if not pictures:
+        return None
+    front = next((picture for picture in pictures if picture.type == 3), pictures[0])
+    return front.data or None
@@ -0,0 +1,99 @@
+"""Insert songs into the grouped playlist as their metadata arrives.
+
+The playlist is sorted into artist sections (artists alphabetically, songs
+by title within each artist). ``LibraryOrganizer`` keeps the sorted artist
+names and the start row of each section, so a new song is placed by two
+binary searches instead of regrouping the whole library. Whether an artist
+spans several folders (which adds ``[folder]`` to its rows) is tracked per
+artist with the first folder seen, so the check is O(1) per song.
+"""
+
+import bisect
+
+from playlist_model import Section, Track
+
+
+class LibraryOrganizer:
+    """Keeps a grouped PlaylistModel sorted while songs are added one by one"""
+
+    def __init__(self, model):
+        self.model = model
+        self.artists = []  # Sorted artist names, one per section
+        self.starts = []  # Row of each artist's section header
+        self.sizes = []  # Number of tracks in each section
+        self.first_folder = {}  # artist -> folder of its first song
+        self.multi_folder = set()  # Artists with songs in more than one folder
+
+        # Pick up sections that were loaded in bulk
+        for position, row in enumerate(model):
+            if not row.is_track:
+                self.artists.append(row.artist)
+                self.starts.append(position)
+                self.sizes.append(0)
+            elif self.sizes:
+                self.sizes[-1] += 1
+                self._note_folder(row.artist, row.folder)
+
+    def _note_folder(self, artist, folder):
+        """Record ``folder`` for ``artist``; True if this makes the artist multi-folder"""
+        first = self.first_folder.setdefault(artist, folder)
+        if first != folder and artist not in self.multi_folder:
+            self.multi_folder.add(artist)
+            return True
+        return False
+
+    def add(self, song):
+        """Insert a scanner song dict; returns ``(inserted, refreshed)`` row positions
+
+        ``inserted`` lists new rows in the order they were inserted, and
+        ``refreshed`` lists existing rows whose display text changed.
+        """
+        artist = song['metadata']['artist']
+        k = bisect.bisect_left(self.artists, artist)
+        inserted = []
+
+        if k == len(self.artists) or self.artists[k] != artist:
+            # New artist: header goes where the next section starts
+            start = self.starts[k] if k < len(self.starts) else len(self.model)
+            self.model.insert(start, Section(artist))
+            self.artists.insert(k, artist)
+            self.starts.insert(k, start)
+            self.sizes.insert(k, 0)
+            self._shift(k + 1, 1)
+            inserted.append(start)
+
+        became_multi_folder = self._note_folder(artist, song['folder'])
+        track = Track.from_song(song, show_folder=artist in self.multi_folder)
+        position = self._title_position(k, track.title)
+        self.model.insert(position, track)
+        self.sizes[k] += 1
+        self._shift(k + 1, 1)
+        inserted.append(position)
+
+        refreshed = []
+        if became_multi_folder:
+            # The artist now spans folders, so its other rows show the folder too
+            start = self.starts[k]
+            for row in range(start + 1, start + 1 + self.sizes[k]):
+                if row != position:
+                    self.model[row].show_folder = True
+                    refreshed.append(row)
+        return inserted, refreshed
+
+    def _title_position(self, k, title):
+        """Row to insert ``title`` at within section ``k``, after equal titles"""
+        rows = self.model
+        lo = self.starts[k] + 1
+        hi = lo + self.sizes[k]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if title < rows[mid].title:
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    def _shift(self, first, amount):
+        starts = self.starts
+        for i in range(first, len(starts)):
+            starts[i] += amount
@@ -0,0 +1,286 @@
+"""Discover songs and read their tags, with no UI involved.
+
+``LibraryScanner`` lists a source's MP3 files and reads each file's tags
+through a bounded worker pool, keeping throughput statistics as it goes.
+The player drives it for its library sync. It also runs on its own as a
+command-line catalog builder, so catalogs can be built (and scans
+benchmarked) on machines without a display:
+
+    python library_scanner.py catalog.jsonl
+    python library_scanner.py catalog.sqlite --workers 16 --repo owner/name
+    python library_scanner.py local.jsonl --local ~/Music
+    python library_scanner.py catalog.jsonl --trace scan-trace.json
+
+The player can then load the catalog instead of scanning (``catalog_path``
+in ``player_settings.json``).
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import catalog
+from github_source import GitHubSource, GitHubSourceError
+from http_transport import Transport
+from local_source import LocalSource
+import tracing
+from tracing import percentile
+
+DEFAULT_WORKERS = 8
+
+
+def default_metadata(name):
+    """Metadata used when a file's tags cannot be read"""
+    return {
+        'artist': 'Unknown Artist',
+        'title': name.replace('.mp3', ''),
+        'album': 'Unknown Album',
+        'year': 'Unknown',
+        'genre': 'Unknown',
+        'duration': 'Unknown',
+        'bitrate': 'Unknown',
+        'filesize': 'Unknown'
+    }
+
+
+class ScanStats:
+    """Counters and per-file latencies for one scan"""
+
+    def __init__(self):
+        self.files = 0
+        self.failures = 0
+        self.bytes = 0  # Transferred while reading tags
+        self.requests = 0
+        self.discovery_seconds = 0.0
+        self.metadata_seconds = 0.0
+        self.latencies = []  # Seconds per file
+        self._lock = threading.Lock()
+
+    def record(self, seconds, failed=False):
+        with self._lock:
+            self.files += 1
+            self.failures += failed
+            self.latencies.append(seconds)
+
+    @property
+    def files_per_second(self):
+        return self.files / self.metadata_seconds if self.metadata_seconds else 0.0
+
+    def as_dict(self):
+        latencies = sorted(self.latencies)
+        return {
+            'files': self.files,
+            'failures': self.failures,
+            'bytes': self.bytes,
+            'requests': self.requests,
+            'discovery_seconds': round(self.discovery_seconds, 3),
+            'metadata_seconds': round(self.metadata_seconds, 3),
+            'files_per_second': round(self.files_per_second, 1),
+            'latency_ms': {name: round(percentile(latencies, fraction) * 1000, 1)
+                           for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0))}
+        }
+
+    def report(self):
+        """Human-readable summary lines"""
+        stats = self.as_dict()
+        latency = stats['latency_ms']
+        lines = [
+            f"Discovery: {stats['discovery_seconds']:.2f} s",
+            f"Metadata: {stats['files']} files ({stats['failures']} failed) in {stats['metadata_seconds']:.2f} s, "
+            f"{stats['files_per_second']:.1f} files/s"
+        ]
+        if stats['requests']:  # Remote sources only
+            lines.append(f"Transferred: {stats['bytes'] / (1024 * 1024):.2f} MB in {stats['requests']} requests "
+                         f"({stats['bytes'] / max(stats['files'], 1) / 1024:.1f} KB/file)")
+        lines.append(f"Latency per file: p50 {latency['p50']} ms, p90 {latency['p90']} ms, "
+                     f"p99 {latency['p99']} ms, max {latency['max']} ms")
+        return lines
+
+
+class LibraryScanner:
+    """Lists a source's songs and reads their tags in parallel
+
+    ``source`` is a ``GitHubSource`` or ``LocalSource``. ``transport`` is the
+    ``Transport`` remote reads go through, for counting requests and bytes;
+    local sources don't need one.
+    """
+
+    def __init__(self, source, transport=None, workers=DEFAULT_WORKERS):
+        self.source = source
+        self.transport = transport
+        self.workers = max(1, workers)
+        self.stats = ScanStats()
+
+    @classmethod
+    def from_settings(cls, settings, transport, **source_kwargs):
+        source = GitHubSource.from_settings(settings, get=transport.get, **source_kwargs)
+        return cls(source, transport, workers=int(settings.get('metadata_workers', DEFAULT_WORKERS)))
+
+    def discover(self):
+        """All MP3 file infos in the source"""
+        started = time.perf_counter()
+        try:
+            with tracing.span('discover') as span:
+                files = self.source.discover()
+                span.set(files=len(files))
+                return files
+        finally:
+            self.stats.discovery_seconds += time.perf_counter() - started
+
+    def read_metadata(self, url, name):
+        """Tags of one file, falling back to defaults if they can't be read"""
+        metadata = default_metadata(name)
+        # Only the tag bytes are fetched (or mapped) and parsed in memory
+        return self.source.read_tags(url, metadata)
+
+    def _timed_metadata(self, file_info):
+        """``(metadata, failed)`` for one file"""
+        started = time.perf_counter()
+        try:
+            with tracing.span('metadata', file=file_info['name']):
+                metadata = self.read_metadata(file_info['url'], file_info['name'])
+            failed = False
+        except Exception as e:
+            # A failing file keeps its default metadata instead of aborting the scan
+            tracing.swallowed('metadata', e)
+            metadata = default_metadata(file_info['name'])
+            failed = True
+        self.stats.record(time.perf_counter() - started, failed)
+        return metadata, failed
+
+    def extract(self, all_files, on_song=None, on_progress=None):
+        """Song dicts for ``all_files``, in the same order
+
+        ``on_song(song)`` is called as soon as each song's metadata resolves,
+        and ``on_progress(completed, total, file_info)`` after every file.
+        """
+        total_files = len(all_files)
+        all_songs = [None] * total_files  # Filled by index so the original order is kept
+        if total_files == 0:
+            return all_songs
+
+        before = self.transport.totals() if self.transport else None
+        started = time.perf_counter()
+        completed = 0
+        with ThreadPoolExecutor(max_workers=min(self.workers, total_files),
+                                thread_name_prefix="metadata") as pool:
+            futures = {pool.submit(self._timed_metadata, file_info): i for i, file_info in enumerate(all_files)}
+
+            for future in as_completed(futures):
+                i = futures[future]
+                file_info = all_files[i]
+                metadata, failed = future.result()
+
+                # Add folder information to metadata for better organization
+                metadata['folder'] = file_info['folder']
+                metadata['file_path'] = file_info['path']
+
+                all_songs[i] = {
+                    'url': file_info['url'],
+                    'name': file_info['name'],
+                    'sha': file_info.get('sha'),
+                    'metadata': metadata,
+                    'folder': file_info['folder']
+                }
+                if failed:
+                    all_songs[i]['metadata_failed'] = True  # Defaults only; read again on the next sync
+                if on_song:
+                    on_song(all_songs[i])
+                completed += 1
+                if on_progress:
+                    on_progress(completed, total_files, file_info)
+
+        self.stats.metadata_seconds += time.perf_counter() - started
+        if self.transport:
+            after = self.transport.totals()
+            self.stats.bytes += after['bytes'] - before['bytes']
+            self.stats.requests += after['requests'] - before['requests']
+        return all_songs
+
+    def scan(self, on_song=None, on_progress=None):
+        """Discover and read every song in the source"""
+        return self.extract(self.discover(), on_song=on_song, on_progress=on_progress)
+
+
+def load_settings(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scan a song source and write a catalog the player can load.")
+    parser.add_argument('output', help="catalog file to write: .jsonl for JSON lines, .sqlite/.db for SQLite")
+    parser.add_argument('--format', choices=catalog.FORMATS, help="catalog format (default: from the file name)")
+    parser.add_argument('--settings', default='player_settings.json',
+                        help="player settings to read source and network options from")
+    parser.add_argument('--workers', type=int, help="concurrent metadata requests")
+    parser.add_argument('--repo', help="GitHub repository, owner/name")
+    parser.add_argument('--branch', help="branch to scan")
+    parser.add_argument('--songs-path', help="folder in the repository that holds the songs")
+    parser.add_argument('--api-base', help="GitHub API base URL")
+    parser.add_argument('--raw-base', help="raw file base URL")
+    parser.add_argument('--local', action='append', metavar='FOLDER',
+                        help="scan this local folder instead of GitHub (repeatable)")
+    parser.add_argument('--json-stats', action='store_true', help="print statistics as JSON")
+    parser.add_argument('--trace', metavar='FILE', help="write a Chrome trace of the scan to FILE")
+    args = parser.parse_args(argv)
+    if args.trace:
+        tracing.enable()
+
+    settings = load_settings(args.settings)
+    if args.workers is not None:
+        settings['metadata_workers'] = args.workers
+
+    if args.local:
+        transport = None
+        source = LocalSource(args.local, workers=int(settings.get('scan_workers', DEFAULT_WORKERS)))
+        scanner = LibraryScanner(source, workers=int(settings.get('metadata_workers', DEFAULT_WORKERS)))
+    else:
+        transport = Transport.from_settings(settings)
+        scanner = LibraryScanner.from_settings(settings, transport)
+
+        # Flags win over both the settings file and the environment
+        source = scanner.source
+        for option in ('repo', 'branch', 'songs_path', 'api_base', 'raw_base'):
+            value = getattr(args, option)
+            if value is not None:
+                setattr(source, option, value.strip('/') if option == 'songs_path' else value.rstrip('/'))
+    last_report = 0.0
+
+    def show_progress(completed, total, file_info):
+        nonlocal last_report
+        now = time.perf_counter()
+        if now - last_report >= 1.0 or completed == total:
+            last_report = now
+            print(f"\r{completed}/{total} files", end='', file=sys.stderr, flush=True)
+
+    try:
+        songs = scanner.scan(on_progress=show_progress)
+    except GitHubSourceError as e:
+        print(f"Failed to access GitHub repository: {e.status_code}", file=sys.stderr)
+        return 1
+    finally:
+        if transport:
+            transport.close()
+    print(file=sys.stderr)
+
+    catalog.write(args.output, songs, folder_images=source.folder_images, format=args.format)
+    if args.trace:
+        tracing.active().export(args.trace)
+    if args.json_stats:
+        print(json.dumps(scanner.stats.as_dict()))
+    else:
+        print(f"Wrote {len(songs)} songs to {args.output}")
+        for line in scanner.stats.report():
+            print(line)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,457 @@
+"""SQLite library store, read by the playlist a page at a time.
+
+Every track is one row of the ``tracks`` table, indexed on artist (with
+title, for the grouped order), title, album, folder and blob sha. The
+player's grouped view is artist sections in name order, each followed by
+its tracks by title, so ``StorePlaylist`` only keeps one entry per artist
+in memory (name, row of its header, track count) and turns a playlist row
+into an artist plus an offset within it. Rows are fetched in pages of
+``PAGE_SIZE`` from the (artist, title) index and held in a small LRU, so
+opening and scrolling a million-track library touches a bounded number of
+rows. Navigation is arithmetic over the section table, and finding a
+track's row is an index lookup plus a count within its artist.
+
+A scan may write to the store between a reload and a page fetch. A page
+that no longer matches the section table is shown up to the first
+mismatch, padded with blank rows, left out of the LRU, and a reload is
+requested through ``on_stale``.
+
+The same file is what ``library_scanner.py`` writes for ``.sqlite`` catalogs.
+"""
+
+import bisect
+import json
+import random
+import sqlite3
+from array import array
+from collections import OrderedDict
+
+from playlist_model import RowTexts, Section, Track, intern_text
+from search_index import PLACEHOLDERS, SEARCH_FIELDS, tokenize
+
+STORE_VERSION = 1
+PAGE_SIZE = 256  # Rows per query
+DEFAULT_CACHE_ROWS = 8192  # Track and header objects kept in memory per view
+TRACK_COLUMNS = ('url', 'name', 'sha', 'folder', 'file_path', 'title', 'artist', 'album',
+                 'year', 'genre', 'duration', 'bitrate', 'filesize')
+_SELECT = f"SELECT id, {', '.join(TRACK_COLUMNS)} FROM tracks"
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+    CREATE TABLE IF NOT EXISTS tracks (
+        id INTEGER PRIMARY KEY,
+        url TEXT NOT NULL UNIQUE,
+        name TEXT NOT NULL,
+        sha TEXT,
+        folder TEXT,
+        file_path TEXT,
+        title TEXT NOT NULL,
+        artist TEXT NOT NULL,
+        album TEXT,
+        year TEXT,
+        genre TEXT,
+        duration TEXT,
+        bitrate TEXT,
+        filesize TEXT
+    );
+    CREATE INDEX IF NOT EXISTS tracks_artist_title ON tracks (artist, title);
+    CREATE INDEX IF NOT EXISTS tracks_artist_folder ON tracks (artist, folder);
+    CREATE INDEX IF NOT EXISTS tracks_title ON tracks (title);
+    CREATE INDEX IF NOT EXISTS tracks_album ON tracks (album);
+    CREATE INDEX IF NOT EXISTS tracks_folder ON tracks (folder);
+    CREATE INDEX IF NOT EXISTS tracks_sha ON tracks (sha);
+"""
+
+# Full-text index for search, kept in step by triggers. Placeholder values
+# like 'Unknown Album' are left out so the word 'unknown' doesn't match them.
+_INDEXED = "CASE WHEN {0}.{1} IN ({2}) THEN '' ELSE {0}.{1} END"
+_SEARCH_COLUMNS = ', '.join(SEARCH_FIELDS)
+
+
+def _indexed_values(row):
+    placeholders = ', '.join(f"'{value}'" for value in sorted(PLACEHOLDERS))
+    return ', '.join(_INDEXED.format(row, field, placeholders) for field in SEARCH_FIELDS)
+
+
+SEARCH_SCHEMA = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS tracks_search USING fts5(
+        {_SEARCH_COLUMNS}, content='tracks', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+    );
+    CREATE TRIGGER IF NOT EXISTS tracks_search_insert AFTER INSERT ON tracks BEGIN
+        INSERT INTO tracks_search (rowid, {_SEARCH_COLUMNS}) VALUES (new.id, {_indexed_values('new')});
+    END;
+    CREATE TRIGGER IF NOT EXISTS tracks_search_delete AFTER DELETE ON tracks BEGIN
+        INSERT INTO tracks_search (tracks_search, rowid, {_SEARCH_COLUMNS})
+            VALUES ('delete', old.id, {_indexed_values('old')});
+    END;
+    CREATE TRIGGER IF NOT EXISTS tracks_search_update AFTER UPDATE ON tracks BEGIN
+        INSERT INTO tracks_search (tracks_search, rowid, {_SEARCH_COLUMNS})
+            VALUES ('delete', old.id, {_indexed_values('old')});
+        INSERT INTO tracks_search (rowid, {_SEARCH_COLUMNS}) VALUES (new.id, {_indexed_values('new')});
+    END;
+"""
+
+
+def _song_values(song):
+    metadata = song['metadata']
+    folder = song.get('folder', metadata.get('folder'))
+    return (song['url'], song['name'], song.get('sha'), folder, metadata.get('file_path'),
+            metadata.get('title', song['name']), metadata.get('artist', 'Unknown Artist'),
+            metadata.get('album', 'Unknown Album'), metadata.get('year', 'Unknown'),
+            metadata.get('genre', 'Unknown'), metadata.get('duration', 'Unknown'),
+            metadata.get('bitrate', 'Unknown'), metadata.get('filesize', 'Unknown'))
+
+
+class _PendingRow:
+    """Blank stand-in for a row that changed in the store since the last reload"""
+
+    __slots__ = ()
+    is_track = False
+    artist = ''
+    display_name = ''
+
+
+PENDING_ROW = _PendingRow()
+
+
+def _track(row, show_folder):
+    """Track from a ``_SELECT`` row"""
+    track = Track.__new__(Track)
+    (_, track.url, track.name, track.sha, folder, file_path, track.title, artist, album,
+     year, genre, duration, bitrate, filesize) = row
+    track.folder = intern_text(folder)
+    track.file_path = intern_text(file_path)
+    track.artist = intern_text(artist)
+    track.album = intern_text(album)
+    track.year = intern_text(year)
+    track.genre = intern_text(genre)
+    track.duration = intern_text(duration)
+    track.bitrate = intern_text(bitrate)
+    track.filesize = intern_text(filesize)
+    track.show_folder = show_folder
+    return track
+
+
+class LibraryStore:
+    """Tracks in an indexed SQLite file; use from one thread"""
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+        try:
+            self.connection.executescript(SEARCH_SCHEMA)
+            self.full_text = True
+        except sqlite3.OperationalError:
+            self.full_text = False  # SQLite built without FTS5; search scans instead
+        version = self.get_meta('version')
+        if version is None:
+            self.set_meta('version', STORE_VERSION)
+        elif version != STORE_VERSION:
+            self.connection.close()
+            raise ValueError(f"{path} is a version {version} library store, not {STORE_VERSION}")
+
+    def close(self):
+        self.connection.close()
+
+    def get_meta(self, key, default=None):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key, value):
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, json.dumps(value)))
+
+    # Writing
+
+    def add_songs(self, songs):
+        """Insert scanner song dicts, replacing tracks with the same URL"""
+        columns = ', '.join(TRACK_COLUMNS)
+        updates = ', '.join(f"{column} = excluded.{column}" for column in TRACK_COLUMNS[1:])
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT INTO tracks ({columns}) VALUES ({', '.join('?' * len(TRACK_COLUMNS))}) "
+                f"ON CONFLICT (url) DO UPDATE SET {updates}",
+                (_song_values(song) for song in songs))
+
+    def remove_urls(self, urls):
+        with self.connection:
+            self.connection.executemany("DELETE FROM tracks WHERE url = ?", ((url,) for url in urls))
+
+    def clear(self):
+        with self.connection:
+            self.connection.execute("DELETE FROM tracks")
+            if self.full_text:
+                self.connection.execute("INSERT INTO tracks_search (tracks_search) VALUES ('delete-all')")
+
+    # Reading
+
+    def count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+
+    def contains(self, url):
+        return self.connection.execute("SELECT 1 FROM tracks WHERE url = ?", (url,)).fetchone() is not None
+
+    def urls(self):
+        """Every track URL, streamed from the database"""
+        for (url,) in self.connection.execute("SELECT url FROM tracks"):
+            yield url
+
+    def songs(self):
+        """Every track as a scanner song dict, in grouped order"""
+        for row in self.connection.execute(f"{_SELECT} ORDER BY artist, title, id"):
+            track = _track(row, False)
+            metadata = track.metadata
+            metadata['folder'] = track.folder
+            metadata['file_path'] = track.file_path
+            yield {'url': track.url, 'name': track.name, 'sha': track.sha, 'metadata': metadata,
+                   'folder': track.folder}
+
+    def sections(self):
+        """``(artist, track count, spans several folders)`` per artist, in name order"""
+        query = ("SELECT artist, COUNT(*), MIN(folder) IS NOT MAX(folder) FROM tracks "
+                 "GROUP BY artist ORDER BY artist")
+        return self.connection.execute(query).fetchall()
+
+    def tracks_from(self, artist, offset, limit):
+        """``_SELECT`` rows in grouped order, from the ``offset``-th track of ``artist`` on"""
+        return self.connection.execute(
+            f"{_SELECT} WHERE artist >= ? ORDER BY artist, title, id LIMIT ? OFFSET ?",
+            (artist, limit, offset)).fetchall()
+
+    def rows_by_id(self, ids):
+        """``_SELECT`` rows for ``ids``, in that order"""
+        placeholders = ', '.join('?' * len(ids))
+        by_id = {row[0]: row for row in self.connection.execute(f"{_SELECT} WHERE id IN ({placeholders})", ids)}
+        return [by_id[track_id] for track_id in ids if track_id in by_id]
+
+    def locate(self, url):
+        """``(id, artist, offset within the artist)`` of a track, or None"""
+        row = self.connection.execute("SELECT id, artist, title FROM tracks WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        track_id, artist, title = row
+        offset = self.connection.execute(
+            "SELECT COUNT(*) FROM tracks WHERE artist = ? AND (title < ? OR (title = ? AND id < ?))",
+            (artist, title, title, track_id)).fetchone()[0]
+        return track_id, artist, offset
+
+    def track_ids(self):
+        return array('q', (track_id for (track_id,) in self.connection.execute("SELECT id FROM tracks")))
+
+    def search(self, query, limit):
+        """Up to ``limit`` tracks matching every word of ``query``, in grouped order
+
+        A word matches the start of any word in the title, artist, album or
+        genre. Without FTS5 it matches anywhere in them, by scanning the table.
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+        if self.full_text:
+            rows = self.connection.execute(
+                f"{_SELECT} WHERE id IN (SELECT rowid FROM tracks_search WHERE tracks_search MATCH ? LIMIT ?)",
+                (' '.join(f'"{word}"*' for word in words), limit)).fetchall()
+        else:
+            placeholders = ', '.join('?' * len(PLACEHOLDERS))
+            field = f"({{0}} NOT IN ({placeholders}) AND {{0}} LIKE ?)"
+            clause = '(' + ' OR '.join(field.format(column) for column in SEARCH_FIELDS) + ')'
+            parameters = []
+            for word in words:
+                parameters.extend([*PLACEHOLDERS, f'%{word}%'] * len(SEARCH_FIELDS))
+            rows = self.connection.execute(f"{_SELECT} WHERE {' AND '.join([clause] * len(words))} LIMIT ?",
+                                           parameters + [limit]).fetchall()
+        rows.sort(key=lambda row: (row[7], row[6], row[0]))
+        return [_track(row, False) for row in rows]
+
+
+class StorePlaylist:
+    """The grouped playlist (headers and tracks) of a LibraryStore, paged in on demand
+
+    Offers the read side of ``PlaylistModel``: ``len``, indexing,
+    ``position_of``, ``next_playable``/``previous_playable`` and
+    ``track_count``. Changes go to the store, followed by ``reload``.
+    ``on_stale()`` is called (once per reload) when a page shows the store
+    has changed since.
+    """
+
+    def __init__(self, store, cache_rows=DEFAULT_CACHE_ROWS, on_stale=None):
+        self.store = store
+        self.max_pages = max(2, cache_rows // PAGE_SIZE)
+        self.on_stale = on_stale
+        self.reload()
+
+    def reload(self):
+        """Re-read the section table after the store changed"""
+        self.artists = []
+        self.starts = array('q')  # Row of each artist's header
+        self.sizes = array('q')
+        self.multi_folder = set()
+        position = 0
+        for artist, size, multi_folder in self.store.sections():
+            self.artists.append(intern_text(artist))
+            self.starts.append(position)
+            self.sizes.append(size)
+            if multi_folder:
+                self.multi_folder.add(artist)
+            position += size + 1
+        self._length = position
+        self.track_count = position - len(self.artists)
+        self._pages = OrderedDict()
+        self.stale = False
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError(index)
+        page = index // PAGE_SIZE
+        return self._page(page)[index - page * PAGE_SIZE]
+
+    def _page(self, page):
+        rows = self._pages.get(page)
+        if rows is not None:
+            self._pages.move_to_end(page)
+            return rows
+
+        start = page * PAGE_SIZE
+        end = min(start + PAGE_SIZE, self._length)
+        k = bisect.bisect_right(self.starts, start) - 1
+        offset = max(start - self.starts[k] - 1, 0)
+        tracks = self.store.tracks_from(self.artists[k], offset, end - start)
+        rows = []
+        fetched = 0
+        for position in range(start, end):
+            if k + 1 < len(self.starts) and position == self.starts[k + 1]:
+                k += 1
+            if position == self.starts[k]:
+                rows.append(Section(self.artists[k]))
+                continue
+            if fetched == len(tracks) or tracks[fetched][7] != self.artists[k]:
+                break  # Tracks were added, removed or re-tagged since the last reload
+            row = tracks[fetched]
+            fetched += 1
+            rows.append(_track(row, row[7] in self.multi_folder))
+
+        if len(rows) < end - start:
+            rows.extend([PENDING_ROW] * (end - start - len(rows)))
+            self._mark_stale()
+            return rows
+        self._pages[page] = rows
+        while len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+        return rows
+
+    def _mark_stale(self):
+        if not self.stale:
+            self.stale = True
+            if self.on_stale:
+                self.on_stale()
+
+    def display_rows(self):
+        """Row texts as a read-only sequence, fetched only for the part being shown"""
+        return RowTexts(self)
+
+    def _is_header(self, position):
+        k = bisect.bisect_right(self.starts, position) - 1
+        return k >= 0 and self.starts[k] == position
+
+    def position_of(self, url):
+        found = self.store.locate(url)
+        if found is None:
+            return None
+        _, artist, offset = found
+        k = bisect.bisect_left(self.artists, artist)
+        if k == len(self.artists) or self.artists[k] != artist:
+            return None  # Added to the store since the last reload
+        return self.starts[k] + 1 + offset
+
+    def next_playable(self, position):
+        """Row of the next track after ``position`` (wrapping), or None"""
+        if not 0 <= position < self._length or not self.track_count:
+            return None
+        position += 1
+        if position < self._length and self._is_header(position):
+            position += 1
+        return position if position < self._length else 1
+
+    def previous_playable(self, position):
+        """Row of the track before ``position`` (wrapping), or None"""
+        if not 0 <= position < self._length or not self.track_count:
+            return None
+        position -= 1
+        if position >= 0 and self._is_header(position):
+            position -= 1
+        return position if position >= 0 else self._length - 1
+
+    def shuffled(self):
+        return ShuffledStorePlaylist(self)
+
+
+class ShuffledStorePlaylist:
+    """A StorePlaylist's tracks in random order, held as an array of row ids"""
+
+    def __init__(self, grouped):
+        self.grouped = grouped
+        self.store = grouped.store
+        self.ids = grouped.store.track_ids()
+        random.shuffle(self.ids)
+        # Inverse permutation: position of each id at ``id - _base``, -1 for ids not in the shuffle
+        self._base = min(self.ids, default=0)
+        self._positions = array('q', [-1]) * (max(self.ids, default=-1) - self._base + 1)
+        for position, track_id in enumerate(self.ids):
+            self._positions[track_id - self._base] = position
+        self.track_count = len(self.ids)
+        self._pages = OrderedDict()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.ids)
+        if not 0 <= index < len(self.ids):
+            raise IndexError(index)
+        page = index // PAGE_SIZE
+        rows = self._pages.get(page)
+        if rows is None:
+            ids = list(self.ids[page * PAGE_SIZE:(page + 1) * PAGE_SIZE])
+            found = {row[0]: row for row in self.store.rows_by_id(ids)}
+            rows = [_track(found[track_id], found[track_id][7] in self.grouped.multi_folder)
+                    if track_id in found else PENDING_ROW for track_id in ids]
+            if len(found) < len(ids):
+                self.grouped._mark_stale()  # Removed since the shuffle
+                return rows[index - page * PAGE_SIZE]
+            self._pages[page] = rows
+            while len(self._pages) > self.grouped.max_pages:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(page)
+        return rows[index - page * PAGE_SIZE]
+
+    def display_rows(self):
+        return RowTexts(self)
+
+    def position_of(self, url):
+        found = self.store.locate(url)
+        if found is None:
+            return None
+        index = found[0] - self._base
+        if not 0 <= index < len(self._positions) or self._positions[index] < 0:
+            return None
+        return self._positions[index]
+
+    def next_playable(self, position):
+        if not 0 <= position < len(self.ids):
+            return None
+        return (position + 1) % len(self.ids)
+
+    def previous_playable(self, position):
+        if not 0 <= position < len(self.ids):
+            return None
+        return (position - 1) % len(self.ids)
+
@@ -0,0 +1,113 @@
+"""Persisted snapshot of the scanned library, keyed on GitHub blob SHAs.
+
+The contents API reports a blob ``sha`` for every file, which changes only
+when the file's bytes change. Keeping ``{path: sha, metadata}`` from the last
+scan lets a refresh fetch metadata for new or modified files only.
+"""
+
+import json
+import os
+import tempfile
+
+SNAPSHOT_VERSION = 1
+
+
+class SyncDiff:
+    """Result of comparing a fresh file listing against the snapshot"""
+
+    def __init__(self):
+        self.added = []  # File infos not in the snapshot
+        self.changed = []  # File infos whose blob sha differs
+        self.removed = []  # Snapshot paths that are no longer listed
+        self.unchanged = []  # File infos whose sha matches
+
+    @property
+    def has_changes(self):
+        return bool(self.added or self.changed or self.removed)
+
+    @property
+    def to_fetch(self):
+        return self.added + self.changed
+
+
+class LibrarySnapshot:
+    """``{path: {sha, url, name, folder, metadata}}`` saved between launches"""
+
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') == SNAPSHOT_VERSION:
+                self.files = data.get('files', {})
+        except (OSError, ValueError):
+            self.files = {}
+        return self
+
+    def save(self):
+        """Write the snapshot atomically so a crash never leaves half a file"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'version': SNAPSHOT_VERSION, 'files': self.files}, f)
+            os.replace(temp_path, self.path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+    @staticmethod
+    def key(file_info):
+        return f"{file_info['path']}/{file_info['name']}"
+
+    def diff(self, all_files):
+        """Compare a discovered file list against the snapshot"""
+        result = SyncDiff()
+        seen = set()
+        for file_info in all_files:
+            key = self.key(file_info)
+            seen.add(key)
+            entry = self.files.get(key)
+            if entry is None:
+                result.added.append(file_info)
+            elif not file_info.get('sha') or entry.get('sha') != file_info.get('sha'):
+                result.changed.append(file_info)
+            else:
+                result.unchanged.append(file_info)
+        result.removed = [key for key in self.files if key not in seen]
+        return result
+
+    def apply(self, diff, fetched_songs):
+        """Record freshly fetched songs and forget removed paths
+
+        Songs whose tags couldn't be read are kept without a sha, so the
+        next diff fetches them again.
+        """
+        for key in diff.removed:
+            self.files.pop(key, None)
+        for file_info, song in zip(diff.to_fetch, fetched_songs):
+            self.files[self.key(file_info)] = {
+                'sha': None if song.get('metadata_failed') else file_info.get('sha'),
+                'url': song['url'],
+                'name': song['name'],
+                'folder': song['folder'],
+                'metadata': song['metadata']
+            }
+
+    def songs_for(self, all_files):
+        """Song dicts for ``all_files``, in listing order, from the snapshot"""
+        songs = []
+        for file_info in all_files:
+            entry = self.files.get(self.key(file_info))
+            if entry is not None:
+                songs.append({
+                    'url': entry['url'],
+                    'name': entry['name'],
+                    'sha': entry.get('sha'),
+                    'metadata': entry['metadata'],
+                    'folder': entry['folder']
+                })
+        return songs
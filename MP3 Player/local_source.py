@@ -0,0 +1,108 @@
+"""Discover MP3 files in local folders.
+
+Folders are listed with ``os.scandir`` on a small thread pool, one task per
+directory, so large or slow (network-mounted) trees are walked in parallel
+and each file is stat'ed at most once. Songs come out as the same file info
+dicts as ``GitHubSource`` produces, with ``file://`` URLs and a size/mtime
+stamp in place of the blob sha, so the scanner, the library snapshot and
+the playlist treat both sources alike. Tags are read through a memory map
+(``id3_reader.read_file_tags``).
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+import id3_reader
+from github_source import IMAGE_EXTENSIONS, pick_folder_images
+
+DEFAULT_WORKERS = 8
+
+
+def is_local_url(url):
+    return url.startswith('file:')
+
+
+def path_for_url(url):
+    """Filesystem path of a ``file://`` URL"""
+    return url2pathname(urlparse(url).path)
+
+
+class LocalSource:
+    """MP3 files under one or more local folders"""
+
+    def __init__(self, roots=(), workers=DEFAULT_WORKERS):
+        self.roots = [os.path.abspath(os.path.expanduser(root)) for root in roots]
+        self.workers = max(1, workers)
+        self.folder_images = {}  # Folder path -> image file info, from the last discovery
+        self._root_urls = [Path(root).as_uri().rstrip('/') + '/' for root in self.roots]
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(settings.get('local_folders', []), workers=int(settings.get('scan_workers', DEFAULT_WORKERS)))
+
+    def owns(self, url):
+        """Whether ``url`` is a file under one of this source's folders"""
+        return any(url.startswith(prefix) for prefix in self._root_urls)
+
+    def discover(self):
+        """All MP3 files under the folders, sorted like a GitHub listing"""
+        files = []
+        images = []
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scandir") as pool:
+            pending = {pool.submit(self._scan_directory, root) for root in self.roots}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    directory_files, directory_images, subdirectories = future.result()
+                    files.extend(directory_files)
+                    images.extend(directory_images)
+                    pending.update(pool.submit(self._scan_directory, subdirectory)
+                                   for subdirectory in subdirectories)
+        files.sort(key=lambda f: (f['path'], f['name']))
+        self.folder_images = pick_folder_images(images)
+        return files
+
+    def _scan_directory(self, directory):
+        """``(songs, images, subdirectories)`` directly inside ``directory``"""
+        files, images, subdirectories = [], [], []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not entry.name.startswith('.'):
+                                subdirectories.append(entry.path)
+                            continue
+                        name = entry.name.lower()
+                        if name.endswith('.mp3'):
+                            files.append(self._file_info(directory, entry))
+                        elif name.endswith(IMAGE_EXTENSIONS):
+                            images.append(self._file_info(directory, entry))
+                    except OSError:
+                        pass  # Vanished or unreadable; leave it out
+        except OSError:
+            pass
+        return files, images, subdirectories
+
+    @staticmethod
+    def _file_info(directory, entry):
+        stat = entry.stat()
+        return {
+            'url': Path(entry.path).as_uri(),
+            'name': entry.name,
+            'sha': f"{stat.st_size}-{stat.st_mtime_ns}",  # Changes whenever the file does
+            'path': directory,
+            'folder': os.path.basename(directory)
+        }
+
+    def read_tags(self, url, metadata):
+        """Fill ``metadata`` from a song's tags, read through a memory map"""
+        id3_reader.read_file_tags(path_for_url(url), metadata)
+        return metadata
+
+    def read_file(self, url):
+        with open(path_for_url(url), 'rb') as f:
+            return f.read()
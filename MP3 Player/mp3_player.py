@@ -1,18 +1,48 @@
+import startup_timer  # First, so the startup clock includes every other import
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import pygame
 import os
 import threading
 import time
-from pathlib import Path
 import json
-import mutagen
-from mutagen.mp3 import MP3
-from PIL import Image, ImageTk
-import io
-import requests
-import urllib.request
-import tempfile
+import random
+import sqlite3
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import id3_reader
+from library_sync import LibrarySnapshot
+from github_source import GitHubSource, GitHubSourceError
+from library_scanner import LibraryScanner
+from local_source import LocalSource, is_local_url, path_for_url
+import catalog
+from library_store import LibraryStore, StorePlaylist, DEFAULT_CACHE_ROWS
+from http_transport import Transport
+from download_scheduler import DownloadScheduler, PLAYBACK, PREFETCH, METADATA, ARTWORK
+from audio_cache import AudioCache
+from prefetcher import Prefetcher
+from progressive import ProgressiveStream
+from playback_buffer import BufferPool
+from ui_dispatch import UIDispatcher
+from playlist_view import VirtualListbox
+from playlist_model import PlaylistModel, Section, Track
+from library_organizer import LibraryOrganizer
+from search_index import SearchIndex
+from seek_index import SeekIndex, OffsetReader, INDEX_SUFFIX
+from player_state import PlayerState, DebouncedSave, write_json_atomic
+from playback_clock import PlaybackClock, STOPPED, LOADING, PLAYING, PAUSED, BUFFERING, ENDED, TICKING_STATES
+from audio_engine import AudioEngine
+from artwork import ArtworkCache
+import tracing
+
+# pygame, mutagen, PIL and requests load on first use, after the window is up
+STARTUP = startup_timer.StartupTimer.from_environment()
+STARTUP.mark("imports")
+
+SEARCH_LIMIT = 500  # Most search results listed at once
+SEARCH_INDEX_CHUNK = 2000  # Bulk-loaded tracks indexed per UI frame
+STORE_BATCH = 1000  # Scanned songs written to the library store per transaction
+PREFETCH_WAIT = 1.0  # Seconds a picked track waits on its own prefetch before streaming instead
+PREFETCH_WAIT_SLICE = 0.1  # How often that wait checks whether another track was picked
 
 class MP3Player:
     def __init__(self, root):
@@ -21,45 +51,187 @@ class MP3Player:
         self.root.geometry("800x600")
         self.root.configure(bg='#2b2b2b')
         
-        # Initialize pygame mixer
-        pygame.mixer.init()
+        # pygame is imported and the mixer opened in the background once the window is up
+        self.audio = AudioEngine(on_ready=lambda seconds: STARTUP.background_done("mixer init", seconds))
         
         # Player state
         self.current_track = None
-        self.playlist = []
-        self.original_playlist = []  # Store original order for shuffle toggle
+        self.current_url = None  # URL of the song behind current_track
+        self.pinned_track = None  # Cache entry protected from eviction while it plays
+        self.progressive_stream = None  # Download still feeding the mixer, if any
+        self.seek_index = None  # Time-to-byte index of the current track
+        self.seek_view = None  # File view pygame is playing from after a seek
+        self.seek_offset = 0.0  # Track time where the mixer last started playing
+        self.track_duration = None  # Seconds, when known
+        self.playlist = PlaylistModel()
+        self.original_playlist = self.playlist  # Grouped order; differs from playlist only while shuffled
+        self.organizer = None  # Keeps original_playlist sorted as scanned songs arrive
+        self.pending_songs = deque()  # Scanned songs waiting for the Tk thread
+        self.search_index = SearchIndex()
+        self.search_backlog = deque()  # Bulk-loaded tracks not yet indexed
+        self.search_results = []
         self.current_index = 0
-        self.is_playing = False
-        self.is_paused = False
+        self.playback_state = STOPPED
         self.is_shuffled = False
+        self.load_generation = 0  # Bumped on every play/stop so stale loads are dropped
+        self.scan_thread = None
+        
+        # One long-lived loader thread; only the newest request is kept
+        self.load_request = None  # (track, generation) waiting for the loader
+        self.loading_stream = None  # Download the loader is waiting on
+        self.load_cond = threading.Condition()
+        self.loader_thread = threading.Thread(target=self.loader_loop, name="track-loader", daemon=True)
         
         # Load settings
         self.settings_file = "player_settings.json"
+        self.settings = {}
         self.load_settings()
         
+        # Spans, counters and swallowed errors; off unless a trace or the stats panel wants them
+        self.trace_path = tracing.trace_path_from_environment(self.settings)
+        if self.trace_path:
+            tracing.enable()
+        self.stats_panel = None
+        self.settings_saver = DebouncedSave(self.root, self.write_settings)
+        
+        # Playlist and last position from the previous session, shown before any scan
+        self.player_state = PlayerState("player_state.json").load()
+        self.resume_url = None  # Track to resume at resume_position when it is next played
+        self.resume_position = 0.0
+        self.state_saver = DebouncedSave(self.root, self.save_state)
+        self.state_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="state")
+        
+        # Pooled HTTP session shared by every network request
+        self.transport = Transport.from_settings(self.settings)
+        
+        # Requests are queued by priority: the playing track, then prefetches, tags and artwork
+        self.downloads = DownloadScheduler.from_settings(self.settings, self.transport.get)
+        self.playback_get = self.downloads.getter(PLAYBACK)
+        
+        # Downloaded tracks, kept on disk up to the configured byte budget
+        self.audio_cache = AudioCache.from_settings(self.settings)
+        
+        # Memory for progressive downloads, reused from track to track
+        self.playback_buffers = BufferPool.from_settings(self.settings)
+        
+        # Artwork thumbnails: PhotoImages in memory, pre-scaled PNGs on disk
+        self.artwork = ArtworkCache.from_settings(self.settings)
+        self.artwork_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="artwork")
+        self.artwork_url = None  # Track whose artwork should be on screen
+        
+        # Downloads the next few tracks in the background while one plays
+        self.prefetcher = Prefetcher.from_settings(self.settings, self.audio_cache,
+                                                  self.downloads.getter(PREFETCH))
+        
+        # Snapshot of the last scan, used to only fetch new or changed songs
+        self.library_snapshot = LibrarySnapshot("library_snapshot.json").load()
+        
+        # Where songs are discovered; base URLs come from settings or environment
+        self.github_source = GitHubSource.from_settings(self.settings, cache_path="github_tree_cache.json",
+                                                        get=self.downloads.getter(METADATA))
+        self.scanner = LibraryScanner(self.github_source, self.transport, workers=self.metadata_workers)
+        
+        # Songs in local folders (local_folders setting, or added with Open Folder)
+        self.local_source = LocalSource.from_settings(self.settings)
+        self.local_scanner = LibraryScanner(self.local_source, workers=self.metadata_workers)
+        self.local_snapshot = LibrarySnapshot("local_snapshot.json").load()
+        self.local_rescan = False  # A folder was added while a sync was running
+        
+        # A SQLite catalog is browsed in place, a page of rows at a time, instead of loaded
+        self.store = None
+        if self.store_path:
+            try:
+                self.store = LibraryStore(self.store_path)
+            except (sqlite3.DatabaseError, ValueError) as e:
+                print(f"Library store unavailable, loading the catalog instead: {e}")
+                self.store_path = None
+        
+        # Background threads hand all widget updates to the Tk thread through this
+        self.ui = UIDispatcher(self.root, fps=int(self.settings.get('ui_fps', 30)))
+        
+        # Progress and end-of-track detection run off one Tk timer while playing
+        self.clock = PlaybackClock(self.root, self.playback_tick)
+        self.loader_thread.start()
+        self.audio.set_volume(float(self.settings.get('volume', 70)) / 100.0)
+        STARTUP.mark("settings and saved state")
+        
         self.setup_ui()
         self.setup_bindings()
+        STARTUP.mark("ui build")
+        self.restore_state()
+        STARTUP.mark("playlist restore")
+        
+        # Slow initialization waits until the first frame is on screen
+        self.root.after_idle(self.finish_startup)
+        
+    def finish_startup(self):
+        """First idle moment after the window is built: report timing, then start the slow parts"""
+        self.root.update_idletasks()  # Flush pending drawing so this marks a complete first frame
+        STARTUP.mark("first paint")
+        STARTUP.report()
         
-        # Auto-fetch songs on startup
-        self.root.after(1000, self.auto_fetch_songs)
+        self.audio.start()
+        if self.settings.get('stats_panel'):
+            self.toggle_stats_panel()
+        
+        # Revalidate the library against GitHub
+        self.auto_fetch_songs()
         
     def auto_fetch_songs(self):
         """Automatically fetch songs from GitHub on startup"""
         self.status_var.set("🌐 Auto-loading songs from GitHub...")
-        self.root.update()
+        self.refresh_library()
+        
+    def refresh_library(self):
+        """Sync the library in a background thread unless a sync is already running"""
+        if self.scan_thread and self.scan_thread.is_alive():
+            return
         
         # Start fetching in a separate thread to avoid blocking UI
-        fetch_thread = threading.Thread(target=self.stream_from_github, daemon=True)
-        fetch_thread.start()
+        self.scan_thread = threading.Thread(target=self.sync_library, daemon=True)
+        self.scan_thread.start()
+        
+    def sync_library(self):
+        """Scan thread: GitHub (or the prebuilt catalog), then the local folders"""
+        if self.store_path:
+            self.ui.post(self.show_store)  # Already browsable; nothing to load
+        elif self.catalog_path:
+            self.load_catalog()
+        else:
+            self.stream_from_github()
+        self.scan_local_folders()
+        
+    def open_folder(self):
+        """Add a local folder to the library and scan it"""
+        folder = filedialog.askdirectory(title="Add a music folder")
+        if not folder:
+            return
+        folders = self.settings.setdefault('local_folders', [])
+        if folder not in folders:
+            folders.append(folder)
+            self.save_settings()
+        self.local_scanner.source = self.local_source = LocalSource.from_settings(self.settings)
+        
+        if self.scan_thread and self.scan_thread.is_alive():
+            self.local_rescan = True  # Picked up when the running sync finishes
+            self.status_var.set(f"📂 {os.path.basename(folder)} will be scanned after the current sync")
+        else:
+            self.scan_thread = threading.Thread(target=self.scan_local_folders, daemon=True)
+            self.scan_thread.start()
+        
+    def set_status(self, message):
+        """Set the status bar text from any thread"""
+        self.ui.call(self.status_var.set, message)
         
     def create_default_artwork(self):
         """Create a default music note icon"""
+        from PIL import Image, ImageDraw, ImageTk
+        
         # Create a simple music note icon using PIL
         size = 120
         img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
         
         # Create a simple music note shape (simplified)
-        from PIL import ImageDraw
         draw = ImageDraw.Draw(img)
         
         # Draw a simple music note
@@ -74,6 +246,28 @@ class MP3Player:
     
 
         
+    @property
+    def is_playing(self):
+        """A track is in the mixer (playing, paused or buffering)"""
+        return self.playback_state in (PLAYING, PAUSED, BUFFERING)
+    
+    @property
+    def is_paused(self):
+        return self.playback_state == PAUSED
+    
+    @property
+    def is_buffering(self):
+        """Paused by us because the download fell behind"""
+        return self.playback_state == BUFFERING
+    
+    def set_playback_state(self, state):
+        """Move the playback state machine; the clock only runs while there is something to watch"""
+        self.playback_state = state
+        if state in TICKING_STATES:
+            self.clock.start()
+        else:
+            self.clock.stop()
+        
     def setup_ui(self):
         # Main frame
         main_frame = tk.Frame(self.root, bg='#2b2b2b')
@@ -224,7 +418,7 @@ class MP3Player:
         tk.Label(self.volume_frame, text="🔊", font=('Arial', 12), 
                 fg='#ffffff', bg='#2b2b2b').pack(side=tk.LEFT, padx=(0, 5))
         
-        self.volume_var = tk.DoubleVar(value=70)
+        self.volume_var = tk.DoubleVar(value=self.settings.get('volume', 70))
         self.volume_scale = ttk.Scale(self.volume_frame, from_=0, to=100,
                                      variable=self.volume_var, orient=tk.HORIZONTAL,
                                      length=200, command=self.set_volume)
@@ -240,7 +434,7 @@ class MP3Player:
         self.stream_frame.pack(pady=20)
         
         self.refresh_button = tk.Button(self.stream_frame, text="🔄 Refresh Songs", 
-                                      command=self.stream_from_github,
+                                      command=self.refresh_library,
                                       bg='#4a4a4a', fg='#ffffff',
                                       relief=tk.FLAT, padx=15, pady=5)
         self.refresh_button.pack(side=tk.LEFT, padx=5)
@@ -251,34 +445,54 @@ class MP3Player:
                                     relief=tk.FLAT, padx=15, pady=5)
         self.clear_button.pack(side=tk.LEFT, padx=5)
         
+        self.open_folder_button = tk.Button(self.stream_frame, text="📂 Open Folder", 
+                                          command=self.open_folder,
+                                          bg='#4a4a4a', fg='#ffffff',
+                                          relief=tk.FLAT, padx=15, pady=5)
+        self.open_folder_button.pack(side=tk.LEFT, padx=5)
+        
         # Playlist
         self.playlist_frame = tk.Frame(main_frame, bg='#2b2b2b')
         self.playlist_frame.pack(fill=tk.BOTH, expand=True, pady=(20, 0))
         
-        tk.Label(self.playlist_frame, text="Playlist:", 
-                font=('Arial', 12, 'bold'), 
-                fg='#ffffff', bg='#2b2b2b').pack(anchor=tk.W)
-        
-        # Playlist listbox with scrollbar
-        listbox_frame = tk.Frame(self.playlist_frame, bg='#2b2b2b')
-        listbox_frame.pack(fill=tk.BOTH, expand=True, pady=(5, 0))
-        
-        self.playlist_listbox = tk.Listbox(listbox_frame, 
-                                          bg='#3b3b3b', fg='#ffffff',
-                                          selectbackground='#4a4a4a',
-                                          font=('Arial', 10),
-                                          height=8)
-        self.playlist_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        playlist_header = tk.Frame(self.playlist_frame, bg='#2b2b2b')
+        playlist_header.pack(fill=tk.X)
         
-        scrollbar = tk.Scrollbar(listbox_frame, orient=tk.VERTICAL)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        self.playlist_listbox.config(yscrollcommand=scrollbar.set)
-        scrollbar.config(command=self.playlist_listbox.yview)
+        tk.Label(playlist_header, text="Playlist:", 
+                font=('Arial', 12, 'bold'), 
+                fg='#ffffff', bg='#2b2b2b').pack(side=tk.LEFT)
+        
+        # Search box; matches replace the playlist view while a query is typed
+        self.search_var = tk.StringVar()
+        self.search_entry = tk.Entry(playlist_header, textvariable=self.search_var,
+                                     font=('Arial', 10), width=30,
+                                     bg='#3b3b3b', fg='#ffffff',
+                                     insertbackground='#ffffff', relief=tk.FLAT)
+        self.search_entry.pack(side=tk.RIGHT)
+        tk.Label(playlist_header, text="🔍", font=('Arial', 10),
+                fg='#ffffff', bg='#2b2b2b').pack(side=tk.RIGHT, padx=(0, 5))
+        self.search_var.trace_add('write', lambda *args: self.update_search())
+        
+        # Playlist listbox with scrollbar; only the visible rows are rendered
+        self.playlist_listbox = VirtualListbox(self.playlist_frame,
+                                               bg='#3b3b3b', fg='#ffffff',
+                                               selectbackground='#4a4a4a',
+                                               font=('Arial', 10),
+                                               height=8)
+        self.playlist_listbox.pack(fill=tk.BOTH, expand=True, pady=(5, 0))
+        self.refresh_playlist_display()
         
         # Bind double-click to play selected track
         self.playlist_listbox.bind('<Double-Button-1>', self.play_selected_track)
         
+        # Search results, shown in place of the playlist
+        self.search_listbox = VirtualListbox(self.playlist_frame,
+                                             bg='#3b3b3b', fg='#ffffff',
+                                             selectbackground='#4a4a4a',
+                                             font=('Arial', 10),
+                                             height=8)
+        self.search_listbox.bind('<Double-Button-1>', self.play_search_result)
+        
         # Loading progress frame
         self.loading_frame = tk.Frame(main_frame, bg='#2b2b2b')
         self.loading_frame.pack(fill=tk.X, pady=(10, 0))
@@ -316,151 +530,333 @@ class MP3Player:
         self.progress_bar.bind('<Button-1>', self.seek)
         
         # Bind keyboard shortcuts
-        self.root.bind('<space>', lambda e: self.play_pause())
-        self.root.bind('<Left>', lambda e: self.previous_track())
-        self.root.bind('<Right>', lambda e: self.next_track())
-        self.root.bind('<Up>', lambda e: self.volume_up())
-        self.root.bind('<Down>', lambda e: self.volume_down())
-        self.root.bind('<s>', lambda e: self.toggle_shuffle())
-        self.root.bind('<S>', lambda e: self.toggle_shuffle())
+        self.root.bind('<space>', self.shortcut(self.play_pause))
+        self.root.bind('<Left>', self.shortcut(self.previous_track))
+        self.root.bind('<Right>', self.shortcut(self.next_track))
+        self.root.bind('<Up>', self.shortcut(self.volume_up))
+        self.root.bind('<Down>', self.shortcut(self.volume_down))
+        self.root.bind('<s>', self.shortcut(self.toggle_shuffle))
+        self.root.bind('<S>', self.shortcut(self.toggle_shuffle))
+        
+        # Search shortcuts
+        self.root.bind('<Control-f>', lambda e: self.search_entry.focus_set())
+        
+        # Performance stats window
+        self.root.bind('<F12>', lambda e: self.toggle_stats_panel())
+        self.search_entry.bind('<Return>', self.play_search_result)
+        self.search_entry.bind('<Escape>', self.clear_search)
+        
+    def shortcut(self, action):
+        """Key handler that leaves keys typed into the search box alone"""
+        def handler(event):
+            if event.widget is not self.search_entry:
+                action()
+        return handler
         
     def load_settings(self):
         try:
             if os.path.exists(self.settings_file):
                 with open(self.settings_file, 'r') as f:
-                    settings = json.load(f)
-                    self.volume_var.set(settings.get('volume', 70))
-        except:
-            pass
+                    self.settings = json.load(f)
+        except (OSError, ValueError) as e:
+            tracing.swallowed('settings', e)  # Start from defaults
+        
+        # Number of concurrent metadata requests during a library scan
+        self.metadata_workers = max(1, int(self.settings.get('metadata_workers', 8)))
+        
+        # A catalog built by library_scanner.py replaces the startup scan
+        self.catalog_path = os.environ.get('MP3_PLAYER_CATALOG', self.settings.get('catalog_path'))
+        self.store_path = self.catalog_path if self.catalog_path and catalog.format_for(self.catalog_path) == 'sqlite' else None
+        self.store_cache_rows = int(self.settings.get('catalog_cache_rows', DEFAULT_CACHE_ROWS))
+        
+        # Start playing uncached songs once this much has downloaded
+        self.progressive_playback = bool(self.settings.get('progressive_playback', True))
+        self.progressive_start_bytes = int(self.settings.get('progressive_buffer_kb', 256)) * 1024
             
     def save_settings(self):
-        try:
-            settings = {
-                'volume': self.volume_var.get()
-            }
-            with open(self.settings_file, 'w') as f:
-                json.dump(settings, f)
-        except:
-            pass
+        """Write settings once changes settle, not on every slider tick"""
+        self.settings_saver.request()
+        
+    def write_settings(self):
+        # Keep any other keys (e.g. metadata_workers) that were set by hand
+        self.settings['volume'] = self.volume_var.get()
+        write_json_atomic(self.settings_file, self.settings)
+        
+    def restore_state(self):
+        """Show the playlist saved at the last exit straight away; the startup sync revalidates it"""
+        state = self.player_state
+        if self.store is not None:
+            self.show_store()
+        elif state.rows:
+            self.playlist = PlaylistModel(state.rows)
+            self.original_playlist = self.playlist
+            self.refresh_playlist_display()
+            self.queue_search_indexing(state.rows)
+            self.status_var.set(f"🎵 {self.playlist.track_count} songs loaded")
+        else:
+            return
+        
+        # Select the last track; playing it resumes where it stopped
+        position = self.playlist.position_of(state.current_url) if state.current_url else None
+        if position is not None:
+            track = self.playlist[position]
+            self.current_index = position
+            self.resume_url = track.url
+            self.resume_position = state.position
+            self.playlist_listbox.selection_set(position)
+            self.playlist_listbox.see(position)
+            self.track_label.config(text=f"Ready: 🌐 {track.artist} - {track.title}")
+            self.display_streaming_metadata(track.metadata)
+            self.show_artwork(track)
+            self.current_time_label.config(text=id3_reader.format_duration(state.position))
+        
+    def playback_position(self):
+        """Seconds into the current track, or into the track waiting to be resumed"""
+        if self.is_playing:
+            return self.seek_offset + max(self.audio.music.get_pos(), 0) / 1000.0
+        return self.resume_position if self.resume_url else 0.0
+        
+    def save_state(self):
+        """Snapshot the playlist and position here; encoding and writing happen on the state thread"""
+        state = PlayerState(self.player_state.path)
+        if self.store is None:  # A store keeps the playlist itself
+            state.rows = list(self.original_playlist.rows)
+        state.current_url = self.current_url or self.resume_url
+        state.position = self.playback_position()
+        self.state_writer.submit(state.save)
             
 
             
     def stream_from_github(self):
-        """Stream songs from GitHub repository with comprehensive scanning"""
+        """Sync songs from GitHub, fetching metadata only for new or changed files (worker thread)"""
         try:
-            # Clear existing playlist
-            self.clear_playlist()
-            
             # Show loading interface
-            self.show_loading_screen()
+            self.ui.post(self.show_loading_screen)
             
-            # GitHub repository details
-            repo_url = "https://github.com/justAleks0/MP3-Player"
-            songs_path = "MP3 Player/Songs"
+            self.update_scan_progress(5, "🌐 Connecting to GitHub repository...")
             
-            # Get repository contents
-            api_url = f"https://api.github.com/repos/justAleks0/MP3-Player/contents/{songs_path}"
+            # First pass: Discover all files across all folders
+            self.update_scan_progress(10, "📁 Discovering all music files...")
+            all_files = self.discover_all_files()
             
-            self.update_scan_progress(5, "🌐 Connecting to GitHub repository...")
+            self.sync_files(self.scanner, self.library_snapshot, all_files, lambda url: not is_local_url(url))
             
-            response = requests.get(api_url)
-            if response.status_code == 200:
-                contents = response.json()
-                
-                # First pass: Discover all files across all folders
-                self.update_scan_progress(10, "📁 Discovering all music files...")
-                all_files = self.discover_all_files(contents, songs_path)
-                
-                # Second pass: Extract metadata from all files
-                self.update_scan_progress(20, "🔍 Scanning metadata from all files...")
-                all_songs = self.extract_all_metadata(all_files)
-                
-                # Third pass: Group by artist and organize
-                self.update_scan_progress(80, "🎵 Organizing songs by artist...")
-                self.group_and_add_songs_with_progress(all_songs)
-                
-                self.update_scan_progress(100, "✅ Music library scan complete!")
-                
-                # Hide loading screen after a brief delay
-                self.root.after(1500, self.hide_loading_screen)
-                
+        except GitHubSourceError as e:
+            self.ui.post(self.hide_loading_screen)
+            self.ui.post(messagebox.showerror, "Error", f"Failed to access GitHub repository: {e.status_code}")
+            
+        except Exception as e:
+            self.ui.post(self.hide_loading_screen)
+            self.ui.post(messagebox.showerror, "Error", f"Failed to stream from GitHub: {str(e)}")
+            self.set_status("GitHub streaming failed")
+    
+    def scan_local_folders(self):
+        """Sync songs from the local folders, reading tags only for new or changed files (scan thread)"""
+        while True:
+            self.local_rescan = False
+            source = self.local_source
+            if not source.roots and not self.local_snapshot.files:
+                return  # No folders now, and none to forget
+            try:
+                self.ui.post(self.show_loading_screen)
+                self.update_scan_progress(10, "📁 Scanning local folders...")
+                all_files = source.discover()
+                self.sync_files(self.local_scanner, self.local_snapshot, all_files, is_local_url)
+            except Exception as e:
+                self.ui.post(self.hide_loading_screen)
+                self.set_status(f"Local folder scan failed: {str(e)}")
+            if not self.local_rescan:
+                return
+        
+    def sync_files(self, scanner, snapshot, all_files, owns):
+        """Scan thread: bring the playlist in line with a source's listing, fetching metadata only for new or changed files
+        
+        ``owns(url)`` tells which playlist tracks came from this source, so
+        only those are dropped when they're no longer listed.
+        """
+        # Compare blob SHAs (or local size/mtime stamps) with the last scan
+        diff = snapshot.diff(all_files)
+        
+        # Bring the playlist (possibly restored from the last session) in line
+        # with the listing, using metadata the last scan already has
+        known_songs = snapshot.songs_for(diff.unchanged)
+        listed_urls = {file_info['url'] for file_info in all_files}
+        store = LibraryStore(self.store_path) if self.store_path else None  # This thread's connection
+        try:
+            if store is not None:
+                self.reconcile_store(store, known_songs, listed_urls, owns)
             else:
-                self.hide_loading_screen()
-                messagebox.showerror("Error", f"Failed to access GitHub repository: {response.status_code}")
+                self.ui.post(self.reconcile_playlist, known_songs, listed_urls, owns)
+            if not diff.has_changes:
+                self.update_scan_progress(100, "✅ Music library is up to date")
+                self.ui.post(self.root.after, 1500, self.hide_loading_screen)
+                return
+            
+            # Second pass: Extract metadata from new or changed files only; each
+            # song joins its artist section as soon as its metadata arrives
+            self.update_scan_progress(20, f"🔍 Scanning metadata from {len(diff.to_fetch)} new or changed files...")
+            on_song = self.queue_new_song
+            if store is not None:
+                batch = []
                 
-        except Exception as e:
-            self.hide_loading_screen()
-            messagebox.showerror("Error", f"Failed to stream from GitHub: {str(e)}")
-            self.status_var.set("GitHub streaming failed")
+                def on_song(song):
+                    batch.append(song)
+                    if len(batch) >= STORE_BATCH:
+                        self.write_store(store, batch)
+                        batch.clear()
+            fetched_songs = self.extract_all_metadata(diff.to_fetch, on_song=on_song, scanner=scanner)
+            if store is not None:
+                self.write_store(store, batch)
+            snapshot.apply(diff, fetched_songs)
+            snapshot.save()
+        finally:
+            if store is not None:
+                store.close()
+        
+        self.update_scan_progress(100, "✅ Music library scan complete!")
+        
+        # Hide loading screen after a brief delay
+        self.ui.post(self.root.after, 1500, self.hide_loading_screen)
+        
+    def load_catalog(self):
+        """Load the library from a prebuilt catalog instead of scanning (worker thread)"""
+        self.update_scan_progress(10, f"📂 Loading catalog {os.path.basename(self.catalog_path)}...")
+        try:
+            songs, folder_images = catalog.read(self.catalog_path)
+        except (OSError, ValueError) as e:
+            self.ui.post(messagebox.showerror, "Error", f"Failed to load catalog: {str(e)}")
+            self.set_status("Catalog loading failed")
+            return
+        
+        self.github_source.folder_images = folder_images
+        listed_urls = {song['url'] for song in songs}
+        self.ui.post(self.reconcile_playlist, songs, listed_urls, lambda url: not is_local_url(url))
+        self.update_scan_progress(100, f"✅ Loaded {len(songs)} songs from catalog")
+        
+    def reconcile_playlist(self, known_songs, listed_urls, owns):
+        """Tk thread: load the playlist if empty, else drop the source's unlisted songs and add missing ones"""
+        if not self.original_playlist:
+            if known_songs:
+                self.rebuild_playlist(known_songs)
+            return
+        
+        # Removed from GitHub, without stopping playback
+        unlisted = [row.url for row in self.original_playlist
+                    if row.is_track and owns(row.url) and row.url not in listed_urls]
+        if unlisted:
+            self.remove_playlist_urls(unlisted)
+        
+        for song in known_songs:
+            if self.original_playlist.position_of(song['url']) is None:
+                self.pending_songs.append(song)
+        self.add_pending_songs()
+        
+    def reconcile_store(self, store, known_songs, listed_urls, owns):
+        """Scan thread: drop the source's unlisted songs from the library store and add missing ones"""
+        unlisted = [url for url in store.urls() if owns(url) and url not in listed_urls]
+        store.remove_urls(unlisted)
+        self.write_store(store, [song for song in known_songs if not store.contains(song['url'])])
+        
+    def write_store(self, store, songs):
+        """Scan thread: add or update songs in the library store, then show it"""
+        store.add_songs(songs)
+        self.ui.post_latest('store_changed', self.show_store)
+        
+    def show_store(self):
+        """Tk thread: show the library store's current contents, keeping the playing track"""
+        self.github_source.folder_images = self.store.get_meta('folder_images', {})
+        with tracing.span('group', store=True):
+            self.original_playlist = StorePlaylist(
+                self.store, cache_rows=self.store_cache_rows,
+                on_stale=lambda: self.ui.post_latest('store_changed', self.show_store))
+        # Redrawn from the new contents, so the shuffle order changes with the library
+        self.playlist = self.original_playlist.shuffled() if self.is_shuffled else self.original_playlist
+        self.refresh_playlist_display()
+        self.restore_current_index()
+        self.status_var.set(f"🎵 {self.original_playlist.track_count} songs loaded")
+        self.update_search()
+        
+    def rebuild_playlist(self, songs):
+        """Regroup the playlist from scratch while keeping the current track playing"""
+        self.playlist = PlaylistModel()
+        self.original_playlist = self.playlist
+        self.organizer = None
+        self.refresh_playlist_display()
+        self.search_index.clear()
+        self.search_backlog.clear()
+        
+        # A rebuilt playlist is always in original order
+        if self.is_shuffled:
+            self.is_shuffled = False
+            self.shuffle_button.config(bg='#4a4a4a', text='🔀')
+        
+        with tracing.span('group', songs=len(songs)):
+            self.group_and_add_songs_with_progress(songs)
+        self.restore_current_index()
+        self.state_saver.request()
+        
+    def remove_playlist_urls(self, urls):
+        """Remove songs from the playlist in place, along with emptied artist separators"""
+        urls = set(urls)
+        if self.original_playlist is not self.playlist:
+            self.original_playlist.remove_urls(urls)
+        self.organizer = None  # Section positions moved; rebuilt on the next insert
+        for url in urls:
+            self.search_index.remove(url)
+        
+        # Delete from the end so earlier listbox indices stay valid
+        for i in reversed(self.playlist.remove_urls(urls)):
+            self.playlist_listbox.delete(i)
+        
+        self.restore_current_index()
+        self.update_search()
+        self.state_saver.request()
+        
+    def restore_current_index(self):
+        """Point current_index back at the playing song after the playlist changed"""
+        url = self.current_url or self.resume_url
+        position = self.playlist.position_of(url) if url else None
+        if position is not None:
+            self.current_index = position
+            self.playlist_listbox.selection_clear(0, tk.END)
+            self.playlist_listbox.selection_set(position)
+        else:
+            self.current_index = min(self.current_index, max(len(self.playlist) - 1, 0))
     
     def show_loading_screen(self):
-        """Show the loading progress interface"""
+        """Show the loading progress above the playlist, which fills in as songs arrive"""
         self.loading_frame.pack(fill=tk.X, pady=(10, 0), before=self.playlist_frame)
-        self.playlist_frame.pack_forget()
         
     def hide_loading_screen(self):
         """Hide the loading progress interface"""
         self.loading_frame.pack_forget()
-        self.playlist_frame.pack(fill=tk.BOTH, expand=True, pady=(20, 0))
         
     def update_scan_progress(self, percentage, message):
-        """Update the progress bar and message"""
+        """Update the progress bar and message from any thread, at most once per frame"""
+        self.ui.post_latest('scan_progress', self.show_scan_progress, percentage, message)
+        
+    def show_scan_progress(self, percentage, message):
+        """Tk thread: draw scan progress"""
         self.scan_progress_var.set(percentage)
         self.progress_percent_label.config(text=f"{int(percentage)}%")
         self.loading_label.config(text=message)
         self.status_var.set(message)
-        self.root.update()
-        
-    def discover_all_files(self, contents, base_path):
-        """Recursively discover all MP3 files across all folders"""
-        all_files = []
-        
-        def scan_directory(items, current_path):
-            for item in items:
-                if item['type'] == 'file' and item['name'].lower().endswith('.mp3'):
-                    all_files.append({
-                        'url': item['download_url'],
-                        'name': item['name'],
-                        'path': current_path,
-                        'folder': os.path.basename(current_path)
-                    })
-                elif item['type'] == 'dir':
-                    try:
-                        subdir_url = f"https://api.github.com/repos/justAleks0/MP3-Player/contents/{current_path}/{item['name']}"
-                        subdir_response = requests.get(subdir_url)
-                        if subdir_response.status_code == 200:
-                            subdir_contents = subdir_response.json()
-                            scan_directory(subdir_contents, f"{current_path}/{item['name']}")
-                    except Exception as e:
-                        pass
-        
-        scan_directory(contents, base_path)
-        return all_files
-        
-    def extract_all_metadata(self, all_files):
-        """Extract metadata from all discovered files with progress tracking"""
-        all_songs = []
-        total_files = len(all_files)
-        
-        for i, file_info in enumerate(all_files):
-            # Calculate progress (20% to 80% of total progress)
-            progress = 20 + (i / total_files) * 60
-            self.update_scan_progress(progress, f"🔍 Scanning: {file_info['name']} ({i+1}/{total_files})")
-            
-            metadata = self.get_streaming_metadata(file_info['url'], file_info['name'])
-            
-            # Add folder information to metadata for better organization
-            metadata['folder'] = file_info['folder']
-            metadata['file_path'] = file_info['path']
-            
-            all_songs.append({
-                'url': file_info['url'],
-                'name': file_info['name'],
-                'metadata': metadata,
-                'folder': file_info['folder']
-            })
-            
-        return all_songs
+        
+    def discover_all_files(self):
+        """Discover all MP3 files, using one recursive Trees call when possible"""
+        return self.scanner.discover()
+        
+    def extract_all_metadata(self, all_files, on_song=None, scanner=None):
+        """Extract metadata from all discovered files using a bounded worker pool
+        
+        ``on_song`` is called with each song as soon as its metadata resolves.
+        """
+        def show_progress(completed, total_files, file_info):
+            # Calculate progress (20% to 80% of total progress) as files complete
+            progress = 20 + (completed / total_files) * 60
+            self.update_scan_progress(progress, f"🔍 Scanned: {file_info['name']} ({completed}/{total_files})")
+        
+        return (scanner or self.scanner).extract(all_files, on_song=on_song, on_progress=show_progress)
         
     def group_and_add_songs_with_progress(self, songs):
         """Group songs by artist with progress tracking and comprehensive organization"""
@@ -481,77 +877,93 @@ class MP3Player:
         
         # Add songs grouped by artist with separators
         total_artists = len(sorted_artists)
+        rows = []
         for i, artist in enumerate(sorted_artists):
             # Update progress for each artist
             artist_progress = 85 + (i / total_artists) * 10
             self.update_scan_progress(artist_progress, f"🎵 Adding {artist}...")
             
             # Add artist separator
-            separator_text = f"====={artist}====="
-            self.playlist.append({'type': 'separator', 'text': separator_text})
-            self.playlist_listbox.insert(tk.END, separator_text)
+            rows.append(Section(artist))
             
             # Sort songs within artist by title
             artist_songs = sorted(artist_groups[artist], key=lambda x: x['metadata']['title'])
             
+            # Add folder info if multiple folders exist for same artist
+            multiple_folders = len({song['folder'] for song in artist_songs}) > 1
+            
             # Add songs for this artist
             for song in artist_songs:
-                streaming_entry = {
-                    'type': 'streaming',
-                    'url': song['url'],
-                    'name': song['name'],
-                    'metadata': song['metadata'],
-                    'folder': song['folder'],
-                    'display_name': f"🌐 {song['metadata']['title']}"
-                }
-                
-                # Add folder info if multiple folders exist for same artist
-                if len([s for s in artist_groups[artist] if s['folder'] != song['folder']]) > 0:
-                    streaming_entry['display_name'] = f"🌐 {song['metadata']['title']} [{song['folder']}]"
-                
-                self.playlist.append(streaming_entry)
-                self.playlist_listbox.insert(tk.END, streaming_entry['display_name'])
+                rows.append(Track.from_song(song, show_folder=multiple_folders))
+        
+        self.playlist.extend(rows)
+        self.queue_search_indexing(rows)
+        
+        # One insert for the whole library; the view only draws what is visible
+        self.playlist_listbox.insert(tk.END, *(row.display_name for row in rows))
         
         # Save original playlist order for shuffle functionality
-        self.original_playlist = self.playlist.copy()
+        self.original_playlist = self.playlist
+        self.organizer = None
         
         # Final status update
         total_songs = sum(len(songs) for songs in artist_groups.values())
         self.status_var.set(f"✅ Loaded {total_songs} songs from {len(sorted_artists)} artists")
     
+    def queue_new_song(self, song):
+        """Hand a scanned song to the Tk thread; songs arriving within a frame are added together"""
+        self.pending_songs.append(song)
+        self.ui.post_latest('new_songs', self.add_pending_songs)
+        
+    def add_pending_songs(self):
+        """Tk thread: insert newly scanned songs into their artist sections"""
+        songs = []
+        while self.pending_songs:
+            songs.append(self.pending_songs.popleft())
+        if not songs:
+            return
+        
+        # Changed files keep their URL, so drop the outdated rows first
+        outdated = [song['url'] for song in songs if self.original_playlist.position_of(song['url']) is not None]
+        if outdated:
+            self.remove_playlist_urls(outdated)
+        
+        if self.organizer is None:
+            self.organizer = LibraryOrganizer(self.original_playlist)
+        
+        with tracing.span('group', songs=len(songs)):
+            for song in songs:
+                inserted, refreshed = self.organizer.add(song)
+                self.search_index.add(self.original_playlist[inserted[-1]])
+                if self.playlist is self.original_playlist:
+                    for position in inserted:
+                        self.playlist_listbox.insert(position, self.playlist[position].display_name)
+                    self.refresh_playlist_rows(refreshed)
+                else:
+                    # Shuffled: the new track lands at a random spot
+                    track = self.original_playlist[inserted[-1]]
+                    position = random.randint(0, len(self.playlist))
+                    self.playlist.insert(position, track)
+                    self.playlist_listbox.insert(position, track.display_name)
+                    self.refresh_playlist_rows(self.playlist.position_of(self.original_playlist[row].url)
+                                               for row in refreshed)
+        
+        self.restore_current_index()
+        self.status_var.set(f"🎵 {self.original_playlist.track_count} songs loaded")
+        self.update_search()
+        self.state_saver.request()
+        
+    def refresh_playlist_rows(self, positions):
+        """Redraw the listbox text of rows whose display name changed"""
+        for position in positions:
+            self.playlist_listbox.delete(position)
+            self.playlist_listbox.insert(position, self.playlist[position].display_name)
+    
     def add_github_songs(self, contents, base_path):
-        """Recursively add songs from GitHub repository"""
-        songs_found = 0
-        all_songs = []  # Collect all songs first
-        
-        for item in contents:
-            if item['type'] == 'file' and item['name'].lower().endswith('.mp3'):
-                # Found an MP3 file
-                song_url = item['download_url']
-                song_name = item['name']
-                
-                # Get metadata for the song
-                metadata = self.get_streaming_metadata(song_url, song_name)
-                all_songs.append({
-                    'url': song_url,
-                    'name': song_name,
-                    'metadata': metadata
-                })
-                songs_found += 1
-                
-            elif item['type'] == 'dir':
-                # Recursively explore subdirectories (artists)
-                try:
-                    subdir_url = f"https://api.github.com/repos/justAleks0/MP3-Player/contents/{base_path}/{item['name']}"
-                    subdir_response = requests.get(subdir_url)
-                    
-                    if subdir_response.status_code == 200:
-                        subdir_contents = subdir_response.json()
-                        subdir_songs = self.add_github_songs(subdir_contents, f"{base_path}/{item['name']}")
-                        songs_found += subdir_songs
-                        
-                except Exception as e:
-                    self.status_var.set(f"Error accessing subdirectory {item['name']}: {str(e)}")
+        """Add songs from a GitHub contents listing and its subdirectories"""
+        # Collect all songs first
+        all_songs = self.scanner.extract(list(self.github_source.walk_contents(contents, base_path)))
+        songs_found = len(all_songs)
         
         # Group songs by artist and add to playlist
         if all_songs:
@@ -564,101 +976,6 @@ class MP3Player:
             
         return songs_found
     
-    def get_streaming_metadata(self, url, name):
-        """Get metadata for streaming songs"""
-        metadata = {
-            'artist': 'Unknown Artist',
-            'title': name.replace('.mp3', ''),
-            'album': 'Unknown Album',
-            'year': 'Unknown',
-            'genre': 'Unknown',
-            'duration': 'Unknown',
-            'bitrate': 'Unknown',
-            'filesize': 'Unknown'
-        }
-        
-        try:
-            # Download a small portion to get metadata
-            response = requests.get(url, stream=True)
-            response.raise_for_status()
-            
-            # Create temporary file for metadata extraction
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as temp_file:
-                # Download first 1MB for metadata
-                chunk_size = 8192
-                downloaded = 0
-                max_download = 1024 * 1024  # 1MB
-                
-                for chunk in response.iter_content(chunk_size=chunk_size):
-                    if downloaded >= max_download:
-                        break
-                    temp_file.write(chunk)
-                    downloaded += len(chunk)
-                
-                temp_file.flush()
-                
-                # Extract metadata
-                try:
-                    audio = MP3(temp_file.name)
-                    
-                    # Duration
-                    if audio.info.length:
-                        minutes = int(audio.info.length // 60)
-                        seconds = int(audio.info.length % 60)
-                        metadata['duration'] = f"{minutes:02d}:{seconds:02d}"
-                    
-                    # Bitrate
-                    if audio.info.bitrate:
-                        if audio.info.bitrate < 1000:
-                            metadata['bitrate'] = f"{audio.info.bitrate} bps"
-                        else:
-                            metadata['bitrate'] = f"{audio.info.bitrate / 1000:.0f} kbps"
-                    
-                    # ID3 tags
-                    if audio.tags:
-                        # Artist
-                        if 'TPE1' in audio.tags:
-                            metadata['artist'] = str(audio.tags['TPE1'])
-                        elif 'artist' in audio.tags:
-                            metadata['artist'] = str(audio.tags['artist'])
-                        
-                        # Title
-                        if 'TIT2' in audio.tags:
-                            metadata['title'] = str(audio.tags['TIT2'])
-                        elif 'title' in audio.tags:
-                            metadata['title'] = str(audio.tags['title'])
-                        
-                        # Album
-                        if 'TALB' in audio.tags:
-                            metadata['album'] = str(audio.tags['TALB'])
-                        elif 'album' in audio.tags:
-                            metadata['album'] = str(audio.tags['album'])
-                        
-                        # Year
-                        if 'TDRC' in audio.tags:
-                            year_str = str(audio.tags['TDRC'])
-                            if year_str.isdigit():
-                                metadata['year'] = year_str
-                        elif 'year' in audio.tags:
-                            metadata['year'] = str(audio.tags['year'])
-                        
-                        # Genre
-                        if 'TCON' in audio.tags:
-                            metadata['genre'] = str(audio.tags['TCON'])
-                        elif 'genre' in audio.tags:
-                            metadata['genre'] = str(audio.tags['genre'])
-                
-                except Exception as e:
-                    pass
-                
-                # Clean up temp file
-                os.unlink(temp_file.name)
-                
-        except Exception as e:
-            pass
-        
-        return metadata
-    
     def group_and_add_songs(self, songs):
         """Group songs by artist and add to playlist with separators"""
         # Group songs by artist
@@ -674,66 +991,210 @@ class MP3Player:
         sorted_artists = sorted(artist_groups.keys())
         
         # Add songs grouped by artist with separators
+        rows = []
         for artist in sorted_artists:
             # Add artist separator
-            separator_text = f"====={artist}====="
-            self.playlist.append({'type': 'separator', 'text': separator_text})
-            self.playlist_listbox.insert(tk.END, separator_text)
+            rows.append(Section(artist))
             
             # Add songs for this artist
             for song in artist_groups[artist]:
-                streaming_entry = {
-                    'type': 'streaming',
-                    'url': song['url'],
-                    'name': song['name'],
-                    'metadata': song['metadata'],
-                    'display_name': f"🌐 {song['metadata']['title']}"
-                }
-                
-                self.playlist.append(streaming_entry)
-                self.playlist_listbox.insert(tk.END, streaming_entry['display_name'])
+                rows.append(Track.from_song(song))
+        
+        self.playlist.extend(rows)
+        self.queue_search_indexing(rows)
+        self.playlist_listbox.insert(tk.END, *(row.display_name for row in rows))
     
     def add_streaming_song(self, url, name):
         """Add a streaming song to the playlist"""
-        # Create a special entry for streaming songs
-        streaming_entry = {
-            'type': 'streaming',
-            'url': url,
-            'name': name,
-            'display_name': f"🌐 {name}"
-        }
+        track = Track(url, name, {'title': name})
         
         # Add to playlist
-        self.playlist.append(streaming_entry)
-        self.playlist_listbox.insert(tk.END, streaming_entry['display_name'])
+        self.playlist.extend([track])
+        self.search_index.add(track)
+        self.playlist_listbox.insert(tk.END, track.display_name)
         
-    def stream_directly_from_url(self, url, name):
-        """Stream directly from URL without any file creation"""
+    def stream_directly_from_url(self, url, name, sha=None, generation=None):
+        """Return a path or file-like object for pygame, downloading on a cache miss"""
         try:
-            # For true streaming, we need to use pygame's URL support
-            # However, pygame.mixer doesn't support direct URL streaming
-            # So we'll use a minimal temporary file that gets deleted immediately after use
+            # Local songs play straight from disk
+            if is_local_url(url):
+                path = path_for_url(url)
+                if not os.path.exists(path):
+                    self.set_status(f"File not found: {path}")
+                    return None
+                self.set_status(f"Playing {name} from disk")
+                return path
+            
+            # pygame.mixer can't stream from a URL, so play from the on-disk cache
+            if not self.await_prefetch(url, sha, generation):
+                return None  # Another track was picked meanwhile
+            cached_file = self.audio_cache.get(url, sha)
+            if cached_file:
+                tracing.count('audio cache hits')
+                self.set_status(f"Playing {name} from cache")
+                return cached_file
+            tracing.count('audio cache misses')
+            
+            self.set_status(f"Streaming {name}...")
             
-            self.status_var.set(f"Streaming {name}...")
-            self.root.update()
+            if self.progressive_playback:
+                # Hand pygame the download as soon as the first part is buffered;
+                # the finished file goes into the cache for next time
+                stream = ProgressiveStream(url, self.playback_get, read_timeout=self.transport.timeout[1],
+                                           on_complete=lambda buffer: self.store_download(url, sha, buffer),
+                                           buffers=self.playback_buffers)
+                with self.load_cond:
+                    self.loading_stream = stream  # Closed if another track is picked meanwhile
+                try:
+                    with tracing.span('buffer', url=url):
+                        buffered = stream.wait_for(self.progressive_start_bytes, self.transport.timeout[1])
+                except Exception:
+                    stream.close()
+                    raise
+                finally:
+                    with self.load_cond:
+                        if self.loading_stream is stream:
+                            self.loading_stream = None
+                if not buffered:
+                    # Stalled, or cancelled by another pick; don't start the mixer on a short buffer
+                    cancelled = stream.closed
+                    stream.close()
+                    if not cancelled:
+                        self.set_status(f"Timed out buffering {name}")
+                    return None
+                return stream
+            
+            return self.audio_cache.download(url, sha, self.playback_get)
             
-            # Create a minimal temp file that will be deleted after playback
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.mp3')
-            temp_file.close()
+        except Exception as e:
+            self.set_status(f"Streaming failed: {str(e)}")
+            return None
             
-            # Stream the file in chunks
-            response = requests.get(url, stream=True)
-            response.raise_for_status()
+    def store_download(self, url, sha, buffer):
+        """Download thread: cache a finished progressive download along with its seek index"""
+        path = self.audio_cache.put(url, sha, buffer.chunks())
+        seek_index = SeekIndex.from_file(path)
+        if seek_index is not None:
+            seek_index.save(self.audio_cache.sidecar_path(path, INDEX_SUFFIX))
+            self.ui.post(self.attach_seek_index, url, seek_index)
+        
+    def await_prefetch(self, url, sha, generation):
+        """Loader thread: give a prefetch of this track already under way ``PREFETCH_WAIT`` seconds to finish
+        
+        If it doesn't, the track streams progressively and the prefetch goes
+        on in the background at its own priority. False if another track was
+        picked (or playback stopped) while waiting.
+        """
+        self.downloads.promote(url)  # The prefetch is now what playback waits on
+        deadline = time.monotonic() + PREFETCH_WAIT
+        while not self.prefetcher.wait_for(url, sha, PREFETCH_WAIT_SLICE):
+            if generation is not None and generation != self.load_generation:
+                self.downloads.demote(url)
+                return False
+            if time.monotonic() >= deadline:
+                self.downloads.demote(url)
+                break
+        return True
+        
+    def seek_index_for(self, source, local=False):
+        """Worker thread: the seek index for a cached or local path or a progressive stream, or None"""
+        if isinstance(source, ProgressiveStream):
+            # Only the head has arrived; the VBR header's table covers the rest
+            return SeekIndex.from_bytes(source.head(self.progressive_start_bytes),
+                                        source.total_size, complete=False)
+        if local:
+            # Nothing is written next to the user's own files
+            try:
+                return SeekIndex.from_file(source)
+            except OSError:
+                return None
+        
+        # Built once per track and kept next to it in the cache
+        sidecar = self.audio_cache.sidecar_path(source, INDEX_SUFFIX)
+        seek_index = SeekIndex.load(sidecar)
+        if seek_index is None:
+            try:
+                seek_index = SeekIndex.from_file(source)
+            except OSError:
+                return None
+            if seek_index is not None:
+                seek_index.save(sidecar)
+        return seek_index
+        
+    def attach_seek_index(self, url, seek_index):
+        """Tk thread: switch the playing track to the exact index once its download finishes"""
+        if url == self.current_url:
+            self.seek_index = seek_index
+            self.track_duration = seek_index.duration
+            self.total_time_label.config(text=id3_reader.format_duration(seek_index.duration))
             
-            with open(temp_file.name, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+    def show_artwork(self, track, source=None):
+        """Show a track's artwork: straight from memory, else decoded on the artwork thread
+        
+        ``source`` is the track's cached path or progressive stream, for its embedded picture.
+        """
+        track_key = (track.url, track.sha)
+        folder_image = (self.github_source.folder_images.get(track.file_path)
+                        or self.local_source.folder_images.get(track.file_path))
+        folder_key = (folder_image['url'], folder_image.get('sha')) if folder_image else None
+        
+        self.artwork_url = track.url
+        photo = self.artwork.cached_photo(track_key, folder_key)
+        self.set_artwork(photo or self.default_artwork)
+        if photo is None:
+            self.artwork_worker.submit(self.load_artwork, track, source, track_key, folder_key)
+        
+    def load_artwork(self, track, source, track_key, folder_key):
+        """Artwork thread: find or build the track's thumbnail and hand it to the Tk thread"""
+        if track.url != self.artwork_url:
+            return  # Skipped past already
+        
+        def fetch_folder_image():
+            if is_local_url(folder_key[0]):
+                return self.local_source.read_file(folder_key[0])
+            response = self.downloads.get(folder_key[0], ARTWORK)
+            return response.content if response.status_code == 200 else None
+        
+        try:
+            found = self.artwork.thumbnail(track_key, (lambda: self.read_id3_tag(source)) if source else None,
+                                           folder_key, fetch_folder_image)
+        except Exception as e:
+            tracing.swallowed('artwork', e)
+            print(f"Artwork failed for {track.name}: {e}")
+            return
+        if found is not None:
+            self.ui.post(self.apply_artwork, track.url, *found)
             
-            # Return the temp file path (will be cleaned up later)
-            return temp_file.name
+    def apply_artwork(self, url, key, image):
+        """Tk thread: show a freshly loaded thumbnail if its track is still the one shown"""
+        photo = self.artwork.photo_for(key, image)
+        if url == self.artwork_url:
+            self.set_artwork(photo)
             
+    def set_artwork(self, photo):
+        self.artwork_label.configure(image=photo)
+        self.artwork_label.image = photo
+        
+    def read_id3_tag(self, source):
+        """Artwork thread: the ID3v2 tag of a cached path or progressive stream
+        
+        Returns b"" when there is no tag, or None when the bytes can't be had.
+        """
+        try:
+            if isinstance(source, ProgressiveStream):
+                timeout = self.transport.timeout[1]
+                if not source.wait_for(id3_reader.ID3V2_HEADER_SIZE, timeout):
+                    return None
+                size = id3_reader.id3v2_tag_size(source.head(id3_reader.ID3V2_HEADER_SIZE))
+                if size and not source.wait_for(size, timeout):
+                    return None
+                return source.head(size)
+            with open(source, 'rb') as f:
+                size = id3_reader.id3v2_tag_size(f.read(id3_reader.ID3V2_HEADER_SIZE))
+                f.seek(0)
+                return f.read(size)
         except Exception as e:
-            self.status_var.set(f"Streaming failed: {str(e)}")
+            tracing.swallowed('artwork tag', e)
             return None
             
     def display_streaming_metadata(self, metadata):
@@ -748,12 +1209,19 @@ class MP3Player:
             
     def clear_playlist(self):
         self.stop()
-        self.playlist.clear()
-        self.original_playlist.clear()
-        self.playlist_listbox.delete(0, tk.END)
+        self.playlist = PlaylistModel()
+        self.original_playlist = self.playlist
+        self.organizer = None
+        self.refresh_playlist_display()  # The library store, if any, is kept; Refresh shows it again
+        self.search_index.clear()
+        self.search_backlog.clear()
+        self.search_var.set("")
         self.current_track = None
+        self.current_url = None
         self.current_index = 0
+        self.resume_url = None
         self.track_label.config(text="No track selected")
+        self.state_saver.request()
         
         # Reset shuffle state
         self.is_shuffled = False
@@ -764,11 +1232,68 @@ class MP3Player:
             label.config(text="N/A")
         
         # Reset artwork to default
-        self.artwork_label.configure(image=self.default_artwork)
-        self.artwork_label.image = self.default_artwork
+        self.artwork_url = None
+        self.set_artwork(self.default_artwork)
         
         self.status_var.set("Playlist cleared")
         
+    def queue_search_indexing(self, rows):
+        """Index bulk-loaded rows for search a chunk per frame, so big loads don't freeze the UI"""
+        idle = not self.search_backlog
+        self.search_backlog.extend(rows)
+        if idle:
+            self.root.after(1, self.index_search_backlog)
+        
+    def index_search_backlog(self):
+        chunk = []
+        while self.search_backlog and len(chunk) < SEARCH_INDEX_CHUNK:
+            row = self.search_backlog.popleft()
+            # Skip tracks removed from the playlist while they waited
+            position = self.original_playlist.position_of(row.url) if row.is_track else None
+            if position is not None and self.original_playlist[position] is row:
+                chunk.append(row)
+        self.search_index.add_many(chunk)
+        
+        if self.search_backlog:
+            self.root.after(1, self.index_search_backlog)
+        self.update_search()
+        
+    def update_search(self):
+        """Show tracks matching the search box, or the playlist when it is empty"""
+        query = self.search_var.get().strip()
+        if not query:
+            self.search_results = []
+            if self.search_listbox.winfo_manager():
+                self.search_listbox.pack_forget()
+                self.playlist_listbox.pack(fill=tk.BOTH, expand=True, pady=(5, 0))
+            return
+        
+        if self.store is not None:
+            self.search_results = self.store.search(query, limit=SEARCH_LIMIT)
+        else:
+            self.search_results = self.search_index.search(query, limit=SEARCH_LIMIT)
+        self.search_listbox.set_rows([f"🌐 {track.title} - {track.artist}" for track in self.search_results])
+        if not self.search_listbox.winfo_manager():
+            self.playlist_listbox.pack_forget()
+            self.search_listbox.pack(fill=tk.BOTH, expand=True, pady=(5, 0))
+        
+        count = len(self.search_results)
+        self.status_var.set(f"🔍 {count}{'+' if count >= SEARCH_LIMIT else ''} matches for \"{query}\"")
+        
+    def play_search_result(self, event=None):
+        """Play the selected search result (or the first one) from its place in the playlist"""
+        selection = self.search_listbox.curselection()
+        index = selection[0] if selection else 0
+        if index < len(self.search_results):
+            position = self.playlist.position_of(self.search_results[index].url)
+            if position is not None:
+                self.current_index = position
+                self.play_current_track()
+        
+    def clear_search(self, event=None):
+        self.search_var.set("")
+        self.root.focus_set()
+        
     def play_selected_track(self, event=None):
         selection = self.playlist_listbox.curselection()
         if selection:
@@ -782,107 +1307,198 @@ class MP3Player:
             self.playlist_listbox.selection_set(self.current_index)
             self.playlist_listbox.see(self.current_index)
             
-            try:
-                # Handle separators - skip to next track
-                if isinstance(current_item, dict) and current_item.get('type') == 'separator':
-                    self.next_track()
-                    return
-                
-                # Handle streaming songs only (no local files)
-                if isinstance(current_item, dict) and current_item.get('type') == 'streaming':
-                    # Stream directly from URL without caching
-                    streamed_file = self.stream_directly_from_url(current_item['url'], current_item['name'])
-                    if streamed_file:
-                        self.current_track = streamed_file
-                        display_name = current_item['metadata']['title']
-                        artist = current_item['metadata']['artist']
-                        self.track_label.config(text=f"Now playing: 🌐 {artist} - {display_name}")
-                        self.status_var.set(f"Playing: {display_name}")
-                    else:
-                        self.status_var.set("Failed to stream song")
-                        return
-                else:
-                    # No local files supported - skip
-                    self.status_var.set("Only streaming songs supported")
-                    return
-                
-                pygame.mixer.music.load(self.current_track)
-                pygame.mixer.music.play()
-                self.is_playing = True
-                self.is_paused = False
-                self.play_button.config(text="⏸")
-                
-                # Display metadata for streaming songs
-                self.display_streaming_metadata(current_item['metadata'])
-                self.artwork_label.configure(image=self.default_artwork)
-                self.artwork_label.image = self.default_artwork
-                
-                # Start progress update thread
-                self.progress_thread = threading.Thread(target=self.update_progress, daemon=True)
-                self.progress_thread.start()
-                
-            except Exception as e:
-                messagebox.showerror("Error", f"Could not play file: {str(e)}")
-                self.status_var.set("Error playing file")
-                
+            # Handle separators - skip to next track
+            if not current_item.is_track:
+                self.next_track()
+                return
+            
+            # Fetch the audio off the Tk thread; only the newest request gets to play
+            self.load_generation += 1
+            self.set_playback_state(LOADING)
+            with self.load_cond:
+                self.load_request = (current_item, self.load_generation)
+                self.cancel_loading_stream()
+                self.load_cond.notify()
+            
+    def cancel_loading_stream(self):
+        """Give up on a download the loader is still buffering (call with load_cond held)"""
+        if self.loading_stream is not None:
+            self.loading_stream.close()
+            self.loading_stream = None
+            
+    def loader_loop(self):
+        """Loader thread: fetch the newest requested track, skipping any that were superseded"""
+        while True:
+            with self.load_cond:
+                while self.load_request is None:
+                    self.load_cond.wait()
+                current_item, generation = self.load_request
+                self.load_request = None
+            if generation == self.load_generation:
+                self.load_track(current_item, generation)
+            
+    def load_track(self, current_item, generation):
+        """Worker thread: get a playable source for a track, then hand it to the Tk thread"""
+        streamed_file = None
+        try:
+            # Play from the audio cache, downloading on a miss
+            streamed_file = self.stream_directly_from_url(current_item.url, current_item.name, current_item.sha,
+                                                          generation)
+            seek_index = (self.seek_index_for(streamed_file, is_local_url(current_item.url))
+                          if streamed_file else None)
+        except Exception as e:
+            # A bad file must not take the loader thread down with it
+            tracing.swallowed('load track', e)
+            print(f"Loading {current_item.name} failed: {e}")
+            if isinstance(streamed_file, ProgressiveStream):
+                streamed_file.close()
+            streamed_file = seek_index = None
+        self.ui.post(self.start_playback, current_item, streamed_file, seek_index, generation)
+        
+    def start_playback(self, current_item, streamed_file, seek_index, generation):
+        """Tk thread: start playing a source fetched by load_track"""
+        if generation != self.load_generation:
+            # Another track was picked (or playback stopped) while this one loaded
+            if isinstance(streamed_file, ProgressiveStream):
+                streamed_file.close()
+            return
+        if not streamed_file:
+            self.set_playback_state(STOPPED)
+            self.status_var.set("Failed to stream song")
+            return
+        
+        try:
+            # Release the previous track and keep this one from being evicted
+            self.cleanup_temp_files()
+            if isinstance(streamed_file, ProgressiveStream):
+                self.progressive_stream = streamed_file
+            else:
+                self.audio_cache.pin(streamed_file)
+                self.pinned_track = streamed_file
+            self.current_track = streamed_file
+            self.current_url = current_item.url
+            display_name = current_item.title
+            artist = current_item.artist
+            self.track_label.config(text=f"Now playing: 🌐 {artist} - {display_name}")
+            self.status_var.set(f"Playing: {display_name}")
+            
+            # Duration from the seek index, else the scanned tag's estimate
+            self.seek_index = seek_index
+            if seek_index is not None:
+                self.track_duration = seek_index.duration
+            else:
+                self.track_duration = id3_reader.parse_duration(current_item.duration)
+            self.total_time_label.config(text=id3_reader.format_duration(self.track_duration or 0))
+            
+            # Pick up where the last session stopped, if this is that track
+            start, offset = 0.0, 0
+            if current_item.url == self.resume_url and seek_index is not None:
+                start, offset = seek_index.locate(self.resume_position)
+            self.resume_url = None
+            view = self.open_view_at(offset) if offset else None
+            if view is None:
+                start = 0.0
+                if isinstance(streamed_file, ProgressiveStream):
+                    # pygame closes the file object it plays when the music changes;
+                    # a view keeps the download alive for seeks within this track
+                    view = self.open_view_at(0)
+            self.seek_view = view
+            self.seek_offset = start
+            with tracing.span('mixer load', url=current_item.url):
+                self.audio.music.load(view or streamed_file, "mp3")
+                self.audio.music.play()
+            self.set_playback_state(PLAYING)
+            self.play_button.config(text="⏸")
+            self.state_saver.request()
+            
+            # Display metadata for streaming songs
+            self.display_streaming_metadata(current_item.metadata)
+            self.show_artwork(current_item, streamed_file)
+            
+            # Get the following tracks ready while this one plays
+            self.schedule_prefetch()
+            
+        except Exception as e:
+            self.set_playback_state(STOPPED)
+            messagebox.showerror("Error", f"Could not play file: {str(e)}")
+            self.status_var.set("Error playing file")
+            
+    def upcoming_tracks(self, count):
+        """The next playable (url, sha) pairs after current_index, in playback order"""
+        tracks = []
+        position = self.current_index
+        for _ in range(count):
+            position = self.playlist.next_playable(position)
+            if position is None or position == self.current_index:
+                break
+            track = self.playlist[position]
+            tracks.append((track.url, track.sha))
+        return tracks
+        
+    def schedule_prefetch(self):
+        """Point the prefetcher at whatever comes after the current track"""
+        upcoming = self.upcoming_tracks(self.prefetcher.depth)
+        self.prefetcher.schedule([(url, sha) for url, sha in upcoming if not is_local_url(url)])
+            
     def play_pause(self):
         if not self.current_track:
             if self.playlist:
                 self.play_current_track()
             return
             
+        if self.playback_state == LOADING:
+            return  # The requested track starts as soon as it has loaded
         if self.is_playing and not self.is_paused:
-            pygame.mixer.music.pause()
-            self.is_paused = True
+            self.audio.music.pause()
+            self.set_playback_state(PAUSED)
             self.play_button.config(text="▶")
             self.status_var.set("Paused")
+            self.state_saver.request()
         elif self.is_paused:
-            pygame.mixer.music.unpause()
-            self.is_paused = False
+            self.audio.music.unpause()
+            self.set_playback_state(PLAYING)
             self.play_button.config(text="⏸")
             self.status_var.set("Playing")
         else:
             self.play_current_track()
             
     def stop(self):
-        pygame.mixer.music.stop()
-        self.is_playing = False
-        self.is_paused = False
+        self.load_generation += 1  # Cancel any track still loading
+        with self.load_cond:
+            self.load_request = None
+            self.cancel_loading_stream()
+        if self.audio.available:
+            self.audio.music.stop()
+        self.set_playback_state(STOPPED)
         self.play_button.config(text="▶")
         self.progress_var.set(0)
         self.current_time_label.config(text="00:00")
+        self.seek_offset = 0.0
+        self.resume_url = None
         self.cleanup_temp_files()
         self.status_var.set("Stopped")
+        self.state_saver.request()
         
     def next_track(self):
         if self.playlist:
-            self.cleanup_temp_files()
-            self.current_index = (self.current_index + 1) % len(self.playlist)
-            
-            # Skip separators
-            while (self.current_index < len(self.playlist) and 
-                   isinstance(self.playlist[self.current_index], dict) and 
-                   self.playlist[self.current_index].get('type') == 'separator'):
-                self.current_index = (self.current_index + 1) % len(self.playlist)
-            
+            # Separators are skipped by the model's next-playable index
+            position = self.playlist.next_playable(self.current_index)
+            if position is None:
+                return
+            self.current_index = position
             self.play_current_track()
             
     def previous_track(self):
         if self.playlist:
-            self.cleanup_temp_files()
-            self.current_index = (self.current_index - 1) % len(self.playlist)
-            
-            # Skip separators
-            while (self.current_index >= 0 and 
-                   isinstance(self.playlist[self.current_index], dict) and 
-                   self.playlist[self.current_index].get('type') == 'separator'):
-                self.current_index = (self.current_index - 1) % len(self.playlist)
-            
+            position = self.playlist.previous_playable(self.current_index)
+            if position is None:
+                return
+            self.current_index = position
             self.play_current_track()
             
     def set_volume(self, value):
         volume = float(value) / 100.0
-        pygame.mixer.music.set_volume(volume)
+        self.audio.set_volume(volume)
         self.volume_label.config(text=f"{int(value)}%")
         self.save_settings()
         
@@ -900,43 +1516,26 @@ class MP3Player:
         
     def toggle_shuffle(self):
         """Toggle shuffle mode on/off"""
-        import random
-        
         if not self.is_shuffled:
             # Enable shuffle
             self.is_shuffled = True
             self.shuffle_button.config(bg='#ff6b35', text='🔀')  # Orange background when active
             
             # Save original playlist order
-            self.original_playlist = self.playlist.copy()
+            self.original_playlist = self.playlist
             
-            # Create shuffled playlist while preserving separators
-            songs_only = [item for item in self.playlist if isinstance(item, dict) and item.get('type') == 'streaming']
-            separators = [item for item in self.playlist if isinstance(item, dict) and item.get('type') == 'separator']
-            
-            # Shuffle only the songs
-            random.shuffle(songs_only)
-            
-            # Create new shuffled playlist with songs only (no separators in shuffle mode)
-            self.playlist = songs_only
+            # Shuffle only the songs (no separators in shuffle mode)
+            self.playlist = self.original_playlist.shuffled()
             
             # Update the listbox display
             self.refresh_playlist_display()
             
-            # Adjust current index if needed
-            if self.current_track:
-                try:
-                    # Find the current track in the new shuffled playlist
-                    for i, item in enumerate(self.playlist):
-                        if (isinstance(item, dict) and item.get('type') == 'streaming' and 
-                            hasattr(self, 'current_track') and 
-                            item.get('url') == getattr(self.current_item, 'get', lambda x: None)('url')):
-                            self.current_index = i
-                            break
-                except:
-                    self.current_index = 0
+            # Find the current track in the new shuffled playlist
+            self.restore_current_index()
             
             self.status_var.set("🔀 Shuffle enabled - Playing songs in random order")
+            if self.current_track:
+                self.schedule_prefetch()
             
         else:
             # Disable shuffle
@@ -944,97 +1543,160 @@ class MP3Player:
             self.shuffle_button.config(bg='#4a4a4a', text='🔀')  # Return to normal background
             
             # Restore original playlist order
-            if self.original_playlist:
-                self.playlist = self.original_playlist.copy()
-                self.refresh_playlist_display()
-                
-                # Try to find current track in original playlist
-                if self.current_track:
-                    try:
-                        for i, item in enumerate(self.playlist):
-                            if (isinstance(item, dict) and item.get('type') == 'streaming' and 
-                                hasattr(self, 'current_item') and 
-                                item.get('url') == getattr(self.current_item, 'get', lambda x: None)('url')):
-                                self.current_index = i
-                                break
-                    except:
-                        self.current_index = 0
+            self.playlist = self.original_playlist
+            self.refresh_playlist_display()
+            
+            # Find the current track in the original playlist
+            self.restore_current_index()
             
             self.status_var.set("📋 Shuffle disabled - Playing songs in original order")
+            if self.current_track:
+                self.schedule_prefetch()
             
+    def toggle_stats_panel(self):
+        """Open or close the live performance stats window"""
+        if self.stats_panel is not None:
+            self.stats_panel.close()
+            return
+        from stats_panel import StatsPanel
+        
+        def closed():
+            self.stats_panel = None
+        self.stats_panel = StatsPanel(self.root, keep_tracing=bool(self.trace_path), on_close=closed,
+                                      details=lambda: [f"Audio {self.audio_cache.summary()}"])
+        
     def refresh_playlist_display(self):
-        """Refresh the playlist display in the listbox"""
-        self.playlist_listbox.delete(0, tk.END)
-        
-        for item in self.playlist:
-            if isinstance(item, dict):
-                if item.get('type') == 'separator':
-                    self.playlist_listbox.insert(tk.END, item['text'])
-                elif item.get('type') == 'streaming':
-                    self.playlist_listbox.insert(tk.END, item['display_name'])
-            else:
-                # Handle any non-dict items (shouldn't happen in streaming mode)
-                self.playlist_listbox.insert(tk.END, str(item))
+        """Show the current playlist in the listbox; rows are formatted (or paged in) as they scroll into view"""
+        self.playlist_listbox.set_source(self.playlist.display_rows())
         
     def seek(self, event):
         if self.current_track and self.is_playing:
             # Get click position on progress bar
             x = event.x
             width = self.progress_bar.winfo_width()
-            percentage = x / width
+            percentage = min(max(x / width, 0.0), 1.0)
+            
+            if self.seek_index is None:
+                self.status_var.set("Seeking isn't available for this track")
+                return
             
-            # Get total duration and seek
+            # Start the decoder at the indexed frame; nothing before it is decoded
+            start, offset = self.seek_index.locate(percentage * self.seek_index.duration)
             try:
-                # This is a simplified seek - pygame doesn't have direct seek support
-                # In a real implementation, you'd need to use a different library
-                self.status_var.set("Seek not supported in this version")
-            except:
-                pass
-                
-    def update_progress(self):
-        while self.is_playing and not self.is_paused:
+                view = self.open_view_at(offset)
+            except OSError as e:
+                self.status_var.set(f"Seek failed: {e}")
+                return
+            if view is None:
+                self.status_var.set("⏳ That part hasn't downloaded yet")
+                return
+            
+            # The clock ticks on this thread too, so it never sees the mixer mid-restart
             try:
-                # Get current position and duration
-                current_pos = pygame.mixer.music.get_pos() / 1000.0  # Convert to seconds
-                
-                # Update progress bar (simplified - assumes 3 minute songs)
-                # In a real implementation, you'd get actual duration
-                total_duration = 180  # 3 minutes as default
-                progress = (current_pos / total_duration) * 100
-                self.progress_var.set(min(progress, 100))
-                
-                # Update time labels
-                current_min = int(current_pos // 60)
-                current_sec = int(current_pos % 60)
-                self.current_time_label.config(text=f"{current_min:02d}:{current_sec:02d}")
+                with tracing.span('mixer load', seek=True):
+                    self.audio.music.load(view, "mp3")
+                    self.audio.music.play()
+                if self.is_paused:
+                    self.audio.music.pause()
+            except Exception as e:
+                view.close()
+                self.status_var.set(f"Seek failed: {e}")
+                return
+            if self.is_buffering:
+                self.set_playback_state(PLAYING)  # The next tick checks the new position's headroom
+            
+            self.close_seek_view()
+            self.seek_view = view
+            self.seek_offset = start
+            self.show_progress(start / self.seek_index.duration * 100 if self.seek_index.duration else 0, start)
                 
-                # Check if song ended
-                if not pygame.mixer.music.get_busy() and self.is_playing:
-                    self.root.after(0, self.next_track)
-                    break
-                    
-                time.sleep(0.1)
+    def open_view_at(self, offset):
+        """A file view of the current track from byte ``offset``, or None if that part hasn't downloaded"""
+        stream = self.progressive_stream
+        if stream is not None:
+            if not stream.complete and offset >= stream.downloaded:
+                return None
+            stream.read_position = offset
+            return OffsetReader(stream, offset, owns_source=False)
+        return OffsetReader(open(self.current_track, 'rb'), offset)
                 
-            except:
-                break
+    def playback_tick(self):
+        """Clock tick (Tk thread): draw progress, handle buffering and notice the track ending"""
+        # get_pos counts from the last play(), i.e. from the last seek
+        current_pos = self.seek_offset + max(self.audio.music.get_pos(), 0) / 1000.0
+        total_duration = self.track_duration
+        progress = (current_pos / total_duration) * 100 if total_duration else 0
+        self.show_progress(min(progress, 100), current_pos)
+        
+        # Pause before the decoder runs out of downloaded audio, resume once refilled
+        stream = self.progressive_stream
+        if stream is not None:
+            if self.playback_state == PLAYING and stream.is_starved():
+                self.audio.music.pause()
+                self.set_playback_state(BUFFERING)
+                self.status_var.set("⏳ Buffering...")
+            elif self.playback_state == BUFFERING and stream.headroom() >= self.progressive_start_bytes:
+                self.audio.music.unpause()
+                self.set_playback_state(PLAYING)
+                self.status_var.set("Playing")
+        
+        # The only way a track ends: PLAYING -> ENDED, once per track
+        if self.playback_state == PLAYING and not self.audio.music.get_busy():
+            self.set_playback_state(ENDED)
+            self.next_track()
                 
+    def show_progress(self, progress, current_pos):
+        """Tk thread: draw the playback position"""
+        self.progress_var.set(progress)
+        
+        # Update time labels
+        current_min = int(current_pos // 60)
+        current_sec = int(current_pos % 60)
+        self.current_time_label.config(text=f"{current_min:02d}:{current_sec:02d}")
+        
     def cleanup_temp_files(self):
-        """Clean up temporary streaming files"""
-        try:
-            if hasattr(self, 'current_track') and self.current_track:
-                if os.path.exists(self.current_track) and 'tmp' in self.current_track:
-                    os.unlink(self.current_track)
-        except:
-            pass
+        """Release the current track's cache entry and stop any unfinished download"""
+        if self.pinned_track:
+            self.audio_cache.unpin(self.pinned_track)
+            self.pinned_track = None
+        if self.progressive_stream:
+            self.progressive_stream.close()
+            self.progressive_stream = None
+        self.close_seek_view()
+        self.seek_index = None
+        
+    def close_seek_view(self):
+        if self.seek_view:
+            self.seek_view.close()
+            self.seek_view = None
     
     def on_closing(self):
+        self.clock.stop()
+        self.ui.stop()
+        self.prefetcher.stop()
+        self.state_saver.flush(always=True)  # Needs the mixer for the current position
+        self.state_writer.shutdown(wait=True)
+        self.artwork_worker.shutdown(wait=False, cancel_futures=True)
         self.cleanup_temp_files()
-        self.save_settings()
-        pygame.mixer.quit()
+        self.write_settings()
+        if self.stats_panel is not None:
+            self.stats_panel.close()
+        tracer = tracing.active()
+        if tracer is not None and self.trace_path:
+            try:
+                tracer.export(self.trace_path)
+            except OSError as e:
+                print(f"Could not write trace to {self.trace_path}: {e}")
+        print(f"Audio {self.audio_cache.summary()}")
+        self.transport.close()
+        if self.store is not None:
+            self.store.close()
+        self.audio.quit()
         self.root.destroy()
 
 def main():
     root = tk.Tk()
+    STARTUP.mark("tk init")
     app = MP3Player(root)
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
     root.mainloop()
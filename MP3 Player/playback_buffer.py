@@ -0,0 +1,149 @@
+"""Reusable memory buffers for downloads that are played while they arrive.
+
+A progressive download is written into a ``PlaybackBuffer`` taken from a
+``BufferPool``. When the size is known up front (Content-Length) the
+buffer is a bytearray of exactly that size, so chunks are copied straight
+into place and never reallocated. Released bytearrays stay in the pool
+(up to a total byte budget) and are handed out again for the next track,
+so steady playback does no large allocations at all.
+
+Downloads larger than the pool's memory cap go to an anonymous temporary
+file instead (``tempfile.TemporaryFile``: already unlinked on POSIX and
+delete-on-close on Windows), so nothing is left behind even if the player
+is killed.
+"""
+
+import tempfile
+import threading
+
+DEFAULT_MEMORY_CAP = 64 * 1024 * 1024  # Largest download held in memory
+DEFAULT_INITIAL_SIZE = 8 * 1024 * 1024  # When the size isn't known in advance
+DEFAULT_KEEP_BYTES = 32 * 1024 * 1024  # Free buffers kept for reuse
+CHUNK_SIZE = 1024 * 1024
+
+
+class BufferPool:
+    """Hands out PlaybackBuffers and takes their memory back for reuse"""
+
+    def __init__(self, memory_cap=DEFAULT_MEMORY_CAP, keep_bytes=DEFAULT_KEEP_BYTES, spill_dir=None,
+                 initial_size=DEFAULT_INITIAL_SIZE):
+        self.memory_cap = memory_cap
+        self.keep_bytes = keep_bytes
+        self.spill_dir = spill_dir  # None: the system temporary directory
+        self.initial_size = min(initial_size, memory_cap)
+        self.allocations = 0  # New bytearrays; stays flat once the pool has warmed up
+        self.reuses = 0
+        self.spills = 0
+        self._free = []  # Released bytearrays, smallest first
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            memory_cap=int(float(settings.get('playback_buffer_mb', DEFAULT_MEMORY_CAP / (1024 * 1024))) * 1024 * 1024),
+            keep_bytes=int(float(settings.get('playback_pool_mb', DEFAULT_KEEP_BYTES / (1024 * 1024))) * 1024 * 1024),
+            spill_dir=settings.get('playback_spill_dir')
+        )
+
+    def acquire(self, size=None):
+        """A buffer for a download of ``size`` bytes (None if unknown)"""
+        return PlaybackBuffer(self, size)
+
+    def _take(self, size):
+        with self._lock:
+            for i, memory in enumerate(self._free):
+                if len(memory) >= size:
+                    self.reuses += 1
+                    return self._free.pop(i)
+            self.allocations += 1
+        # Whole chunks, so a buffer fits the next track even if it is a few bytes longer
+        return bytearray(-(-size // CHUNK_SIZE) * CHUNK_SIZE)
+
+    def _give(self, memory):
+        with self._lock:
+            self._free.append(memory)
+            self._free.sort(key=len)
+            # Over budget: drop the largest, which are the least likely to be needed again
+            while self._free and sum(len(free) for free in self._free) > self.keep_bytes:
+                self._free.pop()
+
+    def _spill_file(self):
+        self.spills += 1
+        return tempfile.TemporaryFile(prefix='mp3-playback-', dir=self.spill_dir)
+
+
+class PlaybackBuffer:
+    """The bytes of one download, in pooled memory or, past the memory cap, an anonymous file
+
+    Appends come from one thread; reads may come from others. Call
+    ``release`` once nothing reads from it any more.
+    """
+
+    def __init__(self, pool, size=None):
+        self.pool = pool
+        self.length = 0
+        self._memory = None
+        self._file = None
+        self._file_lock = threading.Lock()
+        if size is not None and size > pool.memory_cap:
+            self._file = pool._spill_file()
+        else:
+            self._memory = pool._take(size if size is not None else pool.initial_size)
+
+    @property
+    def spilled(self):
+        return self._file is not None
+
+    def append(self, chunk):
+        end = self.length + len(chunk)
+        if self._memory is not None and end > len(self._memory):
+            self._grow(end)
+        if self._file is not None:
+            with self._file_lock:
+                self._file.seek(self.length)
+                self._file.write(chunk)
+        else:
+            self._memory[self.length:end] = chunk
+        self.length = end
+
+    def _grow(self, needed):
+        """Make room past the preallocated size: a bigger pooled buffer, or a spill file past the cap"""
+        old = self._memory
+        if needed > self.pool.memory_cap:
+            self._file = self.pool._spill_file()
+            self._file.write(memoryview(old)[:self.length])
+            self._memory = None
+        else:
+            self._memory = self.pool._take(min(max(needed, 2 * len(old)), self.pool.memory_cap))
+            self._memory[:self.length] = memoryview(old)[:self.length]
+        self.pool._give(old)
+
+    def read(self, start, end):
+        """Bytes ``start``..``end`` (clamped to what has arrived), copied once"""
+        end = min(end, self.length)
+        if end <= start:
+            return b""
+        if self._file is not None:
+            with self._file_lock:
+                self._file.seek(start)
+                return self._file.read(end - start)
+        return bytes(memoryview(self._memory)[start:end])
+
+    def chunks(self, size=CHUNK_SIZE):
+        """The contents in pieces, as memoryviews when in memory (no copies)"""
+        for start in range(0, self.length, size):
+            end = min(start + size, self.length)
+            if self._file is not None:
+                yield self.read(start, end)
+            else:
+                yield memoryview(self._memory)[start:end]
+
+    def release(self):
+        """Return the memory to the pool (or delete the spill file)"""
+        if self._memory is not None:
+            self.pool._give(self._memory)
+            self._memory = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.length = 0
@@ -0,0 +1,52 @@
+"""One clock for playback progress and end-of-track detection.
+
+A single ``root.after`` tick runs on the Tk thread while audio is playing
+or buffering, and replaces a polling thread per track. Playback is a small
+state machine, and only the tick moves it from PLAYING to ENDED, so each
+track ends exactly once however fast tracks are skipped. When paused,
+stopped or loading, the tick is not scheduled at all, so an idle player
+uses no CPU.
+"""
+
+STOPPED = 'stopped'
+LOADING = 'loading'  # A new track is being fetched; the old one may still be audible
+PLAYING = 'playing'
+PAUSED = 'paused'  # Paused by the user
+BUFFERING = 'buffering'  # Paused by the player until the download catches up
+ENDED = 'ended'
+
+TICKING_STATES = frozenset((PLAYING, BUFFERING))
+DEFAULT_INTERVAL_MS = 100
+
+
+class PlaybackClock:
+    """Calls ``tick`` on the Tk thread every ``interval_ms`` while running"""
+
+    def __init__(self, root, tick, interval_ms=DEFAULT_INTERVAL_MS):
+        self.root = root
+        self.tick = tick
+        self.interval_ms = interval_ms
+        self.running = False
+        self._after_id = None
+
+    def start(self):
+        self.running = True
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval_ms, self._run)
+
+    def stop(self):
+        self.running = False
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _run(self):
+        self._after_id = None
+        try:
+            self.tick()
+        except Exception as e:
+            # Keep the clock alive; a bad tick shouldn't freeze the progress bar
+            print(f"Playback tick failed: {e}")
+        # The tick may have stopped the clock, or stopped and restarted it
+        if self.running and self._after_id is None:
+            self._after_id = self.root.after(self.interval_ms, self._run)
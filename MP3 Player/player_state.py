@@ -0,0 +1,95 @@
+"""Player state saved between launches, for a warm start.
+
+The organized playlist (artist sections included), the last track and the
+position within it are written to one versioned JSON file. On launch the
+player shows that playlist at once and revalidates it against GitHub in the
+background, instead of starting empty and waiting for a scan.
+
+Writes are atomic (temp file + rename), and ``DebouncedSave`` collapses
+bursts of changes, such as dragging the volume slider, into one write.
+"""
+
+import json
+import os
+import tempfile
+
+from playlist_model import Section, Track, intern_text
+
+STATE_VERSION = 1
+DEFAULT_SAVE_DELAY_MS = 1000
+
+
+def write_json_atomic(path, data):
+    """Write ``data`` as JSON so a crash never leaves half a file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(temp_path, path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+
+class PlayerState:
+    """Playlist rows, last track URL and position, saved as ``{version, rows, ...}``"""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = []  # Section and Track rows, in grouped order
+        self.current_url = None
+        self.position = 0.0  # Seconds into current_url
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') == STATE_VERSION:
+                # Headers are stored as the artist name, tracks as field lists
+                strings = [intern_text(value) for value in data['strings']]
+                self.rows = [Section(record) if isinstance(record, str) else Track.from_record(record, strings)
+                             for record in data['rows']]
+                self.current_url = data.get('current_url')
+                self.position = float(data.get('position', 0.0))
+        except (OSError, ValueError, TypeError, KeyError, IndexError):
+            self.rows = []
+        return self
+
+    def save(self):
+        string_ids = {}
+        rows = [row.to_record(string_ids) if row.is_track else row.artist for row in self.rows]
+        write_json_atomic(self.path, {
+            'version': STATE_VERSION,
+            'current_url': self.current_url,
+            'position': self.position,
+            'strings': list(string_ids),
+            'rows': rows
+        })
+
+
+class DebouncedSave:
+    """Runs ``save`` on the Tk thread once requests have been quiet for ``delay_ms``"""
+
+    def __init__(self, root, save, delay_ms=DEFAULT_SAVE_DELAY_MS):
+        self.root = root
+        self.save = save
+        self.delay_ms = delay_ms
+        self._after_id = None
+
+    def request(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+        self._after_id = self.root.after(self.delay_ms, self._run)
+
+    def flush(self, always=False):
+        """Save now if a save is pending, or even if not with ``always`` (e.g. on shutdown)"""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._run()
+        elif always:
+            self.save()
+
+    def _run(self):
+        self._after_id = None
+        self.save()
@@ -0,0 +1,275 @@
+"""Compact, indexed playlist model.
+
+Tracks are ``__slots__`` records whose repeated strings (artist, album,
+genre, folder, ...) are interned, so a large library shares one copy of
+each. Artist headers are separate ``Section`` rows, and their positions are
+kept in their own index. ``PlaylistModel`` keeps an O(1) map from URL to row
+and two compact arrays giving the next and previous playable row for every
+position, so navigation never walks over headers; a shuffled model has no
+headers, so its arrays are built from ranges. Single-row inserts only
+mark the indexes stale; they are rebuilt once on the next lookup, so a
+burst of inserts costs one pass.
+"""
+
+import random
+import sys
+from array import array
+
+METADATA_FIELDS = ('artist', 'title', 'album', 'year', 'genre', 'duration', 'bitrate', 'filesize')
+# Interned fields, stored once in a shared string table when tracks are saved
+SHARED_FIELDS = ('folder', 'file_path', 'artist', 'album', 'year', 'genre', 'duration', 'bitrate', 'filesize')
+
+
+def intern_text(value):
+    """Intern repeated metadata strings so every track shares one copy"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Section:
+    """Artist header row"""
+
+    __slots__ = ('artist', 'text')
+    is_track = False
+
+    def __init__(self, artist):
+        self.artist = intern_text(artist)
+        self.text = f"====={artist}====="
+
+    @property
+    def display_name(self):
+        return self.text
+
+
+class Track:
+    """One playable song"""
+
+    __slots__ = ('url', 'name', 'sha', 'folder', 'file_path', 'title', 'artist', 'album',
+                 'year', 'genre', 'duration', 'bitrate', 'filesize', 'show_folder')
+    is_track = True
+
+    def __init__(self, url, name, metadata, folder=None, sha=None, show_folder=False):
+        self.url = url
+        self.name = name
+        self.sha = sha
+        self.folder = intern_text(folder if folder is not None else metadata.get('folder'))
+        self.file_path = intern_text(metadata.get('file_path'))
+        self.title = metadata.get('title', name)
+        self.artist = intern_text(metadata.get('artist', 'Unknown Artist'))
+        self.album = intern_text(metadata.get('album', 'Unknown Album'))
+        self.year = intern_text(metadata.get('year', 'Unknown'))
+        self.genre = intern_text(metadata.get('genre', 'Unknown'))
+        self.duration = intern_text(metadata.get('duration', 'Unknown'))
+        self.bitrate = intern_text(metadata.get('bitrate', 'Unknown'))
+        self.filesize = intern_text(metadata.get('filesize', 'Unknown'))
+        self.show_folder = show_folder  # Set when the artist has songs in several folders
+
+    @classmethod
+    def from_song(cls, song, show_folder=False):
+        """Build a track from a scanner song dict"""
+        return cls(song['url'], song['name'], song['metadata'], song.get('folder'),
+                   song.get('sha'), show_folder)
+
+    @classmethod
+    def from_record(cls, record, strings):
+        """Rebuild a track saved by ``to_record``; ``strings`` is the shared string table"""
+        track = cls.__new__(cls)
+        (track.url, track.name, track.sha, track.title, track.show_folder,
+         folder, file_path, artist, album, year, genre, duration, bitrate, filesize) = record
+        track.folder = strings[folder]
+        track.file_path = strings[file_path]
+        track.artist = strings[artist]
+        track.album = strings[album]
+        track.year = strings[year]
+        track.genre = strings[genre]
+        track.duration = strings[duration]
+        track.bitrate = strings[bitrate]
+        track.filesize = strings[filesize]
+        return track
+
+    def to_record(self, string_ids):
+        """Fields as a flat list; repeated ones become indexes into ``string_ids`` (value -> index)"""
+        record = [self.url, self.name, self.sha, self.title, self.show_folder]
+        for field in SHARED_FIELDS:
+            value = getattr(self, field)
+            index = string_ids.get(value)
+            if index is None:
+                index = string_ids[value] = len(string_ids)
+            record.append(index)
+        return record
+
+    @property
+    def display_name(self):
+        if self.show_folder:
+            return f"🌐 {self.title} [{self.folder}]"
+        return f"🌐 {self.title}"
+
+    @property
+    def metadata(self):
+        """Metadata as a dict, in the shape the metadata labels expect"""
+        return {field: getattr(self, field) for field in METADATA_FIELDS}
+
+
+class RowTexts:
+    """Lazy ``display_name`` sequence over a playlist, for ``VirtualListbox.set_source``
+
+    Only the rows asked for are formatted, and it always reflects the
+    playlist's current rows.
+    """
+
+    def __init__(self, playlist):
+        self.playlist = playlist
+
+    def __len__(self):
+        return len(self.playlist)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.playlist[i].display_name for i in range(*index.indices(len(self.playlist)))]
+        return self.playlist[index].display_name
+
+
+class PlaylistModel:
+    """Ordered rows (tracks and section headers) with O(1) navigation indexes"""
+
+    def __init__(self, rows=(), tracks_only=False):
+        self.rows = list(rows)
+        self._tracks_only = tracks_only  # No header rows, so the next/previous rows are just neighbours
+        self._reindex()
+
+    def _reindex(self):
+        """Rebuild the URL map, section index and next/previous arrays in one pass"""
+        self._stale = False
+        rows = self.rows
+        count = len(rows)
+        if self._tracks_only:
+            self._reindex_tracks(count)
+            return
+        self.url_to_pos = {}
+        self.sections = array('l')
+        self._next = array('l', [-1]) * count
+        self._prev = array('l', [-1]) * count
+
+        first = last = -1
+        for i, row in enumerate(rows):
+            if row.is_track:
+                self.url_to_pos[row.url] = i
+                if first < 0:
+                    first = i
+                last = i
+            else:
+                self.sections.append(i)
+        if first < 0:
+            return
+
+        following = first  # Wraps around past the end
+        for i in range(count - 1, -1, -1):
+            self._next[i] = following
+            if rows[i].is_track:
+                following = i
+        preceding = last  # Wraps around before the start
+        for i in range(count):
+            self._prev[i] = preceding
+            if rows[i].is_track:
+                preceding = i
+
+    def _reindex_tracks(self, count):
+        """``_reindex`` for a model without headers: neighbours by arithmetic, no per-row loop"""
+        self.url_to_pos = {row.url: i for i, row in enumerate(self.rows)}
+        self.sections = array('l')
+        if not count:
+            self._next = array('l')
+            self._prev = array('l')
+            return
+        self._next = array('l', range(1, count))
+        self._next.append(0)  # Wraps around past the end
+        self._prev = array('l', [count - 1])  # Wraps around before the start
+        self._prev.extend(range(count - 1))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        return self.rows[index]
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def _ensure_index(self):
+        if self._stale:
+            self._reindex()
+
+    @property
+    def track_count(self):
+        self._ensure_index()
+        return len(self.url_to_pos)
+
+    def tracks(self):
+        return [row for row in self.rows if row.is_track]
+
+    def position_of(self, url):
+        self._ensure_index()
+        return self.url_to_pos.get(url)
+
+    def next_playable(self, position):
+        """Row of the next track after ``position`` (wrapping), or None"""
+        if not 0 <= position < len(self.rows):
+            return None
+        self._ensure_index()
+        position = self._next[position]
+        return position if position >= 0 else None
+
+    def previous_playable(self, position):
+        """Row of the track before ``position`` (wrapping), or None"""
+        if not 0 <= position < len(self.rows):
+            return None
+        self._ensure_index()
+        position = self._prev[position]
+        return position if position >= 0 else None
+
+    def display_rows(self):
+        """Row texts as a live sequence, formatted only for the part being shown"""
+        return RowTexts(self)
+
+    def insert(self, position, row):
+        """Insert one row; indexes are rebuilt lazily on the next lookup"""
+        self.rows.insert(position, row)
+        self._tracks_only = self._tracks_only and row.is_track
+        self._stale = True
+
+    def extend(self, rows):
+        self.rows.extend(rows)
+        self._tracks_only = self._tracks_only and all(row.is_track for row in rows)
+        self._reindex()
+
+    def clear(self):
+        self.rows = []
+        self._reindex()
+
+    def copy(self):
+        return PlaylistModel(self.rows, self._tracks_only)
+
+    def shuffled(self):
+        """A new model with just the tracks, in random order"""
+        tracks = self.tracks()
+        random.shuffle(tracks)
+        return PlaylistModel(tracks, tracks_only=True)
+
+    def remove_urls(self, urls):
+        """Drop tracks by URL, plus headers left with no tracks; returns removed rows' old positions"""
+        rows = self.rows
+        keep = [not (row.is_track and row.url in urls) for row in rows]
+
+        # A header survives only if a surviving track follows it before the next header
+        has_track = False
+        for i in range(len(rows) - 1, -1, -1):
+            if rows[i].is_track:
+                has_track = has_track or keep[i]
+            else:
+                keep[i] = has_track
+                has_track = False
+
+        removed = [i for i, kept in enumerate(keep) if not kept]
+        if removed:
+            self.rows = [row for row, kept in zip(rows, keep) if kept]
+            self._reindex()
+        return removed
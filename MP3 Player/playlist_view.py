@@ -0,0 +1,204 @@
+"""Virtualized playlist widget for very large libraries.
+
+A plain ``tk.Listbox`` holds a Tcl string for every row, so inserting or
+re-inserting tens of thousands of rows freezes the UI. ``VirtualListbox``
+keeps the rows in a Python list, or reads them from a live sequence that
+formats rows on demand (``set_source``), and only puts the rows that fit
+in the window into the real Listbox. Edits are applied as small diffs
+(insert, delete) to that list, or, for a live source that already
+reflects them, only move the selection along. The redraw of the visible
+window is coalesced into one idle callback, so the cost of any change is
+O(visible rows) in Tk.
+
+The public methods mirror the subset of the Listbox API the player uses,
+with indices always referring to the full playlist.
+"""
+
+import tkinter as tk
+import tkinter.font as tkfont
+
+
+class VirtualListbox(tk.Frame):
+    """Listbox-like widget that only renders the visible window of rows"""
+
+    def __init__(self, master, bg=None, font=('Arial', 10), **listbox_options):
+        super().__init__(master, bg=bg)
+        self._rows = []
+        self._live = False  # _rows is a source that reflects edits itself
+        self._top = 0  # Index of the first visible row
+        self._visible = listbox_options.get('height', 10)
+        self._shown = []  # Rows currently inserted into the Tk listbox
+        self._selected = None  # Absolute index of the selected row
+        self._render_pending = None
+
+        self.listbox = tk.Listbox(self, bg=bg, font=font, activestyle='none',
+                                  exportselection=False, **listbox_options)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self._row_height = tkfont.Font(font=font).metrics('linespace') + 1
+
+        self.listbox.bind('<Configure>', self._on_configure)
+        self.listbox.bind('<<ListboxSelect>>', self._on_select)
+        self.listbox.bind('<MouseWheel>', self._on_wheel)
+        self.listbox.bind('<Button-4>', lambda e: self._scroll_by(-3))
+        self.listbox.bind('<Button-5>', lambda e: self._scroll_by(3))
+        self.listbox.bind('<Up>', lambda e: self._scroll_by(-1))
+        self.listbox.bind('<Down>', lambda e: self._scroll_by(1))
+
+    # Listbox-compatible API
+
+    def bind(self, sequence=None, func=None, add=None):
+        return self.listbox.bind(sequence, func, add)
+
+    def size(self):
+        return len(self._rows)
+
+    def get(self, index):
+        return self._rows[self._index(index)]
+
+    def insert(self, index, *texts):
+        """Insert rows before ``index`` (or at tk.END); with a live source, note rows it already has"""
+        if self._live:
+            position = len(self._rows) - len(texts) if index == tk.END else self._index(index)
+        else:
+            position = len(self._rows) if index == tk.END else self._index(index)
+            self._rows[position:position] = texts
+        if self._selected is not None and self._selected >= position:
+            self._selected += len(texts)
+        self._schedule_render()
+
+    def delete(self, first, last=None):
+        """Delete rows ``first``..``last`` inclusive, like Listbox.delete
+
+        With a live source the rows are already gone; only numeric
+        indices can be given then.
+        """
+        if self._live:
+            start = self._index(first)
+            end = start if last is None else self._index(last)
+        else:
+            if not self._rows:
+                return
+            start = self._index(first)
+            end = start if last is None else (len(self._rows) - 1 if last == tk.END else self._index(last))
+            if end < start:
+                return
+            del self._rows[start:end + 1]
+        if self._selected is not None:
+            if start <= self._selected <= end:
+                self._selected = None
+            elif self._selected > end:
+                self._selected -= end - start + 1
+        self._schedule_render()
+
+    def set_rows(self, texts):
+        """Replace every row at once; only the visible window is redrawn"""
+        self._rows = list(texts)
+        self._live = False
+        self._selected = None
+        self._schedule_render()
+
+    def set_source(self, rows):
+        """Show a live sequence of row texts without copying it
+
+        ``rows`` needs ``len`` and slicing; only the visible slice is read.
+        It is read again on every redraw, so edits to what it views show up
+        by themselves; ``insert``/``delete`` after such an edit just keep
+        the selection in step and schedule the redraw.
+        """
+        self._rows = rows
+        self._live = True
+        self._selected = None
+        self._schedule_render()
+
+    def see(self, index):
+        index = self._index(index)
+        if index < self._top:
+            self._top = index
+        elif index >= self._top + self._visible:
+            self._top = index - self._visible + 1
+        self._schedule_render()
+
+    def selection_set(self, index):
+        self._selected = self._index(index)
+        self._schedule_render()
+
+    def selection_clear(self, first=0, last=None):
+        self._selected = None
+        self.listbox.selection_clear(0, tk.END)
+
+    def curselection(self):
+        return () if self._selected is None else (self._selected,)
+
+    def nearest(self, y):
+        return min(self._top + self.listbox.nearest(y), max(len(self._rows) - 1, 0))
+
+    def yview(self, *args):
+        """Scrollbar protocol: ('moveto', fraction) or ('scroll', n, 'units'|'pages')"""
+        if not args:
+            return self._fractions()
+        if args[0] == 'moveto':
+            self._set_top(int(float(args[1]) * len(self._rows)))
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            if args[2] == 'pages':
+                amount *= max(self._visible - 1, 1)
+            self._scroll_by(amount)
+
+    # Internals
+
+    def _index(self, index):
+        if index == tk.END:
+            return max(len(self._rows) - 1, 0)
+        return int(index)
+
+    def _fractions(self):
+        total = len(self._rows)
+        if total == 0:
+            return 0.0, 1.0
+        return self._top / total, min(self._top + self._visible, total) / total
+
+    def _set_top(self, top):
+        self._top = max(0, min(top, len(self._rows) - self._visible))
+        self._schedule_render()
+
+    def _scroll_by(self, rows):
+        self._set_top(self._top + rows)
+        return 'break'
+
+    def _on_wheel(self, event):
+        return self._scroll_by(-3 if event.delta > 0 else 3)
+
+    def _on_configure(self, event):
+        visible = max(1, event.height // self._row_height)
+        if visible != self._visible:
+            self._visible = visible
+            self._set_top(self._top)
+
+    def _on_select(self, event):
+        selection = self.listbox.curselection()
+        if selection:
+            self._selected = self._top + selection[0]
+
+    def _schedule_render(self):
+        if self._render_pending is None:
+            self._render_pending = self.after_idle(self._render)
+
+    def _render(self):
+        """Put the visible window of rows into the Tk listbox"""
+        self._render_pending = None
+        self._top = max(0, min(self._top, len(self._rows) - self._visible))
+        window = self._rows[self._top:self._top + self._visible]
+        if window != self._shown:
+            self.listbox.delete(0, tk.END)
+            if window:
+                self.listbox.insert(0, *window)
+            self._shown = window
+
+        self.listbox.selection_clear(0, tk.END)
+        if self._selected is not None and self._top <= self._selected < self._top + len(window):
+            self.listbox.selection_set(self._selected - self._top)
+        self.scrollbar.set(*self._fractions())
@@ -0,0 +1,129 @@
+"""Download upcoming tracks into the audio cache while the current one plays.
+
+The player tells the prefetcher which tracks come next (already in playback
+order, so shuffle is respected). A single background thread fetches them one
+at a time and pins each finished entry in the cache so a later prefetch can't
+evict it before it is played. Pinned prefetches are held to a byte budget.
+"""
+
+import threading
+
+import tracing
+
+DEFAULT_DEPTH = 2
+DEFAULT_BUDGET_BYTES = 64 * 1024 * 1024
+
+
+class Prefetcher:
+    """Keeps the next ``depth`` tracks downloaded ahead of playback"""
+
+    def __init__(self, cache, get, depth=DEFAULT_DEPTH, budget_bytes=DEFAULT_BUDGET_BYTES):
+        self.cache = cache
+        self.get = get
+        self.depth = depth
+        self.budget_bytes = min(budget_bytes, cache.max_bytes)
+
+        self.completed = 0
+        self.failed = 0
+
+        self._cond = threading.Condition()
+        self._wanted = []  # [(url, sha)] in playback order
+        self._pinned = {}  # cache key -> (path, size) for finished prefetches
+        self._failed = set()  # keys that failed since the last schedule()
+        self._in_flight = {}  # cache key -> Event set when its download ends
+        self._stopped = False
+
+        self._thread = threading.Thread(target=self._run, name="prefetch", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_settings(cls, settings, cache, get):
+        return cls(
+            cache, get,
+            depth=max(0, int(settings.get('prefetch_depth', DEFAULT_DEPTH))),
+            budget_bytes=int(float(settings.get('prefetch_mb', DEFAULT_BUDGET_BYTES / (1024 * 1024))) * 1024 * 1024)
+        )
+
+    def schedule(self, tracks):
+        """Replace the set of tracks to keep ready; ``tracks`` is [(url, sha)] in play order"""
+        with self._cond:
+            self._wanted = list(tracks)[:self.depth]
+            self._failed.clear()
+            self._release_unwanted()
+            self._cond.notify_all()
+
+    def wait_for(self, url, sha, timeout=None):
+        """Block until an in-progress prefetch of this track has finished; False on timeout"""
+        with self._cond:
+            event = self._in_flight.get(self.cache.key_for(url, sha))
+        return event is None or event.wait(timeout)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._wanted = []
+            self._release_unwanted()
+            self._cond.notify_all()
+
+    def _wanted_keys(self):
+        return {self.cache.key_for(url, sha) for url, sha in self._wanted}
+
+    def _release_unwanted(self):
+        """Unpin prefetched entries that are no longer coming up"""
+        wanted = self._wanted_keys()
+        for key in list(self._pinned):
+            if key not in wanted:
+                path, _ = self._pinned.pop(key)
+                self.cache.unpin(path)
+
+    def _pinned_bytes(self):
+        return sum(size for _, size in self._pinned.values())
+
+    def _pin(self, key, path):
+        if key in self._pinned:
+            return
+        try:
+            size = self.cache.size_of(key)
+        except KeyError:
+            return  # Evicted in the meantime
+        self.cache.pin(path)
+        self._pinned[key] = (path, size)
+
+    def _next_job(self):
+        """Wait for the next track that still needs downloading"""
+        with self._cond:
+            while not self._stopped:
+                for url, sha in self._wanted:
+                    key = self.cache.key_for(url, sha)
+                    if key in self._pinned or key in self._failed:
+                        continue
+                    if key in self.cache:
+                        self._pin(key, self.cache.path_for_key(key))
+                        continue
+                    if self._pinned_bytes() >= self.budget_bytes:
+                        break
+                    self._in_flight[key] = threading.Event()
+                    return url, sha, key
+                self._cond.wait()
+        return None
+
+    def _run(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            url, sha, key = job
+            try:
+                path = self.cache.download(url, sha, self.get)
+            except Exception as e:
+                tracing.swallowed('prefetch', e)
+                path = None
+            with self._cond:
+                if path:
+                    self.completed += 1
+                    if key in self._wanted_keys():
+                        self._pin(key, path)
+                else:
+                    self.failed += 1
+                    self._failed.add(key)
+                self._in_flight.pop(key).set()
@@ -0,0 +1,241 @@
+"""Play a track while it is still downloading.
+
+``ProgressiveStream`` is a seekable, file-like view of a download in
+progress, which ``pygame.mixer.music.load`` accepts directly. Reads block
+until the requested bytes have arrived. The last few KB of the file are
+fetched up front with a Range request, because SDL_mixer seeks to the end
+on load to look for ID3v1/APE tags and would otherwise stall until the whole
+file was in.
+
+The player watches ``headroom`` (downloaded bytes ahead of the decoder) and
+pauses the mixer before the decoder catches up with the network, then
+resumes once enough has buffered again.
+"""
+
+import threading
+import time
+
+import tracing
+from playback_buffer import BufferPool
+
+CHUNK_SIZE = 16 * 1024
+TAIL_SIZE = 16 * 1024  # Enough for ID3v1, APEv2 and Lyrics3 trailers
+DEFAULT_START_BYTES = 256 * 1024
+DEFAULT_LOW_WATERMARK = 64 * 1024
+DEFAULT_READ_TIMEOUT = 30.0
+
+
+class ProgressiveStream:
+    """File-like object over an HTTP download that is still in progress"""
+
+    def __init__(self, url, get, read_timeout=DEFAULT_READ_TIMEOUT, on_complete=None, buffers=None):
+        self.url = url
+        self.get = get
+        self.read_timeout = read_timeout
+        self.on_complete = on_complete  # Called with the PlaybackBuffer once the download is complete
+        self.buffers = buffers if buffers is not None else BufferPool()
+
+        self.total_size = None
+        self.error = None
+        self.complete = False
+        self.closed = False
+        self.read_position = 0  # Furthest offset the decoder has read up to
+
+        self._buffer = None  # PlaybackBuffer, from when the response headers arrive
+        self._downloaded = 0
+        self._download_done = False  # The buffer is released by close() or the download, whichever is last
+        self._tail = None
+        self._tail_start = None
+        self._position = 0
+        self._headers_ready = threading.Event()
+        self._cond = threading.Condition()
+
+        self._thread = threading.Thread(target=self._download, name="progressive", daemon=True)
+        self._thread.start()
+
+    @property
+    def downloaded(self):
+        return self._downloaded
+
+    def headroom(self):
+        """Bytes buffered ahead of the decoder (infinite once complete)"""
+        if self.complete:
+            return float('inf')
+        return self.downloaded - self.read_position
+
+    def is_starved(self, low_watermark=DEFAULT_LOW_WATERMARK):
+        return not self.complete and self.error is None and self.headroom() < low_watermark
+
+    def head(self, nbytes):
+        """Copy of up to the first ``nbytes`` downloaded so far"""
+        with self._cond:
+            if self._buffer is None or self.closed:
+                return b""
+            return self._buffer.read(0, nbytes)
+
+    def wait_for(self, nbytes, timeout=None):
+        """Wait until ``nbytes`` are buffered (or the download ended); True if they are"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while (self.downloaded < nbytes and not self.complete
+                   and self.error is None and not self.closed):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            if self.error is not None:
+                raise self.error
+            return self.downloaded >= nbytes or self.complete
+
+    def _download(self):
+        try:
+            if self._receive() and self.on_complete and not self.closed:
+                try:
+                    self.on_complete(self._buffer)
+                except Exception as e:
+                    tracing.swallowed('store download', e)
+        finally:
+            with self._cond:
+                self._download_done = True
+                release = self.closed
+            if release:
+                self._release()
+
+    def _receive(self):
+        """Download into the buffer; True if the whole file arrived"""
+        with tracing.span('download', url=self.url, progressive=True) as span:
+            try:
+                response = self.get(self.url, stream=True)
+                with response:
+                    response.raise_for_status()
+                    length = response.headers.get('Content-Length')
+                    if length and length.isdigit():
+                        self.total_size = int(length)
+                        if self.total_size > TAIL_SIZE * 4:
+                            threading.Thread(target=self._fetch_tail, name="progressive-tail", daemon=True).start()
+                    with self._cond:
+                        # Sized to the whole file up front, so chunks land in place
+                        self._buffer = self.buffers.acquire(self.total_size)
+                    self._headers_ready.set()
+
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        with self._cond:
+                            if self.closed:
+                                return False
+                            self._buffer.append(chunk)
+                            self._downloaded = self._buffer.length
+                            self._cond.notify_all()
+
+                with self._cond:
+                    self.complete = True
+                    if self.total_size is None:
+                        self.total_size = self._downloaded
+                    self._cond.notify_all()
+                return True
+            except Exception as e:
+                span.set(error=type(e).__name__)
+                with self._cond:
+                    self.error = e
+                    self._cond.notify_all()
+                return False
+            finally:
+                self._headers_ready.set()
+
+    def _fetch_tail(self):
+        """Grab the end of the file so SDL's trailing-tag probe doesn't block"""
+        start = self.total_size - TAIL_SIZE
+        try:
+            response = self.get(self.url, headers={'Range': f"bytes={start}-"}, stream=True)
+            with response:
+                if response.status_code != 206:
+                    return
+                tail = response.content
+        except Exception as e:
+            tracing.swallowed('tail fetch', e)
+            return
+        if len(tail) == TAIL_SIZE:
+            with self._cond:
+                self._tail_start = start
+                self._tail = tail
+                self._cond.notify_all()
+
+    def _available(self, start, end):
+        """Whether [start, end) can be served from the head buffer plus the tail"""
+        if self.downloaded >= end:
+            return True
+        return self._tail is not None and max(start, self.downloaded) >= self._tail_start
+
+    # File-like interface used by pygame/SDL_mixer
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=0):
+        if whence == 2:
+            self._headers_ready.wait(self.read_timeout)
+            if self.total_size is None:
+                self.wait_for(float('inf'), self.read_timeout)
+            offset += self.total_size or self.downloaded
+        elif whence == 1:
+            offset += self._position
+        self._position = max(0, offset)
+        return self._position
+
+    def read(self, size=-1):
+        with self._cond:
+            if self.closed:
+                return b""
+            start = self._position
+            if size is None or size < 0:
+                end = float('inf')
+            else:
+                end = start + size
+            if self.total_size is not None:
+                end = min(end, self.total_size)
+
+            # Block until the range is buffered; never forever, so a dead
+            # connection ends the track instead of hanging the audio thread
+            deadline = time.monotonic() + self.read_timeout
+            while (not self._available(start, end) and not self.complete
+                   and self.error is None and not self.closed):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            # One copy out of the buffer; joined only when a read spans into the tail
+            pieces = []
+            position = start
+            head_end = min(end, self.downloaded)
+            if head_end > position:
+                pieces.append(self._buffer.read(position, head_end))
+                position = head_end
+            if position < end and self._tail is not None and position >= self._tail_start:
+                pieces.append(self._tail[position - self._tail_start:end - self._tail_start])
+            data = pieces[0] if len(pieces) == 1 else b"".join(pieces)
+
+            self._position = start + len(data)
+            if self._position <= self.downloaded:
+                self.read_position = max(self.read_position, self._position)
+            return data
+
+    def close(self):
+        """Stop the download and release the buffer once the download thread is done with it"""
+        with self._cond:
+            self.closed = True
+            release = self._download_done
+            self._cond.notify_all()
+        if release:
+            self._release()
+
+    def _release(self):
+        with self._cond:
+            if self._buffer is not None:
+                self._buffer.release()
+                self._buffer = None
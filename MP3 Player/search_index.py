@@ -0,0 +1,231 @@
+"""In-memory search over title, artist, album and genre.
+
+Every track's fields are split into lowercase, accent-free tokens. The index
+keeps a posting set of track URLs per token, plus a sorted vocabulary, so
+the words of a query (the last one usually half-typed) are matched as
+prefixes with a binary search. Matching is driven from the query word with
+the fewest candidate tracks, and stops once ``limit`` results are found, so
+short queries on a huge library stay cheap.
+
+If a query word matches little or nothing, typos are handled with a
+trigram index over the vocabulary. Tokens that share enough trigrams with
+the word count as matches too.
+
+Tracks can be added and removed one at a time as the library changes.
+"""
+
+import bisect
+import re
+import unicodedata
+from collections import Counter
+from itertools import islice
+
+SEARCH_FIELDS = ('title', 'artist', 'album', 'genre')
+PLACEHOLDERS = frozenset(('Unknown', 'Unknown Artist', 'Unknown Album'))
+DEFAULT_LIMIT = 500
+FUZZY_MIN_LENGTH = 3  # Shorter words are only matched as prefixes
+FUZZY_BELOW = 5  # Only words matching fewer tracks than this are treated as typos
+FUZZY_SIMILARITY = 0.5  # Dice coefficient over trigrams
+CHUNK_SIZE = 1024  # Tracks checked per step while collecting matches
+ESTIMATE_TOKENS = 64  # Prefix-range tokens looked at when picking the driving word
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize(text):
+    """Casefold and strip accents so 'Beyoncé' matches 'beyonce'"""
+    if text.isascii():
+        return text.lower()
+    text = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize(text):
+    return _WORD.findall(normalize(text))
+
+
+def trigrams(token):
+    padded = f"${token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Token, prefix and trigram index over playlist tracks, keyed by URL"""
+
+    def __init__(self):
+        self.tracks = {}  # url -> Track
+        self._doc_tokens = {}  # url -> tuple of the track's tokens
+        self._doc_text = {}  # url -> ' token token ...', for substring prefix checks
+        self._postings = {}  # token -> set of urls
+        self._vocabulary = []  # Sorted tokens, for prefix ranges
+        self._trigrams = {}  # trigram -> set of tokens
+        self._similar = {}  # word -> similar tokens, until the vocabulary changes
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def add(self, track):
+        """Index a track, replacing any earlier version with the same URL"""
+        new_tokens = self._add(track)
+        for token in new_tokens:
+            bisect.insort(self._vocabulary, token)
+
+    def add_many(self, tracks):
+        """Index a batch of rows, sorting the vocabulary once at the end"""
+        new_tokens = []
+        for track in tracks:
+            if track.is_track:
+                new_tokens.extend(self._add(track))
+        if new_tokens:
+            self._vocabulary = sorted(set(self._vocabulary).union(new_tokens))
+
+    def _add(self, track):
+        """Index ``track``; returns tokens that are new to the vocabulary"""
+        url = track.url
+        if url in self.tracks:
+            self.remove(url)
+
+        values = [getattr(track, field, None) for field in SEARCH_FIELDS]
+        tokens = set(tokenize(' '.join(value for value in values if value and value not in PLACEHOLDERS)))
+
+        self.tracks[url] = track
+        self._doc_tokens[url] = tuple(tokens)
+        self._doc_text[url] = ' ' + ' '.join(tokens)
+        new_tokens = []
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = set()
+                new_tokens.append(token)
+                for gram in trigrams(token):
+                    self._trigrams.setdefault(gram, set()).add(token)
+            postings.add(url)
+        if new_tokens:
+            self._similar.clear()
+        return new_tokens
+
+    def remove(self, url):
+        if self.tracks.pop(url, None) is None:
+            return
+        del self._doc_text[url]
+        for token in self._doc_tokens.pop(url):
+            postings = self._postings[token]
+            postings.discard(url)
+            if not postings:
+                # Last track using this token: drop it from the vocabulary
+                del self._postings[token]
+                i = bisect.bisect_left(self._vocabulary, token)
+                if i < len(self._vocabulary) and self._vocabulary[i] == token:
+                    del self._vocabulary[i]
+                self._similar.clear()
+                for gram in trigrams(token):
+                    grams = self._trigrams[gram]
+                    grams.discard(token)
+                    if not grams:
+                        del self._trigrams[gram]
+
+    def clear(self):
+        self.__init__()
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Tracks matching every word of ``query``; prefix matches first, then fuzzy ones"""
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words:
+            return []
+
+        found = {}  # url -> rank, in discovery order
+        matchers = [self._prefix_matcher(word) for word in words]
+        self._collect(matchers, found, 0, limit)
+
+        # Words that barely match anything are probably typos
+        typos = [len(word) >= FUZZY_MIN_LENGTH and self._estimate(matcher[0]) < FUZZY_BELOW
+                 for word, matcher in zip(words, matchers)]
+        if len(found) < limit and any(typos):
+            matchers = [self._fuzzy_matcher(word, matcher) if typo else matcher
+                        for word, matcher, typo in zip(words, matchers, typos)]
+            self._collect(matchers, found, 1, limit)
+
+        results = [self.tracks[url] for url in found]
+        results.sort(key=lambda track: (found[track.url], track.artist.casefold(), track.title.casefold()))
+        return results
+
+    def _prefix_matcher(self, word):
+        """(tokens to drive from, substring test, similar tokens) for tokens starting with ``word``
+
+        The vocabulary is sorted, so a whole-word match comes first in the range.
+        """
+        lo = bisect.bisect_left(self._vocabulary, word)
+        hi = bisect.bisect_left(self._vocabulary, word + '\uffff', lo)
+        return self._vocabulary[lo:hi], ' ' + word, None
+
+    def _fuzzy_matcher(self, word, prefix):
+        """Widen a prefix matcher with vocabulary tokens that look like ``word``"""
+        tokens, needle, _ = prefix
+        similar = self._similar.get(word)
+        if similar is None:
+            similar = self._similar[word] = self.similar_tokens(word)
+        return tokens + [t for t in similar if not t.startswith(word)], needle, similar
+
+    def similar_tokens(self, word):
+        """Vocabulary tokens whose trigrams overlap ``word``'s by FUZZY_SIMILARITY or more"""
+        grams = trigrams(word)
+        counts = Counter()  # A token of length n has about n padded trigrams
+        for gram in grams:
+            counts.update(self._trigrams.get(gram, ()))
+        wanted = len(grams)
+        return {token for token, shared in counts.items()
+                if 2 * shared / (wanted + len(token)) >= FUZZY_SIMILARITY}
+
+    def _estimate(self, tokens):
+        """Rough number of tracks behind ``tokens``, extrapolated from a sample of a long range"""
+        postings = self._postings
+        sample = tokens[:ESTIMATE_TOKENS]
+        if not sample:
+            return 0
+        return sum(len(postings[token]) for token in sample) * len(tokens) // len(sample)
+
+    def _collect(self, matchers, found, rank, limit):
+        """Add URLs that satisfy every matcher to ``found``, up to ``limit``
+
+        Tracks of the narrowest word are filtered by the other words: words
+        spanning few tokens by set intersection, broad prefixes by a substring
+        test on each track's token text. Candidates are checked in chunks, so
+        a broad query stops as soon as it has ``limit`` results.
+        """
+        matchers = sorted(matchers, key=lambda matcher: self._estimate(matcher[0]))
+        postings = self._postings
+        doc_text = self._doc_text
+        doc_tokens = self._doc_tokens
+
+        member_sets = []
+        text_checks = []
+        for tokens, needle, similar in matchers[1:]:
+            if len(tokens) == 1:
+                member_sets.append(postings[tokens[0]])
+            elif len(tokens) <= ESTIMATE_TOKENS:
+                member_sets.append(set().union(*(postings[token] for token in tokens)))
+            else:
+                text_checks.append((needle, similar))
+
+        for token in matchers[0][0]:
+            batch = postings[token]
+            for members in member_sets:
+                batch = batch & members
+                if not batch:
+                    break
+
+            urls_left = iter(batch)
+            while True:
+                urls = [url for url in islice(urls_left, CHUNK_SIZE) if url not in found]
+                if not urls:
+                    break
+                for needle, similar in text_checks:
+                    if similar is None:
+                        urls = [url for url in urls if needle in doc_text[url]]
+                    else:
+                        urls = [url for url in urls
+                                if needle in doc_text[url] or not similar.isdisjoint(doc_tokens[url])]
+                for url in urls:
+                    found[url] = rank
+                    if len(found) >= limit:
+                        return
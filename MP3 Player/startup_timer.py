@@ -0,0 +1,63 @@
+"""Startup timing report.
+
+Run the player with ``--startup-timing`` (or set ``MP3_PLAYER_STARTUP_TIMING=1``)
+to print how long each startup phase took: imports, Tk init, settings and
+saved state, UI build, playlist restore and first paint. Work that runs in
+the background, like opening the audio device, is reported once it finishes.
+Import this module first, so the clock starts before any other import.
+"""
+
+import os
+import sys
+import threading
+import time
+
+STARTED = time.perf_counter()
+FLAG = '--startup-timing'
+ENV_VAR = 'MP3_PLAYER_STARTUP_TIMING'
+
+
+class StartupTimer:
+    """Records consecutive startup phases, plus background tasks that finish on their own"""
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.phases = []  # (name, seconds)
+        self.background = []  # (name, seconds, finished at)
+        self.reported = False
+        self._last = STARTED
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_environment(cls, argv=None):
+        argv = sys.argv if argv is None else argv
+        return cls(FLAG in argv or os.environ.get(ENV_VAR, '') not in ('', '0'))
+
+    def mark(self, name):
+        """End the current phase, which is named ``name``"""
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    def background_done(self, name, seconds):
+        """Record a background task; printed now if the main report is already out"""
+        finished = time.perf_counter() - STARTED
+        with self._lock:
+            self.background.append((name, seconds, finished))
+            late = self.reported
+        if late and self.enabled:
+            print(f"  {name + ' (background)':<28}{seconds * 1000:8.1f} ms   ready at {finished * 1000:.1f} ms")
+
+    def report(self):
+        """Print the phases so far (call once the first frame has been drawn)"""
+        with self._lock:
+            self.reported = True
+            background = list(self.background)
+        if not self.enabled:
+            return
+        print("Startup timing:")
+        for name, seconds in self.phases:
+            print(f"  {name:<28}{seconds * 1000:8.1f} ms")
+        print(f"  {'time to first window':<28}{(self._last - STARTED) * 1000:8.1f} ms")
+        for name, seconds, finished in background:
+            print(f"  {name + ' (background)':<28}{seconds * 1000:8.1f} ms   ready at {finished * 1000:.1f} ms")
@@ -0,0 +1,80 @@
+"""Live performance stats window.
+
+Shows the tracer's span latency percentiles (over each span's recent
+runs), its counters, any extra summary lines from the player (such as the
+audio cache's hit rate) and the last swallowed errors, refreshed once a
+second.
+The panel turns tracing on while it is open; closing it cancels its timer
+and, unless a trace is being recorded for export, turns tracing back off.
+"""
+
+import tkinter as tk
+
+import tracing
+
+REFRESH_MS = 1000
+
+
+def format_stats(tracer, details=()):
+    """The panel's text for the tracer's current state, followed by ``details`` lines"""
+    lines = [f"{'span':<22}{'count':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+    for name, stats in tracer.span_stats().items():
+        lines.append(f"{name:<22}{stats['count']:>8}{stats['p50_ms']:>10.1f}{stats['p90_ms']:>10.1f}"
+                     f"{stats['p99_ms']:>10.1f}{stats['max_ms']:>10.1f}")
+
+    counters = tracer.counter_totals()
+    if counters:
+        lines.append("")
+        for name, value in sorted(counters.items()):
+            if name.endswith('bytes'):
+                lines.append(f"{name:<22}{value / (1024 * 1024):>10.2f} MB")
+            else:
+                lines.append(f"{name:<22}{value:>10}")
+
+    if details:
+        lines.append("")
+        lines.extend(details)
+
+    errors = tracer.recent_errors()
+    if errors:
+        lines.append("")
+        lines.append("Recent swallowed errors:")
+        lines.extend(f"  {where}: {message}" for where, message in errors[-5:])
+    return '\n'.join(lines)
+
+
+class StatsPanel(tk.Toplevel):
+    """Toplevel window with live span percentiles and counters"""
+
+    def __init__(self, master, keep_tracing=False, on_close=None, details=None):
+        super().__init__(master, bg='#2b2b2b')
+        self.title("📊 Performance")
+        self.geometry("640x360")
+        self.keep_tracing = keep_tracing  # A trace is being recorded for export
+        self.on_close = on_close
+        self.details = details  # Returns extra lines to show, or None
+        self.tracer = tracing.enable()
+        self._refresh_pending = None
+
+        self.text = tk.Text(self, bg='#1e1e1e', fg='#d0d0d0', font=('Courier', 10), relief=tk.FLAT,
+                            padx=8, pady=8, state=tk.DISABLED)
+        self.text.pack(fill=tk.BOTH, expand=True)
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self.refresh()
+
+    def refresh(self):
+        self.text.config(state=tk.NORMAL)
+        self.text.delete('1.0', tk.END)
+        self.text.insert('1.0', format_stats(self.tracer, self.details() if self.details else ()))
+        self.text.config(state=tk.DISABLED)
+        self._refresh_pending = self.after(REFRESH_MS, self.refresh)
+
+    def close(self):
+        if self._refresh_pending is not None:
+            self.after_cancel(self._refresh_pending)
+            self._refresh_pending = None
+        if not self.keep_tracing:
+            tracing.disable()
+        if self.on_close:
+            self.on_close()
+        self.destroy()
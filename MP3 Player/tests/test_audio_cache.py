@@ -0,0 +1,53 @@
+"""LRU eviction and pinning of AudioCache"""
+
+import os
+
+from audio_cache import AudioCache
+
+
+def put(cache, name, size):
+    return cache.put(f'http://x/{name}.mp3', None, [b'\0' * size])
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=250)
+    first = put(cache, 'a', 100)
+    put(cache, 'b', 100)
+    assert cache.get('http://x/a.mp3') == first  # Now the most recent
+    put(cache, 'c', 100)
+    assert cache.get('http://x/b.mp3') is None
+    assert cache.get('http://x/a.mp3') == first
+    assert cache.total_bytes == 200
+    assert cache.stats.evictions == 1
+    assert (cache.stats.hits, cache.stats.misses) == (2, 1)
+
+
+def test_pinned_entries_survive_until_unpinned(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=150)
+    pinned = put(cache, 'a', 100)
+    cache.pin(pinned)
+    put(cache, 'b', 100)
+    assert os.path.exists(pinned)
+    assert cache.total_bytes == 200  # Over budget while pinned
+    cache.unpin(pinned)
+    assert not os.path.exists(pinned)
+    assert cache.total_bytes == 100
+
+
+def test_new_entry_is_kept_even_over_budget(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=50)
+    path = put(cache, 'big', 100)
+    assert os.path.exists(path)
+    assert cache.get('http://x/big.mp3') == path
+
+
+def test_reload_restores_entries_and_drops_part_files(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=1000)
+    path = put(cache, 'a', 100)
+    part = path + '.1.2.part'
+    with open(part, 'wb') as f:
+        f.write(b'partial')
+    reloaded = AudioCache(str(tmp_path), max_bytes=1000)
+    assert reloaded.get('http://x/a.mp3') == path
+    assert reloaded.total_bytes == 100
+    assert not os.path.exists(part)
@@ -0,0 +1,70 @@
+"""Paging and row lookup of StorePlaylist over a LibraryStore"""
+
+import pytest
+
+from library_store import PAGE_SIZE, LibraryStore, StorePlaylist
+
+
+def song(n, artist):
+    return {'url': f'http://x/{n}.mp3', 'name': f'{n}.mp3', 'metadata': {'title': f'T{n:05d}', 'artist': artist}}
+
+
+@pytest.fixture
+def store():
+    store = LibraryStore(':memory:')
+    # Artist sizes straddle page boundaries
+    songs = [song(n, 'Alpha') for n in range(PAGE_SIZE + 3)]
+    songs += [song(n, 'Beta') for n in range(PAGE_SIZE + 3, PAGE_SIZE + 5)]
+    store.add_songs(songs)
+    yield store
+    store.close()
+
+
+def test_rows_are_headers_then_tracks_by_title(store):
+    playlist = StorePlaylist(store)
+    assert len(playlist) == PAGE_SIZE + 7
+    assert playlist.track_count == PAGE_SIZE + 5
+    assert playlist[0].artist == 'Alpha' and not playlist[0].is_track
+    assert playlist[1].url == 'http://x/0.mp3'
+    beta = PAGE_SIZE + 4
+    assert playlist[beta].artist == 'Beta' and not playlist[beta].is_track
+    assert playlist[-1].url == f'http://x/{PAGE_SIZE + 4}.mp3'
+
+
+def test_position_of_matches_the_paged_rows(store):
+    playlist = StorePlaylist(store)
+    for position in (1, PAGE_SIZE - 1, PAGE_SIZE, PAGE_SIZE + 3, len(playlist) - 1):
+        assert playlist.position_of(playlist[position].url) == position
+    assert playlist.position_of('http://x/missing.mp3') is None
+
+
+def test_navigation_skips_headers_and_wraps(store):
+    playlist = StorePlaylist(store)
+    beta = PAGE_SIZE + 4
+    assert playlist.next_playable(beta - 1) == beta + 1
+    assert playlist.previous_playable(beta + 1) == beta - 1
+    assert playlist.next_playable(len(playlist) - 1) == 1
+    assert playlist.previous_playable(1) == len(playlist) - 1
+
+
+def test_page_changed_since_reload_is_marked_stale(store):
+    calls = []
+    playlist = StorePlaylist(store, on_stale=lambda: calls.append(1))
+    store.remove_urls([f'http://x/{PAGE_SIZE + 4}.mp3'])  # The last page now comes up short
+    assert not playlist[-1].is_track
+    playlist[-2]
+    assert playlist.stale and calls == [1]
+    playlist.reload()
+    assert not playlist.stale
+    assert playlist.track_count == PAGE_SIZE + 4
+
+
+def test_shuffled_positions_and_navigation(store):
+    shuffled = StorePlaylist(store).shuffled()
+    assert len(shuffled) == PAGE_SIZE + 5
+    for position in (0, PAGE_SIZE, len(shuffled) - 1):
+        assert shuffled.position_of(shuffled[position].url) == position
+    assert shuffled.next_playable(len(shuffled) - 1) == 0
+    assert shuffled.previous_playable(0) == len(shuffled) - 1
+    store.add_songs([song(99999, 'Gamma')])
+    assert shuffled.position_of('http://x/99999.mp3') is None
@@ -0,0 +1,68 @@
+"""Navigation indexes of PlaylistModel"""
+
+from playlist_model import PlaylistModel, Section, Track
+
+
+def track(n, artist='A'):
+    return Track(f'http://x/{n}.mp3', f'{n}.mp3', {'title': f'T{n}', 'artist': artist})
+
+
+def grouped():
+    # 0: A, 1-2: tracks, 3: B, 4: track
+    return PlaylistModel([Section('A'), track(1), track(2), Section('B'), track(3, 'B')])
+
+
+def test_next_and_previous_skip_headers_and_wrap():
+    model = grouped()
+    assert model.next_playable(0) == 1
+    assert model.next_playable(2) == 4
+    assert model.next_playable(4) == 1
+    assert model.previous_playable(4) == 2
+    assert model.previous_playable(1) == 4
+    assert model.next_playable(5) is None
+
+
+def test_empty_and_header_only_models_have_no_playable_rows():
+    assert PlaylistModel().next_playable(0) is None
+    assert PlaylistModel([Section('A')]).next_playable(0) is None
+
+
+def test_position_of_and_track_count_follow_inserts():
+    model = grouped()
+    assert model.position_of('http://x/3.mp3') == 4
+    model.insert(1, track(9))
+    assert model.position_of('http://x/3.mp3') == 5
+    assert model.track_count == 4
+    assert model.position_of('http://x/missing.mp3') is None
+
+
+def test_remove_urls_drops_emptied_headers():
+    model = grouped()
+    assert model.remove_urls({'http://x/3.mp3'}) == [3, 4]
+    assert len(model) == 3
+    assert model.next_playable(2) == 1
+
+
+def test_shuffled_keeps_tracks_and_matches_a_full_reindex():
+    shuffled = grouped().shuffled()
+    assert sorted(row.url for row in shuffled) == ['http://x/1.mp3', 'http://x/2.mp3', 'http://x/3.mp3']
+    reference = PlaylistModel(shuffled.rows)
+    for position in range(len(shuffled)):
+        assert shuffled.next_playable(position) == reference.next_playable(position)
+        assert shuffled.previous_playable(position) == reference.previous_playable(position)
+        assert shuffled.position_of(shuffled[position].url) == position
+
+
+def test_shuffled_model_reindexes_headers_once_one_is_inserted():
+    shuffled = grouped().shuffled()
+    shuffled.insert(1, Section('C'))
+    assert shuffled.next_playable(0) == 2
+    assert list(shuffled.sections) == [1]
+
+
+def test_display_rows_is_a_live_view():
+    model = grouped()
+    rows = model.display_rows()
+    model.extend([track(4, 'B')])
+    assert len(rows) == 6
+    assert rows[3:4] == [model[3].display_name]
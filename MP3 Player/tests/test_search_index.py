@@ -0,0 +1,48 @@
+"""Prefix and fuzzy matching of SearchIndex"""
+
+from playlist_model import Track
+from search_index import SearchIndex
+
+
+def track(url, title, artist, album='Unknown Album'):
+    return Track(url, url, {'title': title, 'artist': artist, 'album': album})
+
+
+def index():
+    search = SearchIndex()
+    search.add_many([
+        track('a', 'Yellow Submarine', 'The Beatles', 'Revolver'),
+        track('b', 'Help', 'The Beatles'),
+        track('c', 'Yellow', 'Coldplay', 'Parachutes'),
+    ])
+    return search
+
+
+def urls(results):
+    return [result.url for result in results]
+
+
+def test_every_word_must_match_a_prefix():
+    search = index()
+    assert urls(search.search('yel')) == ['c', 'a']
+    assert urls(search.search('yellow beat')) == ['a']
+    assert search.search('') == []
+
+
+def test_placeholder_values_are_not_indexed():
+    assert index().search('unknown') == []
+
+
+def test_typos_match_fuzzily_after_prefix_matches():
+    assert urls(index().search('coldpaly')) == ['c']
+
+
+def test_remove_and_replace():
+    search = index()
+    search.remove('c')
+    assert urls(search.search('yellow')) == ['a']
+    assert search.search('coldplay') == []
+    search.add(track('a', 'Taxman', 'The Beatles'))
+    assert search.search('yellow') == []
+    assert urls(search.search('tax')) == ['a']
+    assert len(search) == 2
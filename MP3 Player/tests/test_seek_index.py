@@ -0,0 +1,50 @@
+"""Durations and offsets of SeekIndex frame scans"""
+
+import pytest
+
+from seek_index import SCAN_INTERVAL, SeekIndex
+
+FRAME_HEADER = b'\xff\xfb\x90\x00'  # MPEG1 Layer III, 128 kbps, 44.1 kHz, no padding
+FRAME_LENGTH = 144 * 128000 // 44100
+FRAME_SECONDS = 1152 / 44100
+
+
+def cbr(frames, prefix=b''):
+    return prefix + (FRAME_HEADER + b'\0' * (FRAME_LENGTH - 4)) * frames
+
+
+def test_scan_gives_exact_duration():
+    index = SeekIndex.from_bytes(cbr(200))
+    assert index.source == 'scan' and index.exact
+    assert index.duration == pytest.approx(200 * FRAME_SECONDS)
+
+
+def test_points_are_frame_offsets_every_interval():
+    index = SeekIndex.from_bytes(cbr(200))
+    assert index.points[0] == (0.0, 0)
+    for seconds, offset in index.points:
+        assert offset % FRAME_LENGTH == 0
+        assert seconds == pytest.approx(offset // FRAME_LENGTH * FRAME_SECONDS)
+    assert index.points[1][0] >= SCAN_INTERVAL
+    assert index.locate(2.0)[0] <= 2.0 < index.locate(2.0)[0] + SCAN_INTERVAL + FRAME_SECONDS
+    assert index.locate(1000) == index.points[-1]
+
+
+def test_id3v2_tag_and_leading_junk_are_skipped():
+    tag = b'ID3\x04\x00\x00\x00\x00\x00\x0a' + b'\0' * 10
+    index = SeekIndex.from_bytes(cbr(50, tag + b'junk'))
+    assert index.points[0][1] == len(tag) + 4
+    assert index.duration == pytest.approx(50 * FRAME_SECONDS)
+
+
+def test_no_audio_gives_no_index():
+    assert SeekIndex.from_bytes(b'\0' * 4096) is None
+
+
+def test_json_round_trip(tmp_path):
+    index = SeekIndex.from_bytes(cbr(100))
+    path = str(tmp_path / 'track.seek.json')
+    index.save(path)
+    loaded = SeekIndex.load(path)
+    assert loaded.duration == pytest.approx(index.duration)
+    assert loaded.locate(1.0) == tuple(index.locate(1.0))
@@ -0,0 +1,229 @@
+"""Lightweight tracing of the player's hot paths.
+
+Code marks the interesting stretches with ``tracing.span(name)`` (used as
+a context manager), adds to counters with ``tracing.count(name, n)``, and
+reports exceptions it deliberately carries on from with
+``tracing.swallowed(where, error)``. All three are module-level functions
+that do nothing until ``enable()`` installs a ``Tracer``, so instrumented
+code costs one function call per span when tracing is off.
+
+An enabled tracer keeps:
+
+- the most recent spans, counter samples and swallowed errors, exported as
+  Chrome trace JSON (``chrome://tracing`` or https://ui.perfetto.dev);
+- the last ``window`` durations of every span name, for live percentiles
+  in the stats panel;
+- running counter totals.
+
+Run the player with ``--trace trace.json`` (or ``MP3_PLAYER_TRACE=trace.json``,
+or the ``trace_path`` setting) to write the trace on exit.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+FLAG = '--trace'
+ENV_VAR = 'MP3_PLAYER_TRACE'
+DEFAULT_MAX_EVENTS = 200_000
+DEFAULT_WINDOW = 512  # Recent durations kept per span name
+COUNTER_SAMPLE_SECONDS = 0.1  # Counter values go into the trace at most this often
+SWALLOWED_ERRORS = 'swallowed errors'
+
+_tracer = None  # The active Tracer, or None while tracing is off
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class _NullSpan:
+    """What ``span`` returns while tracing is off"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """One timed stretch of work; ``set`` adds arguments shown in the trace"""
+
+    __slots__ = ('tracer', 'name', 'args', 'start')
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.tracer.record(self.name, self.start, time.perf_counter(), self.args)
+        return False
+
+    def set(self, **args):
+        self.args.update(args)
+
+
+def span(name, **args):
+    """Context manager timing the enclosed block as ``name``"""
+    tracer = _tracer
+    if tracer is None:
+        return NULL_SPAN
+    return Span(tracer, name, args)
+
+
+def count(name, value=1):
+    """Add ``value`` to counter ``name``"""
+    tracer = _tracer
+    if tracer is not None:
+        tracer.count(name, value)
+
+
+def swallowed(where, error):
+    """Record an exception that was handled by carrying on without it"""
+    tracer = _tracer
+    if tracer is not None:
+        tracer.swallowed(where, error)
+
+
+def active():
+    """The enabled Tracer, or None"""
+    return _tracer
+
+
+def enable(max_events=DEFAULT_MAX_EVENTS, window=DEFAULT_WINDOW):
+    """Start tracing (keeping the current tracer if there is one) and return the tracer"""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer(max_events, window)
+    return _tracer
+
+
+def disable():
+    global _tracer
+    _tracer = None
+
+
+def trace_path_from_environment(settings=None, argv=None):
+    """Where to write the trace on exit: ``--trace PATH``, then ``MP3_PLAYER_TRACE``, then ``trace_path``"""
+    argv = sys.argv if argv is None else argv
+    if FLAG in argv:
+        position = argv.index(FLAG)
+        return argv[position + 1] if position + 1 < len(argv) else 'trace.json'
+    return os.environ.get(ENV_VAR) or (settings or {}).get('trace_path') or None
+
+
+class Tracer:
+    """Collects spans, counters and swallowed errors from any thread"""
+
+    def __init__(self, max_events=DEFAULT_MAX_EVENTS, window=DEFAULT_WINDOW):
+        self.started = time.perf_counter()
+        self.window = window
+        self.events = deque(maxlen=max_events)  # (phase, name, start, duration, thread id, args)
+        self.counters = {}
+        self.errors = deque(maxlen=20)  # Most recent (where, message)
+        self._durations = {}  # Span name -> deque of recent seconds
+        self._span_counts = {}
+        self._threads = {}  # Thread id -> name, for the trace
+        self._last_sample = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, name, start, end, args):
+        thread = threading.current_thread()
+        with self._lock:
+            self.events.append(('X', name, start, end - start, thread.ident, args))
+            self._threads[thread.ident] = thread.name
+            durations = self._durations.get(name)
+            if durations is None:
+                durations = self._durations[name] = deque(maxlen=self.window)
+            durations.append(end - start)
+            self._span_counts[name] = self._span_counts.get(name, 0) + 1
+
+    def count(self, name, value=1):
+        now = time.perf_counter()
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+            if now - self._last_sample >= COUNTER_SAMPLE_SECONDS:
+                self._last_sample = now
+                self.events.append(('C', 'counters', now, 0.0, 0, dict(self.counters)))
+
+    def swallowed(self, where, error):
+        thread = threading.current_thread()
+        message = f"{type(error).__name__}: {error}"
+        with self._lock:
+            self.errors.append((where, message))
+            self._threads[thread.ident] = thread.name
+            self.events.append(('i', where, time.perf_counter(), 0.0, thread.ident, {'error': message}))
+        self.count(SWALLOWED_ERRORS)
+
+    def counter_totals(self):
+        """A copy of the counters, safe to read while other threads count"""
+        with self._lock:
+            return dict(self.counters)
+
+    def recent_errors(self):
+        """A copy of the recent ``(where, message)`` swallowed errors"""
+        with self._lock:
+            return list(self.errors)
+
+    def span_stats(self):
+        """``{name: {count, p50_ms, p90_ms, p99_ms, max_ms}}`` over each name's recent spans"""
+        with self._lock:
+            recent = {name: sorted(durations) for name, durations in self._durations.items()}
+            counts = dict(self._span_counts)
+        return {name: {'count': counts[name],
+                       'p50_ms': percentile(values, 0.5) * 1000,
+                       'p90_ms': percentile(values, 0.9) * 1000,
+                       'p99_ms': percentile(values, 0.99) * 1000,
+                       'max_ms': values[-1] * 1000}
+                for name, values in sorted(recent.items())}
+
+    def chrome_trace(self):
+        """The recorded events in Chrome's Trace Event Format"""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+            threads = dict(self._threads)
+            counters = dict(self.counters)
+        trace = [{'ph': 'M', 'name': 'thread_name', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                 for tid, name in threads.items()]
+        for phase, name, start, duration, tid, args in events:
+            event = {'ph': phase, 'name': name, 'pid': pid, 'tid': tid,
+                     'ts': round((start - self.started) * 1e6, 1), 'args': args}
+            if phase == 'X':
+                event['dur'] = round(duration * 1e6, 1)
+            elif phase == 'i':
+                event['s'] = 't'
+            trace.append(event)
+        trace.append({'ph': 'C', 'name': 'counters', 'pid': pid, 'tid': 0,
+                      'ts': round((time.perf_counter() - self.started) * 1e6, 1), 'args': counters})
+        return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+
+    def export(self, path):
+        """Write the Chrome trace to ``path``"""
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f)
+        os.replace(temp_path, path)
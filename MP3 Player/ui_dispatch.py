@@ -0,0 +1,83 @@
+"""Hand work from background threads to the Tk main loop.
+
+Tk is not thread-safe, so worker threads never touch widgets directly.
+They post callables to a queue that the main loop drains from ``root.after``
+at a fixed frame rate. High-frequency updates such as progress bars are
+posted under a key, and only the latest update per key is applied each
+frame.
+"""
+
+import queue
+import threading
+import time
+
+DEFAULT_FPS = 30
+FRAME_BUDGET = 0.012  # Seconds of queued work to run per frame before yielding to Tk
+
+
+class UIDispatcher:
+    """Queue of UI callbacks drained on the Tk thread"""
+
+    def __init__(self, root, fps=DEFAULT_FPS):
+        self.root = root
+        self.interval_ms = max(1, int(1000 / fps))
+        self.main_thread = threading.get_ident()
+
+        self._queue = queue.SimpleQueue()
+        self._latest = {}  # key -> (func, args, kwargs), replaced until drained
+        self._latest_lock = threading.Lock()
+        self._stopped = False
+        self._after_id = self.root.after(self.interval_ms, self._drain)
+
+    def on_main_thread(self):
+        return threading.get_ident() == self.main_thread
+
+    def post(self, func, *args, **kwargs):
+        """Run ``func`` on the Tk thread at the next frame, in posting order"""
+        self._queue.put((func, args, kwargs))
+
+    def post_latest(self, key, func, *args, **kwargs):
+        """Like post(), but only the most recent call per ``key`` runs each frame"""
+        with self._latest_lock:
+            self._latest[key] = (func, args, kwargs)
+
+    def call(self, func, *args, **kwargs):
+        """Run ``func`` now if already on the Tk thread, otherwise post it"""
+        if self.on_main_thread():
+            func(*args, **kwargs)
+        else:
+            self.post(func, *args, **kwargs)
+
+    def _drain(self):
+        if self._stopped:
+            return
+        deadline = time.perf_counter() + FRAME_BUDGET
+        try:
+            while time.perf_counter() < deadline:
+                try:
+                    func, args, kwargs = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                self._run(func, args, kwargs)
+
+            with self._latest_lock:
+                latest, self._latest = self._latest, {}
+            for func, args, kwargs in latest.values():
+                self._run(func, args, kwargs)
+        finally:
+            self._after_id = self.root.after(self.interval_ms, self._drain)
+
+    @staticmethod
+    def _run(func, args, kwargs):
+        try:
+            func(*args, **kwargs)
+        except Exception as e:
+            # One bad callback must not stop the dispatcher
+            print(f"UI callback {getattr(func, '__name__', func)} failed: {e}")
+
+    def stop(self):
+        self._stopped = True
+        try:
+            self.root.after_cancel(self._after_id)
+        except Exception:
+            pass